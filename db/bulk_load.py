@@ -0,0 +1,113 @@
+"""Load tables from tsvs at sqlite speed, bypassing the ORM.
+
+The rows are streamed from the tsv and inserted in batches with a single
+executemany each. The secondary indexes of the tables get dropped before
+the load and built again once all the rows are in, which is much faster
+than updating them row by row.
+
+Usage:
+engine = get_db_engine(pth.dpd_db_path, "bulk")
+with engine.begin() as conn:
+    with indexes_dropped(conn, [PaliWord.__table__]):
+        load_tsv(conn, PaliWord.__table__, pth.pali_word_path)
+"""
+
+import csv
+
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Table, inspect
+from sqlalchemy.engine import Connection
+
+BATCH_SIZE = 10000
+
+
+def read_tsv_rows(
+        tsv_path: Path,
+        skip_columns: Sequence[str] = (),
+        missing_values: Optional[Dict[str, Any]] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream the rows of a tsv with a header, as dicts. Blank lines are
+    skipped, and the fields missing from short rows are filled from
+    missing_values, or with empty strings."""
+
+    if missing_values is None:
+        missing_values = {}
+
+    with open(tsv_path, "r", newline="") as tsvfile:
+        csvreader = csv.reader(tsvfile, delimiter="\t", quotechar='"')
+        columns = next(csvreader)
+        keep = [
+            (col_idx, col_name) for col_idx, col_name in enumerate(columns)
+            if col_name not in skip_columns]
+        for row in csvreader:
+            if not row:
+                continue
+            elif len(row) < len(columns):
+                yield {
+                    col_name: row[col_idx] if col_idx < len(row)
+                    else missing_values.get(col_name, "")
+                    for col_idx, col_name in keep}
+            else:
+                yield {col_name: row[col_idx] for col_idx, col_name in keep}
+
+
+def column_defaults(table: Table) -> Dict[str, Any]:
+    """The scalar default of every column which has one."""
+
+    return {
+        c.name: c.default.arg for c in table.columns
+        if c.default is not None and c.default.is_scalar}
+
+
+def bulk_insert(
+        conn: Connection,
+        table: Table,
+        rows: Iterable[Dict[str, Any]],
+        batch_size: int = BATCH_SIZE
+) -> int:
+    """Insert the rows with one executemany per batch, return how many."""
+
+    rows = iter(rows)
+    count = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return count
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+
+
+def load_tsv(
+        conn: Connection,
+        table: Table,
+        tsv_path: Path,
+        skip_columns: Sequence[str] = (),
+        batch_size: int = BATCH_SIZE
+) -> int:
+    """Insert all the rows of a tsv into the table, return how many."""
+
+    rows = read_tsv_rows(tsv_path, skip_columns, column_defaults(table))
+    return bulk_insert(conn, table, rows, batch_size)
+
+
+@contextmanager
+def indexes_dropped(conn: Connection, tables: List[Table]):
+    """Drop the secondary indexes of the tables, and build them again
+    on the way out."""
+
+    dropped = []
+    for table in tables:
+        existing = {i["name"] for i in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                index.drop(bind=conn)
+                dropped.append(index)
+
+    yield
+
+    for index in dropped:
+        index.create(bind=conn)
@@ -1,22 +1,43 @@
 """DB related functions:
 1. Create db if doesn't already exist,
-2. Get column names,
-3. Print column names."""
+2. Create missing indexes,
+3. Get column names,
+4. Print column names."""
 
 from pathlib import Path
-from sqlalchemy import create_engine
 from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy_utils import database_exists
+from db.get_db_session import get_db_engine
 from db.models import Base
 
 
-def create_db_if_not_exists(db_path: Path):
+def create_db_if_not_exists(db_path: Path, profile: str = "build"):
     """Create the db if it does not exist already."""
-    engine = create_engine(f"sqlite+pysqlite:///{db_path}", echo=False)
+    engine = get_db_engine(db_path, profile)
     if not database_exists(engine.url):
         Base.metadata.create_all(bind=engine)
 
 
+def create_indexes(engine: Engine) -> int:
+    """Create the indexes declared in the models which are missing from
+    an existing db, return how many."""
+
+    table_names = set(inspect(engine).get_table_names())
+    count = 0
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in table_names:
+                continue
+            existing = {
+                i["name"] for i in inspect(conn).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    count += 1
+    return count
+
+
 def print_column_names(tables_name):
     """Print a numbered list of all the column names in a given table."""
 
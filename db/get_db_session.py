@@ -1,24 +1,91 @@
-"""Get DB session - used ubiquitously."""
+"""Get DB session - used ubiquitously.
+
+Every engine is made by get_db_engine with one of these profiles,
+which set the sqlite pragmas on each new connection:
+build:  the default, WAL journal for reading while writing.
+export: read-only and memory-mapped, for the exporters, never flushed.
+bulk:   no syncing to disk, only for loading a db from scratch."""
 
 import os
 import sys
 
 from pathlib import Path
-from sqlalchemy import create_engine
+from typing import Any, Dict, Set
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 
+# negative cache_size is in kB
+DB_PROFILES: Dict[str, Dict[str, Any]] = {
+    "build": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,
+    },
+    "export": {
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "mmap_size": 1073741824,
+        "query_only": "ON",
+    },
+    "bulk": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "temp_store": "MEMORY",
+    },
+}
+
+# dbs whose indexes were already checked in this process
+_migrated: Set[str] = set()
+
+
+def get_db_engine(db_path: Path, profile: str = "build") -> Engine:
+    """Make an engine which sets the pragmas of the profile
+    on every connection."""
+
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown db profile: {profile}")
+    pragmas = DB_PROFILES[profile]
 
-def get_db_session(db_path: Path) -> Session:
+    if profile == "export":
+        db_eng = create_engine(
+            f"sqlite+pysqlite:///file:{db_path}?mode=ro&uri=true", echo=False)
+    else:
+        db_eng = create_engine(
+            f"sqlite+pysqlite:///{db_path}", echo=False)
+
+    @event.listens_for(db_eng, "connect")
+    def _set_pragmas(dbapi_conn, __connection_record__):
+        cursor = dbapi_conn.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    return db_eng
+
+
+def get_db_session(db_path: Path, profile: str = "build") -> Session:
     """Get the db session."""
     if not os.path.isfile(db_path):
         print(f"Database file doesn't exist: {db_path}")
         sys.exit(1)
 
     try:
-        db_eng = create_engine(f"sqlite+pysqlite:///{db_path}", echo=False)
-        # db_conn = db_eng.connect()
+        db_eng = get_db_engine(db_path, profile)
+
+        # read-only and bulk loaded dbs get their indexes elsewhere
+        if profile == "build" and str(db_path) not in _migrated:
+            from db.db_helpers import create_indexes
+            create_indexes(db_eng)
+            _migrated.add(str(db_path))
 
-        Session = sessionmaker(db_eng)
+        # the exporters change attributes of rows while rendering,
+        # which must never get flushed to the read-only db
+        Session = sessionmaker(db_eng, autoflush=(profile != "export"))
         Session.configure(bind=db_eng)
         db_sess = Session()
 
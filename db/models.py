@@ -149,15 +149,17 @@ class PaliWord(Base):
     sanskrit: Mapped[Optional[str]] = mapped_column(default='')
 
     root_key: Mapped[Optional[str]] = mapped_column(
-        ForeignKey("pali_roots.root"), default='')
+        ForeignKey("pali_roots.root"), default='', index=True)
     root_sign: Mapped[Optional[str]] = mapped_column(default='')
     root_base: Mapped[Optional[str]] = mapped_column(default='')
 
-    family_root: Mapped[Optional[str]] = mapped_column(default='')
+    family_root: Mapped[Optional[str]] = mapped_column(
+        default='', index=True)
     # ForeignKey("family_root.root_family"))
     family_word: Mapped[Optional[str]] = mapped_column(
-        ForeignKey("family_word.word_family"), default='')
-    family_compound: Mapped[Optional[str]] = mapped_column(default='')
+        ForeignKey("family_word.word_family"), default='', index=True)
+    family_compound: Mapped[Optional[str]] = mapped_column(
+        default='', index=True)
     family_set: Mapped[Optional[str]] = mapped_column(
         ForeignKey("family_set.set"), default='')
 
@@ -188,7 +190,7 @@ class PaliWord(Base):
 
     stem: Mapped[str] = mapped_column(default='')
     pattern: Mapped[Optional[str]] = mapped_column(
-        ForeignKey("inflection_templates.pattern"), default='')
+        ForeignKey("inflection_templates.pattern"), default='', index=True)
 
     created_at: Mapped[Optional[DateTime]] = mapped_column(
         DateTime(timezone=True), server_default=func.now())
@@ -381,7 +383,7 @@ class Sandhi(Base):
 class FamilyRoot(Base):
     __tablename__ = "family_root"
     id: Mapped[int] = mapped_column(primary_key=True)
-    root_id: Mapped[str] = mapped_column(default='')
+    root_id: Mapped[str] = mapped_column(default='', index=True)
     root_family: Mapped[str] = mapped_column(default='')
     html: Mapped[str] = mapped_column(default='')
     count: Mapped[int] = mapped_column(default=0)
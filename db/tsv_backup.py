@@ -0,0 +1,203 @@
+"""Back up tables to tsv, streaming only the needed columns from the db.
+
+A full backup selects just the backed up columns, streams them in batches
+and writes them straight to the tsv, without loading any ORM objects.
+
+Tables with created_at and updated_at can also be backed up incrementally:
+only the rows added or changed since the last backup get selected, and are
+merged into the existing tsv while it's being copied, which also drops the
+rows deleted from the db. The unchanged rows are copied as raw text, and
+only their primary key gets parsed. The result is the same as a full backup.
+
+The newest timestamp in the table and the modification time of the tsv are
+saved in config.ini after each backup. If the tsv was changed by anything
+else since, a full backup is made instead.
+
+Usage:
+with db_engine.connect() as conn:
+    backup_table(conn, PaliWord.__table__, pth.pali_word_path, exclude_columns)
+"""
+
+import csv
+import io
+import os
+import re
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import String, Table, cast, func, literal_column, or_, select
+from sqlalchemy.engine import Connection
+
+from tools.configger import config_read, config_update
+
+BATCH_SIZE = 2000
+
+# the first field of a record written with QUOTE_ALL
+FIRST_FIELD = re.compile(r'"((?:[^"]|"")*)"')
+
+
+def _tsv_writer(tsvfile):
+    return csv.writer(
+        tsvfile, delimiter="\t", quotechar='"', quoting=csv.QUOTE_ALL)
+
+
+def _backup_columns(table: Table, exclude_columns: Sequence[str]) -> List:
+    return [c for c in table.columns if c.name not in exclude_columns]
+
+
+def _has_timestamps(table: Table) -> bool:
+    return "created_at" in table.columns and "updated_at" in table.columns
+
+
+def _stream_rows(conn: Connection, query) -> Iterator:
+    result = conn.execution_options(
+        stream_results=True, yield_per=BATCH_SIZE).execute(query)
+    for partition in result.partitions():
+        yield from partition
+
+
+def _tsv_records(tsvfile) -> Iterator[str]:
+    """The raw text of each record of a tsv written with QUOTE_ALL. A field
+    can have line breaks, so a record only ends where its quotes balance."""
+
+    record = ""
+    for line in tsvfile:
+        record += line
+        if record.count('"') % 2 == 0:
+            yield record
+            record = ""
+
+
+def _record_pk(record: str, pk_idx: int) -> str:
+    if pk_idx == 0:
+        m = FIRST_FIELD.match(record)
+        if m:
+            return m.group(1).replace('""', '"')
+    return next(csv.reader([record], delimiter="\t", quotechar='"'))[pk_idx]
+
+
+def table_watermark(conn: Connection, table: Table) -> str:
+    """The newest created_at or updated_at in the table, as stored."""
+
+    created_at = cast(table.c.created_at, String)
+    updated_at = cast(table.c.updated_at, String)
+    newest = conn.execute(select(
+        func.max(func.coalesce(created_at, "")),
+        func.max(func.coalesce(updated_at, "")))).one()
+    return max(newest[0] or "", newest[1] or "")
+
+
+def write_table_tsv(
+        conn: Connection,
+        table: Table,
+        tsv_path: Path,
+        exclude_columns: Sequence[str] = ()
+) -> int:
+    """Write all the rows of the table to the tsv, return how many."""
+
+    columns = _backup_columns(table, exclude_columns)
+    count = 0
+    with open(tsv_path, "w", newline="") as tsvfile:
+        csvwriter = _tsv_writer(tsvfile)
+        csvwriter.writerow([c.name for c in columns])
+        for row in _stream_rows(conn, select(*columns)):
+            csvwriter.writerow(row)
+            count += 1
+    return count
+
+
+def update_table_tsv(
+        conn: Connection,
+        table: Table,
+        tsv_path: Path,
+        since: str,
+        exclude_columns: Sequence[str] = ()
+) -> Optional[int]:
+    """Merge the rows added or changed since the timestamp into the tsv,
+    return how many. Returns None if the tsv doesn't have the same columns,
+    and needs a full backup."""
+
+    columns = _backup_columns(table, exclude_columns)
+    column_names = [c.name for c in columns]
+    pk_column = table.primary_key.columns.values()[0]
+    if pk_column.name not in column_names:
+        return None
+    pk_idx = column_names.index(pk_column.name)
+
+    changed_query = select(*columns).where(or_(
+        cast(table.c.created_at, String) >= since,
+        cast(table.c.updated_at, String) >= since)
+    ).order_by(literal_column("rowid"))
+
+    changed: Dict[str, list] = {
+        str(row[pk_idx]): list(row)
+        for row in _stream_rows(conn, changed_query)}
+    count = len(changed)
+    db_pks: Set[str] = {
+        str(pk) for pk in conn.execute(select(pk_column)).scalars()}
+
+    header_file = io.StringIO()
+    _tsv_writer(header_file).writerow(column_names)
+    header = header_file.getvalue()
+
+    temp_path = tsv_path.with_suffix(".tmp")
+    with open(tsv_path, "r", newline="") as old_file, \
+            open(temp_path, "w", newline="") as new_file:
+        if old_file.readline() != header:
+            new_file.close()
+            temp_path.unlink()
+            return None
+
+        new_file.write(header)
+        csvwriter = _tsv_writer(new_file)
+        for record in _tsv_records(old_file):
+            pk = _record_pk(record, pk_idx)
+            if pk not in db_pks:
+                continue
+            elif pk in changed:
+                csvwriter.writerow(changed.pop(pk))
+            else:
+                new_file.write(record)
+
+        # what's left is new, and comes last in the table too
+        for row in changed.values():
+            csvwriter.writerow(row)
+
+    os.replace(temp_path, tsv_path)
+    return count
+
+
+def backup_table(
+        conn: Connection,
+        table: Table,
+        tsv_path: Path,
+        exclude_columns: Sequence[str] = (),
+        incremental: bool = True
+) -> int:
+    """Back up the table to tsv, only merging the changes into the last
+    backup when possible. Return how many rows were written from the db."""
+
+    if not _has_timestamps(table):
+        return write_table_tsv(conn, table, tsv_path, exclude_columns)
+
+    watermark = table_watermark(conn, table)
+    since = config_read("backup", f"{table.name}_watermark")
+    tsv_mtime = config_read("backup", f"{table.name}_mtime")
+
+    count = None
+    if (
+        incremental
+        and since
+        and tsv_path.exists()
+        and tsv_mtime == str(tsv_path.stat().st_mtime_ns)
+    ):
+        count = update_table_tsv(
+            conn, table, tsv_path, since, exclude_columns)
+
+    if count is None:
+        count = write_table_tsv(conn, table, tsv_path, exclude_columns)
+
+    config_update("backup", f"{table.name}_watermark", watermark)
+    config_update("backup", f"{table.name}_mtime", tsv_path.stat().st_mtime_ns)
+    return count
@@ -8,6 +8,8 @@ import subprocess
 from datetime import datetime
 from mako.template import Template
 from rich import print
+from sqlalchemy.orm import joinedload
+from typing import Dict, List, Optional, Set, Tuple, Union
 from zipfile import ZipFile, ZIP_DEFLATED
 
 from db.get_db_session import get_db_session
@@ -18,16 +20,30 @@ from tools.cst_sc_text_sets import make_cst_text_set
 from tools.cst_sc_text_sets import make_sc_text_set
 from tools.diacritics_cleaner import diacritics_cleaner
 from tools.first_letter import find_first_letter
+from tools.mako_templates import get_template
 from tools.meaning_construction import make_meaning_html
 from tools.meaning_construction import summarize_constr
 from tools.meaning_construction import degree_of_completion
 from tools.pali_alphabet import pali_alphabet
 from tools.pali_sort_key import pali_sort_key
+from tools.parallel_map import parallel_map
 from tools.paths import ProjectPaths
 from tools.sandhi_words import make_words_in_sandhi_set
 from tools.tic_toc import tic, toc
 from tools.tsv_read_write import read_tsv_dict
 
+# id, headword or sandhi word, inflections of a headword
+EbookEntry = Tuple[int, Union[PaliWord, Sandhi], Optional[Set[str]]]
+
+
+class EbookTemplates:
+    def __init__(self, pth: ProjectPaths):
+        self.entry_templ = get_template(pth, pth.ebook_entry_templ_path)
+        self.grammar_templ = get_template(pth, pth.ebook_grammar_templ_path)
+        self.example_templ = get_template(pth, pth.ebook_example_templ_path)
+        self.sandhi_templ = get_template(pth, pth.ebook_sandhi_templ_path)
+        self.letter_templ = get_template(pth, pth.ebook_letter_templ_path)
+
 
 def render_xhtml():
     print("[bright_yellow]rendering dpd for ebook")
@@ -35,7 +51,8 @@ def render_xhtml():
     print(f"[green]{'querying dpd db':<40}", end="")
     pth = ProjectPaths()
     db_sesssion = get_db_session(pth.dpd_db_path)
-    dpd_db = db_sesssion.query(PaliWord).all()
+    dpd_db = db_sesssion.query(PaliWord).options(
+        joinedload(PaliWord.rt)).all()
     dpd_db = sorted(dpd_db, key=lambda x: pali_sort_key(x.pali_1))
     print(f"{len(dpd_db):>10,}")
 
@@ -89,53 +106,42 @@ def render_xhtml():
         no_diacritics = diacritics_cleaner(i.pali_clean)
         dd_dict[i.id].add(no_diacritics)
 
-    # a dictionary for entries of each letter of the alphabet
+    # a list of entries for each letter of the alphabet
     print(f"[green]{'initialising letter dict':<40}")
-    letter_dict: dict = {}
+    letter_dict: Dict[str, List[EbookEntry]] = {}
     for letter in pali_alphabet:
         letter_dict[letter] = []
 
     # add all words
     print("[green]creating entries")
     id_counter = 1
-    for counter, i in enumerate(dpd_db):
-        inflections: set = dd_dict[i.id]
+    for i in dpd_db:
         first_letter = find_first_letter(i.pali_1)
-        entry = render_ebook_entry(pth, id_counter, i, inflections)
-        letter_dict[first_letter] += [entry]
+        letter_dict[first_letter].append((id_counter, i, dd_dict[i.id]))
         id_counter += 1
 
-        if counter % 5000 == 0:
-            print(f"{counter:>10,} / {len(dpd_db):<10,} {i.pali_1}")
-
     # add sandhi words which are in all_words_set
     print("[green]add sandhi words")
-    for counter, i in enumerate(sandhi_db):
+    for i in sandhi_db:
         if bool(set(i.sandhi) & all_words_set):
             first_letter = find_first_letter(i.sandhi)
-            entry = render_sandhi_entry(pth, id_counter, i)
-            letter_dict[first_letter] += [entry]
+            letter_dict[first_letter].append((id_counter, i, None))
             id_counter += 1
 
-        if counter % 5000 == 0:
-            print(f"{counter:>10,} / {len(sandhi_db):<10,} {i.sandhi}")
-
-    # save to a single file for each letter of the alphabet
+    # render and save a single file for each letter of the alphabet,
+    # the letters in parallel, the biggest first
     print(f"[green]{'saving entries xhtml':<40}", end="")
-    total = 0
-
-    for counter, (letter, entries) in enumerate(letter_dict.items()):
-        ascii_letter = diacritics_cleaner(letter)
-        total += len(entries)
-        entries = "".join(entries)
-        xhtml = render_ebook_letter_templ(pth, letter, entries)
-        output_path = pth.epub_text_dir.joinpath(
-            f"{counter}_{ascii_letter}.xhtml")
-
-        with open(output_path, "w") as f:
-            f.write(xhtml)
-
-    print(f"{total:>10,}")
+    ebook_templates = EbookTemplates(pth)
+    letters = [
+        (counter, letter, entries)
+        for counter, (letter, entries) in enumerate(letter_dict.items())]
+    entry_counts = parallel_map(
+        lambda x: save_letter_xhtml(pth, *x, ebook_templates),
+        letters,
+        num_chunks=len(letters),
+        costs=[len(entries) for __counter__, __letter__, entries in letters])
+
+    print(f"{sum(entry_counts):>10,}")
 
     db_sesssion.close()
     return id_counter+1
@@ -144,7 +150,44 @@ def render_xhtml():
 # functions to create the various templates
 
 
-def render_ebook_entry(pth: ProjectPaths, counter: int, i: PaliWord, inflections: set) -> str:
+def save_letter_xhtml(
+        pth: ProjectPaths,
+        counter: int,
+        letter: str,
+        entries: List[EbookEntry],
+        et: EbookTemplates
+) -> int:
+    """Render all the entries of a letter and save them as a page,
+    return how many."""
+
+    rendered = []
+    for id_counter, i, inflections in entries:
+        if isinstance(i, Sandhi):
+            rendered.append(render_sandhi_entry(
+                pth, id_counter, i, et.sandhi_templ))
+        else:
+            rendered.append(render_ebook_entry(
+                pth, id_counter, i, inflections, et))
+
+    xhtml = render_ebook_letter_templ(
+        pth, letter, "".join(rendered), et.letter_templ)
+    ascii_letter = diacritics_cleaner(letter)
+    output_path = pth.epub_text_dir.joinpath(
+        f"{counter}_{ascii_letter}.xhtml")
+
+    with open(output_path, "w") as f:
+        f.write(xhtml)
+
+    return len(entries)
+
+
+def render_ebook_entry(
+        pth: ProjectPaths,
+        counter: int,
+        i: PaliWord,
+        inflections: set,
+        et: EbookTemplates
+) -> str:
     """Render single word entry."""
 
     summary = f"{i.pos}. "
@@ -161,15 +204,13 @@ def render_ebook_entry(pth: ProjectPaths, counter: int, i: PaliWord, inflections
     if "&" in summary:
         summary = summary.replace("&", "and")
 
-    grammar_table = render_grammar_templ(pth, i)
+    grammar_table = render_grammar_templ(pth, i, et.grammar_templ)
     if "&" in grammar_table:
         grammar_table = grammar_table.replace("&", "and")
 
-    examples = render_example_templ(pth, i)
-
-    ebook_entry_templ = Template(filename=str(pth.ebook_entry_templ_path))
+    examples = render_example_templ(pth, i, et.example_templ)
 
-    return str(ebook_entry_templ.render(
+    return str(et.entry_templ.render(
             counter=counter,
             pali_1=i.pali_1,
             pali_clean=i.pali_clean,
@@ -179,7 +220,11 @@ def render_ebook_entry(pth: ProjectPaths, counter: int, i: PaliWord, inflections
             examples=examples))
 
 
-def render_grammar_templ(pth: ProjectPaths, i: PaliWord) -> str:
+def render_grammar_templ(
+        pth: ProjectPaths,
+        i: PaliWord,
+        ebook_grammar_templ: Template
+) -> str:
     """html table of grammatical information"""
 
     if i.meaning_1:
@@ -200,8 +245,6 @@ def render_grammar_templ(pth: ProjectPaths, i: PaliWord) -> str:
 
         meaning = f"{make_meaning_html(i)}"
 
-        ebook_grammar_templ = Template(filename=str(pth.ebook_grammar_templ_path))
-
         return str(
             ebook_grammar_templ.render(
                 i=i,
@@ -212,7 +255,11 @@ def render_grammar_templ(pth: ProjectPaths, i: PaliWord) -> str:
         return ""
 
 
-def render_example_templ(pth: ProjectPaths, i: PaliWord) -> str:
+def render_example_templ(
+        pth: ProjectPaths,
+        i: PaliWord,
+        ebook_example_templ: Template
+) -> str:
     """render sutta examples html"""
     if i.example_1 is not None:
         i.example_1 = i.example_1.replace("\n", "<br/>")
@@ -223,8 +270,6 @@ def render_example_templ(pth: ProjectPaths, i: PaliWord) -> str:
     if i.sutta_2 is not None:
         i.sutta_2 = i.sutta_2.replace("\n", "<br/>")
 
-    ebook_example_templ = Template(filename=str(pth.ebook_example_templ_path))
-
     if i.meaning_1 and i.example_1:
         return str(
             ebook_example_templ.render(
@@ -233,23 +278,30 @@ def render_example_templ(pth: ProjectPaths, i: PaliWord) -> str:
         return ""
 
 
-def render_sandhi_entry(pth: ProjectPaths, counter: int, i: Sandhi) -> str:
+def render_sandhi_entry(
+        pth: ProjectPaths,
+        counter: int,
+        i: Sandhi,
+        ebook_sandhi_templ: Template
+) -> str:
     """Render sandhi word entry."""
 
     sandhi = i.sandhi
     splits = "<br/>".join(i.split_list)
 
-    ebook_sandhi_templ = Template(filename=str(pth.ebook_sandhi_templ_path))
-
     return str(ebook_sandhi_templ.render(
             counter=counter,
             sandhi=sandhi,
             splits=splits))
 
 
-def render_ebook_letter_templ(pth: ProjectPaths, letter: str, entries: str) -> str:
+def render_ebook_letter_templ(
+        pth: ProjectPaths,
+        letter: str,
+        entries: str,
+        ebook_letter_templ: Template
+) -> str:
     """Render all entries for a single letter."""
-    ebook_letter_templ = Template(filename=str(pth.ebook_letter_templ_path))
     return str(ebook_letter_templ.render(
             letter=letter,
             entries=entries))
@@ -263,15 +315,18 @@ def save_abbreviations_xhtml_page(pth: ProjectPaths, id_counter):
     file_path = pth.abbreviations_tsv_path
     abbreviations_list = read_tsv_dict(file_path)
 
+    abbrev_entry_templ = get_template(pth, pth.ebook_abbrev_entry_templ_path)
     abbreviation_entries = []
     for i in abbreviations_list:
-        abbreviation_entries += [
-            render_abbreviation_entry(pth, id_counter, i)]
+        abbreviation_entries.append(
+            render_abbreviation_entry(pth, id_counter, i, abbrev_entry_templ))
         id_counter += 1
 
     entries = "".join(abbreviation_entries)
     entries = entries.replace(" > ", " &gt; ")
-    xhtml = render_ebook_letter_templ(pth, "Abbreviations", entries)
+    xhtml = render_ebook_letter_templ(
+        pth, "Abbreviations", entries,
+        get_template(pth, pth.ebook_letter_templ_path))
 
     with open(pth.epub_abbreviations_path, "w") as f:
         f.write(xhtml)
@@ -279,11 +334,14 @@ def save_abbreviations_xhtml_page(pth: ProjectPaths, id_counter):
     print(f"{len(abbreviations_list):>10,}")
 
 
-def render_abbreviation_entry(pth: ProjectPaths, counter: int, i: dict) -> str:
+def render_abbreviation_entry(
+        pth: ProjectPaths,
+        counter: int,
+        i: dict,
+        ebook_abbreviation_entry_templ: Template
+) -> str:
     """Render a single abbreviations entry."""
 
-    ebook_abbreviation_entry_templ = Template(filename=str(pth.ebook_abbrev_entry_templ_path))
-
     return str(ebook_abbreviation_entry_templ.render(
             counter=counter,
             i=i))
@@ -296,7 +354,7 @@ def save_title_page_xhtml(pth: ProjectPaths):
     date = current_datetime.strftime("%Y-%m-%d")
     time = current_datetime.strftime("%H:%M")
 
-    ebook_title_page_templ = Template(filename=str(pth.ebook_title_page_templ_path))
+    ebook_title_page_templ = get_template(pth, pth.ebook_title_page_templ_path)
 
     xhtml = str(ebook_title_page_templ.render(
             date=date,
@@ -316,7 +374,7 @@ def save_content_opf_xhtml(pth: ProjectPaths, current_datetime):
 
     date_time_zulu = current_datetime.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    ebook_content_opf_templ = Template(filename=str(pth.ebook_content_opf_templ_path))
+    ebook_content_opf_templ = get_template(pth, pth.ebook_content_opf_templ_path)
 
     content = str(ebook_content_opf_templ.render(
             date_time_zulu=date_time_zulu))
@@ -5,7 +5,6 @@
 import os
 import sys
 
-from functools import reduce
 from pathlib import Path
 from typing import List, Dict
 
@@ -14,7 +13,7 @@ from rich import print
 from mako.template import Template
 from minify_html import minify
 
-from mdict_exporter import mdict_synonyms
+from mdict_exporter import mdict_items
 from db.models import Sandhi
 from db.get_db_session import get_db_session
 
@@ -55,7 +54,7 @@ def make_sandhi_data_list(pth: ProjectPaths):
     """Prepare data set for GoldenDict of sandhi, splits and synonyms."""
 
     print(f"[green]{'making sandhi data list':<40}")
-    db_session = get_db_session(pth.dpd_db_path)
+    db_session = get_db_session(pth.dpd_db_path, "export")
     sandhi_db = db_session.query(Sandhi).all()
     sandhi_db_length: int = len(sandhi_db)
     SANDHI_CONTRACTIONS: dict = make_sandhi_contraction_dict(db_session)
@@ -144,19 +143,6 @@ def make_mdict(PTH, sandhi_data_list: List[Dict]):
 
     print(f"[green]{'exporting mdct':<22}")
 
-    bip()
-    print("[white]adding 'mdict' and h3 tag", end=" ")
-    for i in sandhi_data_list:
-        i['definition_html'] = i['definition_html'].replace(
-            "GoldenDict", "MDict")
-        i['definition_html'] = f"<h3>{i['word']}</h3>{i['definition_html']}"
-    print(bop())
-
-    bip()
-    print("[white]reducing synonyms", end=" ")
-    sandhi_data = reduce(mdict_synonyms, sandhi_data_list, [])
-    print(bop())
-
     bip()
     print("[white]writing mdict", end=" ")
     description = """<p>DPD Deconstructor by Bodhirasa</p>
@@ -165,7 +151,7 @@ def make_mdict(PTH, sandhi_data_list: List[Dict]):
 the Digital Pāḷi Dictionary website</a></p>"""
 
     writer = MDictWriter(
-        sandhi_data,
+        mdict_items(sandhi_data_list),
         title="DPD Deconstructor",
         description=description)
     print(bop())
@@ -1,17 +1,16 @@
 """Compile HTML data for PaliWord."""
 
+import sys
+
 from tools import time_log
-import psutil
 from css_html_js_minify import css_minify, js_minify
 from mako.template import Template
 from minify_html import minify
+from pathlib import Path
 from rich import print
 from sqlalchemy import and_
-from typing import List, Set, TypedDict, Tuple
-from multiprocessing.managers import ListProxy
-from multiprocessing import Process, Manager
+from typing import Dict, Iterator, List, Set, TypedDict, Tuple
 
-from sqlalchemy.orm import object_session
 from sqlalchemy.orm.session import Session
 
 from helpers import EXCLUDE_FROM_FREQ
@@ -24,33 +23,38 @@ from db.models import FamilyWord
 from db.models import FamilyCompound
 from db.models import FamilySet
 
+from tools.mako_templates import get_template
 from tools.meaning_construction import make_meaning_html
 from tools.meaning_construction import summarize_constr
 from tools.meaning_construction import degree_of_completion
 from tools.niggahitas import add_niggahitas
+from tools.parallel_map import parallel_map_chunks
 from tools.paths import ProjectPaths
+from tools.render_cache import CacheEntry, RenderCache, fingerprint, hash_values, row_values
+from tools.render_spool import RenderSpool, read_spool_file, write_spool_file
 from tools.pos import CONJUGATIONS
 from tools.pos import DECLENSIONS
 from tools.pos import INDECLINABLES
 from tools.tic_toc import bip
-from tools.configger import config_test
+from tools.configger import config_read, config_test, config_update
 from tools.sandhi_contraction import SandhiContractions
-from tools.utils import RenderResult, RenderedSizes, default_rendered_sizes, list_into_batches, sum_rendered_sizes
+from tools.utils import RenderResult, RenderedSizes, default_rendered_sizes, sum_rendered_sizes
 
 class PaliWordTemplates:
     def __init__(self, pth: ProjectPaths):
-        self.header_templ = Template(filename=str(pth.header_templ_path))
-        self.dpd_definition_templ = Template(filename=str(pth.dpd_definition_templ_path))
-        self.button_box_templ = Template(filename=str(pth.button_box_templ_path))
-        self.grammar_templ = Template(filename=str(pth.grammar_templ_path))
-        self.example_templ = Template(filename=str(pth.example_templ_path))
-        self.inflection_templ = Template(filename=str(pth.inflection_templ_path))
-        self.family_root_templ = Template(filename=str(pth.family_root_templ_path))
-        self.family_word_templ = Template(filename=str(pth.family_word_templ_path))
-        self.family_compound_templ = Template(filename=str(pth.family_compound_templ_path))
-        self.family_set_templ = Template(filename=str(pth.family_set_templ_path))
-        self.frequency_templ = Template(filename=str(pth.frequency_templ_path))
-        self.feedback_templ = Template(filename=str(pth.feedback_templ_path))
+        self.header_templ = get_template(pth, pth.header_templ_path)
+        self.header_linked_templ = get_template(pth, pth.header_linked_templ_path)
+        self.dpd_definition_templ = get_template(pth, pth.dpd_definition_templ_path)
+        self.button_box_templ = get_template(pth, pth.button_box_templ_path)
+        self.grammar_templ = get_template(pth, pth.grammar_templ_path)
+        self.example_templ = get_template(pth, pth.example_templ_path)
+        self.inflection_templ = get_template(pth, pth.inflection_templ_path)
+        self.family_root_templ = get_template(pth, pth.family_root_templ_path)
+        self.family_word_templ = get_template(pth, pth.family_word_templ_path)
+        self.family_compound_templ = get_template(pth, pth.family_compound_templ_path)
+        self.family_set_templ = get_template(pth, pth.family_set_templ_path)
+        self.frequency_templ = get_template(pth, pth.frequency_templ_path)
+        self.feedback_templ = get_template(pth, pth.feedback_templ_path)
 
         with open(pth.dpd_css_path) as f:
             dpd_css = f.read()
@@ -61,51 +65,56 @@ class PaliWordTemplates:
             button_js = f.read()
         self.button_js = js_minify(button_js)
 
-def get_family_compounds_for_pali_word(i: PaliWord) -> List[FamilyCompound]:
-    db_session = object_session(i)
-    if db_session is None:
-        raise Exception("No db_session")
+class FamilyIndexes(TypedDict):
+    family_compounds: Dict[str, FamilyCompound]
+    family_sets: Dict[str, FamilySet]
+    pali_roots: Dict[str, PaliRoot]
+
+def load_family_indexes(db_session: Session) -> FamilyIndexes:
+    """Load all compound families, sets and roots in three queries, instead
+    of three queries for every word. Having all the roots in the session also
+    means PaliWord.rt is found in the identity map, without a query."""
+
+    return FamilyIndexes(
+        family_compounds = {
+            fc.compound_family: fc
+            for fc in db_session.query(FamilyCompound).all()},
+        family_sets = {
+            fs.set: fs
+            for fs in db_session.query(FamilySet).all()},
+        pali_roots = {
+            rt.root: rt
+            for rt in db_session.query(PaliRoot).all()},
+    )
+
+def get_family_compounds_for_pali_word(
+        i: PaliWord,
+        family_compounds: Dict[str, FamilyCompound]) -> List[FamilyCompound]:
 
     if i.family_compound:
-        fc = db_session.query(
-            FamilyCompound
-        ).filter(
-            FamilyCompound.compound_family.in_(i.family_compound_list),
-        ).all()
+        # in the order of the family compound list
+        fc = [
+            family_compounds[compound_family]
+            for compound_family in dict.fromkeys(i.family_compound_list)
+            if compound_family in family_compounds]
 
-        # sort by order of the  family compound list
-        word_order = i.family_compound_list
-        fc = sorted(fc, key=lambda x: word_order.index(x.compound_family))
+    elif i.pali_clean in family_compounds:
+        fc = [family_compounds[i.pali_clean]]
 
     else:
-        fc = db_session.query(
-            FamilyCompound
-        ).filter(
-            FamilyCompound.compound_family == i.pali_clean
-        ).all()
-
-    # Make sure it's not a lazy-loaded iterable.
-    fc = list(fc)
+        fc = []
 
     return fc
 
-def get_family_set_for_pali_word(i: PaliWord) -> List[FamilySet]:
-    db_session = object_session(i)
-    if db_session is None:
-        raise Exception("No db_session")
-
-    fs = db_session.query(
-        FamilySet
-    ).filter(
-        FamilySet.set.in_(i.family_set_list)
-    ).all()
-
-    # sort by order of the  family set list
-    word_order = i.family_set_list
-    fs = sorted(fs, key=lambda x: word_order.index(x.set))
+def get_family_set_for_pali_word(
+        i: PaliWord,
+        family_sets: Dict[str, FamilySet]) -> List[FamilySet]:
 
-    # Make sure it's not a lazy-loaded iterable.
-    fs = list(fs)
+    # in the order of the family set list
+    fs = [
+        family_sets[family_set]
+        for family_set in dict.fromkeys(i.family_set_list)
+        if family_set in family_sets]
 
     return fs
 
@@ -126,6 +135,8 @@ class PaliWordRenderData(TypedDict):
     sandhi_contractions: SandhiContractions
     cf_set: Set[str]
     make_link: bool
+    # the minified header shared by every word, or "" to render it inline
+    shared_header: str
 
 def render_pali_word_dpd_html(db_parts: PaliWordDbParts,
                               render_data: PaliWordRenderData) -> Tuple[RenderResult, RenderedSizes]:
@@ -167,8 +178,11 @@ def render_pali_word_dpd_html(db_parts: PaliWordDbParts,
         i.example_2 = i.example_2.replace("\n", "<br>")
 
     html: str = ""
-    header = render_header_templ(pth, tt.dpd_css, tt.button_js, tt.header_templ)
-    html += header
+    if rd["shared_header"]:
+        header = rd["shared_header"]
+    else:
+        header = render_header_templ(pth, tt.dpd_css, tt.button_js, tt.header_templ)
+        html += header
     size_dict["dpd_header"] += len(header)
 
     html += "<body>"
@@ -221,6 +235,9 @@ def render_pali_word_dpd_html(db_parts: PaliWordDbParts,
     html += "</body></html>"
     html = minify(html)
 
+    if rd["shared_header"]:
+        html = header + html
+
     synonyms: List[str] = dd.inflections_list
     synonyms = add_niggahitas(synonyms)
     for synonym in synonyms:
@@ -247,7 +264,11 @@ def generate_dpd_html(
         db_session: Session,
         pth: ProjectPaths,
         sandhi_contractions: SandhiContractions,
-        cf_set: Set[str]) -> Tuple[List[RenderResult], RenderedSizes]:
+        cf_set: Set[str],
+        spool: RenderSpool) -> RenderedSizes:
+    """Render every word in parallel batches. Each batch is written straight
+    to its own part of the spool, in batch order."""
+
     time_log.log("generate_dpd_html()")
 
     print("[green]generating dpd html")
@@ -260,7 +281,9 @@ def generate_dpd_html(
     else:
         make_link: bool = False
 
-    dpd_data_list: List[RenderResult] = []
+    header_mode = config_read("dictionary", "header") or "inline"
+    shared_header = make_shared_header(pth, word_templates, header_mode)
+    print(f"[green]header mode [white]{header_mode}")
 
     time_log.log("dpd_db = db_session.query()")
 
@@ -279,6 +302,10 @@ def generate_dpd_html(
         PaliWord.family_word == FamilyWord.word_family
     ).all()
 
+    time_log.log("family_indexes = load_family_indexes()")
+
+    family_indexes = load_family_indexes(db_session)
+
     def _add_parts(i: PaliWordDbRowItems) -> PaliWordDbParts:
         pw: PaliWord
         dd: DerivedData
@@ -288,12 +315,14 @@ def generate_dpd_html(
 
         return PaliWordDbParts(
             pali_word = pw,
-            pali_root = pw.rt,
+            pali_root = family_indexes["pali_roots"].get(pw.root_key), # type: ignore
             derived_data = dd,
             family_root = fr,
             family_word = fw,
-            family_compounds = get_family_compounds_for_pali_word(pw),
-            family_set = get_family_set_for_pali_word(pw),
+            family_compounds = get_family_compounds_for_pali_word(
+                pw, family_indexes["family_compounds"]),
+            family_set = get_family_set_for_pali_word(
+                pw, family_indexes["family_sets"]),
         )
 
     time_log.log("dpd_db_data = [_add_parts(i.tuple()) for i in dpd_db]")
@@ -304,66 +333,224 @@ def generate_dpd_html(
 
     bip()
 
-    num_logical_cores = psutil.cpu_count()
-
-    batches: List[List[PaliWordDbParts]] = list_into_batches(dpd_db_data, num_logical_cores)
-
-    processes: List[Process] = []
-    manager = Manager()
-    dpd_data_results_list: ListProxy = manager.list()
-    rendered_sizes_results_list: ListProxy = manager.list()
-
     render_data = PaliWordRenderData(
         pth = pth,
         word_templates = word_templates,
         sandhi_contractions = sandhi_contractions,
         cf_set = cf_set,
         make_link = make_link,
+        shared_header = shared_header,
     )
 
-    # Don't need to pass everything as arguments, sub-threads have access to
-    # memory objects of the parent scope. This is a good way to access shared
-    # read-only memory object between threads.
+    time_log.log("render_cache = RenderCache(...)")
+
+    # only words whose rows changed since the last export get rendered again
+    render_cache = RenderCache(
+        pth.render_cache_path, "dpd",
+        dpd_render_fingerprint(pth, render_data), str(TODAY))
+    if config_test("regenerate", "dictionary", "yes"):
+        render_cache.clear()
+    cached_hashes = render_cache.hashes()
+
+    word_hashes = [
+        (str(i["pali_word"].id), dpd_render_hash(i, sandhi_contractions, cf_set))
+        for i in dpd_db_data]
+
+    # The workers are forked with everything above in memory, and each one
+    # writes its rendered batch straight to the spool, so only the batch
+    # sizes and what changed get sent back.
+
+    def _parse_batch(
+            batch_idx: int,
+            batch: List[Tuple[PaliWordDbParts, Tuple[str, str]]]
+    ) -> Tuple[int, RenderedSizes, List[Tuple[int, str, str, RenderedSizes]]]:
+
+        cached = render_cache.read([
+            id for __i__, (id, hash) in batch
+            if cached_hashes.get(id) == hash])
+
+        res: List[Tuple[RenderResult, RenderedSizes]] = []
+        changed: List[Tuple[int, str, str, RenderedSizes]] = []
+        for pos, (i, (id, hash)) in enumerate(batch):
+            if id in cached:
+                res.append(cached[id])
+            else:
+                result, sizes = render_pali_word_dpd_html(i, render_data)
+                res.append((result, sizes))
+                changed.append((pos, id, hash, sizes))
+
+        count = write_spool_file(
+            spool.part_path(f"dpd_{batch_idx}"), [i for i, __j__ in res])
+
+        return count, sum_rendered_sizes([j for __i__, j in res]), changed
+
+    time_log.log("parallel_map_chunks(_parse_batch, ...)")
+
+    batch_results = parallel_map_chunks(
+        _parse_batch, list(zip(dpd_db_data, word_hashes)),
+        costs=[
+            100 if cached_hashes.get(id) == hash else render_cost(i)
+            for i, (id, hash) in zip(dpd_db_data, word_hashes)],
+        report=True)
+
+    time_log.log("spool.add(...)")
+    for batch_idx, (count, sizes, __changed__) in enumerate(batch_results):
+        spool.add(spool.part_path(f"dpd_{batch_idx}"), count)
+        rendered_sizes.append(sizes)
+
+    time_log.log("render_cache.save(...)")
+
+    def _changed_entries() -> Iterator[CacheEntry]:
+        """The newly rendered words, read back from the spool."""
+        for batch_idx, (__count__, __sizes__, changed) in enumerate(batch_results):
+            if not changed:
+                continue
+            changed_by_pos = {pos: (id, hash, sizes) for pos, id, hash, sizes in changed}
+            results = read_spool_file(spool.part_path(f"dpd_{batch_idx}"))
+            for pos, result in enumerate(results):
+                if pos in changed_by_pos:
+                    id, hash, sizes = changed_by_pos[pos]
+                    yield id, hash, result, sizes
+
+    rendered_count = render_cache.save(_changed_entries())
+    render_cache.prune(id for id, __hash__ in word_hashes)
+    config_update("regenerate", "dictionary", "no")
+    print(f"[green]rendered [white]{rendered_count:,} [green]reused [white]{len(word_hashes) - rendered_count:,}")
 
-    def _parse_batch(batch: List[PaliWordDbParts], batch_idx: int):
-
-        res: List[Tuple[RenderResult, RenderedSizes]] = \
-            [render_pali_word_dpd_html(i, render_data) for i in batch]
-
-        for i, j in res:
-            dpd_data_results_list.append(i)
-            rendered_sizes_results_list.append(j)
-
-        first_word = batch[0]["pali_word"]
-
-        print(f"Batch {batch_idx}: done, from {first_word.pali_1}")
+    time_log.log("total_sizes = sum_ren...")
+    total_sizes = sum_rendered_sizes(rendered_sizes)
 
+    time_log.log("generate_dpd_html() return")
+    return total_sizes
 
-    time_log.log("for batch_idx, batch in ...")
 
-    for batch_idx, batch in enumerate(batches):
-        p = Process(target=_parse_batch, args=(batch, batch_idx,))
+def dpd_render_fingerprint(
+        pth: ProjectPaths,
+        render_data: PaliWordRenderData
+) -> str:
+    """Everything every word is rendered with: the templates, css and js,
+    the rendering code and the config options."""
+
+    tt = render_data["word_templates"]
+
+    templ_paths = [
+        pth.header_templ_path,
+        pth.header_linked_templ_path,
+        pth.dpd_definition_templ_path,
+        pth.button_box_templ_path,
+        pth.grammar_templ_path,
+        pth.example_templ_path,
+        pth.inflection_templ_path,
+        pth.family_root_templ_path,
+        pth.family_word_templ_path,
+        pth.family_compound_templ_path,
+        pth.family_set_templ_path,
+        pth.frequency_templ_path,
+        pth.feedback_templ_path,
+    ]
+
+    source_paths = [
+        Path(str(sys.modules[module].__file__))
+        for module in [
+            __name__,
+            "helpers",
+            "db.models",
+            "tools.link_generator",
+            "tools.meaning_construction",
+            "tools.niggahitas",
+            "tools.pali_sort_key",
+            "tools.pos",
+        ]
+    ]
+
+    return fingerprint(
+        templ_paths + source_paths,
+        tt.dpd_css,
+        tt.button_js,
+        render_data["make_link"],
+        render_data["shared_header"])
+
+
+def dpd_render_hash(
+        i: PaliWordDbParts,
+        sandhi_contractions: SandhiContractions,
+        cf_set: Set[str]
+) -> str:
+    """Hash of all the rows a word is rendered from."""
+
+    pw = i["pali_word"]
+    dd = i["derived_data"]
+
+    inflections = set(add_niggahitas(dd.inflections_list))
+    contractions = sorted(
+        (inflection, sorted(sandhi_contractions[inflection]["contractions"]))
+        for inflection in inflections
+        if inflection in sandhi_contractions)
+
+    return hash_values(
+        row_values(pw),
+        row_values(i["pali_root"]),
+        row_values(dd),
+        row_values(i["family_root"]),
+        row_values(i["family_word"]),
+        [row_values(fc) for fc in i["family_compounds"]],
+        [row_values(fs) for fs in i["family_set"]],
+        contractions,
+        pw.pali_clean in cf_set)
+
+
+def render_cost(i: PaliWordDbParts) -> int:
+    """Rough cost of rendering a word, from the size of the html it pulls in.
+    Inflection tables and big families dominate."""
+
+    dd = i["derived_data"]
+    cost = 1000 + len(dd.html_table or "") + len(dd.freq_html or "")
+    if i["family_root"] is not None:
+        cost += len(i["family_root"].html)
+    if i["family_word"] is not None:
+        cost += len(i["family_word"].html)
+    cost += sum(len(fc.html) for fc in i["family_compounds"])
+    cost += sum(len(fs.html) for fs in i["family_set"])
+    return cost
+
+
+def make_shared_header(
+        pth: ProjectPaths,
+        tt: PaliWordTemplates,
+        header_mode: str
+) -> str:
+    """The header for every word, rendered and minified only once.
+    inline: "", every word renders its own header with css and js.
+    shared: the full header with css and js.
+    linked: a header linking to dpd.css and dpd.js resource files."""
+
+    if header_mode == "shared":
+        header = render_header_templ(
+            pth, tt.dpd_css, tt.button_js, tt.header_templ)
+        return minify(header)
+
+    elif header_mode == "linked":
+        header = str(tt.header_linked_templ.render(
+            css_file=pth.dpd_css_res_path.name,
+            js_file=pth.dpd_js_res_path.name))
+        return minify(header)
 
-        w = batch[0]["pali_word"]
-        print(f"Batch {batch_idx}: start, len {len(batch):>10,}, from {w.pali_1}")
+    else:
+        return ""
 
-        p.start()
-        processes.append(p)
 
-    for p in processes:
-        p.join()
+def save_header_resources(pth: ProjectPaths) -> List[Path]:
+    """Save the minified css and js linked to by the linked header."""
 
-    time_log.log("dpd_data_list = list...")
-    dpd_data_list = list(dpd_data_results_list)
+    tt = PaliWordTemplates(pth)
 
-    time_log.log("rendered_sizes = list...")
-    rendered_sizes = list(rendered_sizes_results_list)
+    with open(pth.dpd_css_res_path, "w") as f:
+        f.write(tt.dpd_css)
 
-    time_log.log("total_sizes = sum_ren...")
-    total_sizes = sum_rendered_sizes(rendered_sizes)
+    with open(pth.dpd_js_res_path, "w") as f:
+        f.write(tt.button_js)
 
-    time_log.log("generate_dpd_html() return")
-    return dpd_data_list, total_sizes
+    return [pth.dpd_css_res_path, pth.dpd_js_res_path]
 
 
 def render_header_templ(
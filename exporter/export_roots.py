@@ -6,7 +6,7 @@ from css_html_js_minify import css_minify, js_minify
 from mako.template import Template
 from minify_html import minify
 from rich import print
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, TypedDict
 
 from sqlalchemy.orm import Session
 
@@ -14,120 +14,177 @@ from export_dpd import render_header_templ
 
 from helpers import TODAY
 from db.models import PaliRoot, FamilyRoot
+from tools.mako_templates import get_template
 from tools.niggahitas import add_niggahitas
 from tools.pali_sort_key import pali_sort_key
+from tools.parallel_map import parallel_map
 from tools.paths import ProjectPaths
 from tools.tic_toc import bip, bop
-from tools.utils import RenderResult, RenderedSizes, default_rendered_sizes
+from tools.utils import RenderResult, RenderedSizes, default_rendered_sizes, sum_rendered_sizes
 
 
-def generate_root_html(db_session: Session,
-                       pth: ProjectPaths,
-                       roots_count_dict: Dict[str, int]) -> Tuple[List[RenderResult], RenderedSizes]:
-    """compile html componenents for each pali root"""
-
-    print("[green]generating roots html")
-
-    size_dict = default_rendered_sizes()
+class RootTemplates:
+    def __init__(self, pth: ProjectPaths):
+        self.header_templ = get_template(pth, pth.header_templ_path)
+        self.root_definition_templ = get_template(pth, pth.root_definition_templ_path)
+        self.root_buttons_templ = get_template(pth, pth.root_button_templ_path)
+        self.root_info_templ = get_template(pth, pth.root_info_templ_path)
+        self.root_matrix_templ = get_template(pth, pth.root_matrix_templ_path)
+        self.root_families_templ = get_template(pth, pth.root_families_templ_path)
 
-    root_data_list: List[RenderResult] = []
+        with open(pth.roots_css_path) as f:
+            roots_css = f.read()
+        self.roots_css = css_minify(roots_css)
 
-    with open(pth.roots_css_path) as f:
-        roots_css = f.read()
-    roots_css = css_minify(roots_css)
+        with open(pth.buttons_js_path) as f:
+            buttons_js = f.read()
+        self.buttons_js = js_minify(buttons_js)
 
-    with open(pth.buttons_js_path) as f:
-        buttons_js = f.read()
-    buttons_js = js_minify(buttons_js)
 
-    header_templ = Template(filename=str(pth.header_templ_path))
-    header = render_header_templ(
-        pth, css=roots_css, js=buttons_js, header_templ=header_templ)
+class RootRenderData(TypedDict):
+    pth: ProjectPaths
+    root_templates: RootTemplates
+    header: str
+    roots_count_dict: Dict[str, int]
+    family_roots: Dict[str, List[FamilyRoot]]
 
-    roots_db = db_session.query(PaliRoot).all()
-    root_db_length = len(roots_db)
 
-    bip()
+def load_family_roots(db_session: Session) -> Dict[str, List[FamilyRoot]]:
+    """All the root families in one query, grouped by root
+    and sorted in Pāḷi order."""
 
-    for counter, r in enumerate(roots_db):
+    family_roots: Dict[str, List[FamilyRoot]] = {}
+    for fr in db_session.query(FamilyRoot).all():
+        family_roots.setdefault(fr.root_id, []).append(fr)
 
-        # replace \n with html line break
-        if r.panini_root:
-            r.panini_root = r.panini_root.replace("\n", "<br>")
-        if r.panini_sanskrit:
-            r.panini_sanskrit = r.panini_sanskrit.replace("\n", "<br>")
-        if r.panini_english:
-            r.panini_english = r.panini_english.replace("\n", "<br>")
+    for frs in family_roots.values():
+        frs.sort(key=lambda x: pali_sort_key(x.root_family))
 
-        html = header
-        html += "<body>"
+    return family_roots
 
-        definition = render_root_definition_templ(pth, r, roots_count_dict)
-        html += definition
-        size_dict["root_definition"] += len(definition)
 
-        root_buttons = render_root_buttons_templ(pth, r, db_session)
-        html += root_buttons
-        size_dict["root_buttons"] += len(root_buttons)
+def generate_root_html(db_session: Session,
+                       pth: ProjectPaths,
+                       roots_count_dict: Dict[str, int]) -> Tuple[List[RenderResult], RenderedSizes]:
+    """compile html componenents for each pali root"""
 
-        root_info = render_root_info_templ(pth, r)
-        html += root_info
-        size_dict["root_info"] += len(root_info)
+    print("[green]generating roots html")
 
-        root_matrix = render_root_matrix_templ(pth, r, roots_count_dict)
-        html += root_matrix
-        size_dict["root_matrix"] += len(root_matrix)
+    rt = RootTemplates(pth)
 
-        root_families = render_root_families_templ(pth, r, db_session)
-        html += root_families
-        size_dict["root_families"] += len(root_families)
+    header = render_header_templ(
+        pth, css=rt.roots_css, js=rt.buttons_js, header_templ=rt.header_templ)
 
-        html += "</body></html>"
+    roots_db = db_session.query(PaliRoot).all()
 
-        html = minify(html)
+    render_data = RootRenderData(
+        pth = pth,
+        root_templates = rt,
+        header = header,
+        roots_count_dict = roots_count_dict,
+        family_roots = load_family_roots(db_session),
+    )
 
-        synonyms: set = set()
-        synonyms.add(r.root_clean)
-        synonyms.add(re.sub("√", "", r.root))
-        synonyms.add(re.sub("√", "", r.root_clean))
+    bip()
 
-        frs = db_session.query(
-            FamilyRoot
-        ).filter(
-            FamilyRoot.root_id == r.root,
-            FamilyRoot.root_family != "info",
-            FamilyRoot.root_family != "matrix",
-        ).all()
+    # the workers are forked with the templates and families in memory
+    results: List[Tuple[RenderResult, RenderedSizes]] = parallel_map(
+        lambda r: render_root_html(r, render_data), roots_db)
 
-        for fr in frs:
-            synonyms.add(fr.root_family)
-            synonyms.add(re.sub("√", "", fr.root_family))
+    root_data_list = [i for i, __j__ in results]
+    size_dict = sum_rendered_sizes([j for __i__, j in results])
 
-        synonyms = set(add_niggahitas(list(synonyms)))
-        size_dict["root_synonyms"] += len(str(synonyms))
+    print(f"{len(root_data_list):>10,} roots {bop():>10}")
 
-        res = RenderResult(
-            word = r.root,
-            definition_html = html,
-            definition_plain = "",
-            synonyms = list(synonyms),
-        )
+    return root_data_list, size_dict
 
-        root_data_list.append(res)
 
-        if counter % 100 == 0:
-            print(
-                f"{counter:>10,} / {root_db_length:<10,}{r.root:<20} {bop():>10}")
-            bip()
+def render_root_html(
+        r: PaliRoot,
+        render_data: RootRenderData
+) -> Tuple[RenderResult, RenderedSizes]:
+    """render the html of a single root"""
 
-    return root_data_list, size_dict
+    pth = render_data["pth"]
+    rt = render_data["root_templates"]
+    roots_count_dict = render_data["roots_count_dict"]
 
+    size_dict = default_rendered_sizes()
 
-def render_root_definition_templ(pth: ProjectPaths, r: PaliRoot, roots_count_dict):
+    # all the families of the root, and without info and matrix
+    frs = render_data["family_roots"].get(r.root, [])
+    frs_families = [
+        fr for fr in frs if fr.root_family not in ("info", "matrix")]
+
+    # replace \n with html line break
+    if r.panini_root:
+        r.panini_root = r.panini_root.replace("\n", "<br>")
+    if r.panini_sanskrit:
+        r.panini_sanskrit = r.panini_sanskrit.replace("\n", "<br>")
+    if r.panini_english:
+        r.panini_english = r.panini_english.replace("\n", "<br>")
+
+    html = render_data["header"]
+    html += "<body>"
+
+    definition = render_root_definition_templ(
+        pth, r, roots_count_dict, rt.root_definition_templ)
+    html += definition
+    size_dict["root_definition"] += len(definition)
+
+    root_buttons = render_root_buttons_templ(
+        pth, r, frs, rt.root_buttons_templ)
+    html += root_buttons
+    size_dict["root_buttons"] += len(root_buttons)
+
+    root_info = render_root_info_templ(pth, r, rt.root_info_templ)
+    html += root_info
+    size_dict["root_info"] += len(root_info)
+
+    root_matrix = render_root_matrix_templ(
+        pth, r, roots_count_dict, rt.root_matrix_templ)
+    html += root_matrix
+    size_dict["root_matrix"] += len(root_matrix)
+
+    root_families = render_root_families_templ(
+        pth, r, frs_families, rt.root_families_templ)
+    html += root_families
+    size_dict["root_families"] += len(root_families)
+
+    html += "</body></html>"
+
+    html = minify(html)
+
+    synonyms: set = set()
+    synonyms.add(r.root_clean)
+    synonyms.add(re.sub("√", "", r.root))
+    synonyms.add(re.sub("√", "", r.root_clean))
+
+    for fr in frs_families:
+        synonyms.add(fr.root_family)
+        synonyms.add(re.sub("√", "", fr.root_family))
+
+    synonyms = set(add_niggahitas(list(synonyms)))
+    size_dict["root_synonyms"] += len(str(synonyms))
+
+    res = RenderResult(
+        word = r.root,
+        definition_html = html,
+        definition_plain = "",
+        synonyms = list(synonyms),
+    )
+
+    return res, size_dict
+
+
+def render_root_definition_templ(
+        __pth__: ProjectPaths,
+        r: PaliRoot,
+        roots_count_dict: Dict[str, int],
+        root_definition_templ: Template
+) -> str:
     """render html of main root info"""
 
-    root_definition_templ = Template(filename=str(pth.root_definition_templ_path))
-
     count = roots_count_dict[r.root]
 
     return str(
@@ -137,40 +194,41 @@ def render_root_definition_templ(pth: ProjectPaths, r: PaliRoot, roots_count_dic
             today=TODAY))
 
 
-def render_root_buttons_templ(pth: ProjectPaths, r: PaliRoot, db_session: Session):
+def render_root_buttons_templ(
+        __pth__: ProjectPaths,
+        r: PaliRoot,
+        frs: List[FamilyRoot],
+        root_buttons_templ: Template
+) -> str:
     """render html of root buttons"""
 
-    root_buttons_templ = Template(filename=str(pth.root_button_templ_path))
-
-    frs = db_session.query(
-        FamilyRoot
-        ).filter(
-            FamilyRoot.root_id == r.root)
-
-    frs = sorted(frs, key=lambda x: pali_sort_key(x.root_family))
-
     return str(
         root_buttons_templ.render(
             r=r,
             frs=frs))
 
 
-def render_root_info_templ(pth: ProjectPaths, r: PaliRoot):
+def render_root_info_templ(
+        __pth__: ProjectPaths,
+        r: PaliRoot,
+        root_info_templ: Template
+) -> str:
     """render html of root grammatical info"""
 
-    root_info_templ = Template(filename=str(pth.root_info_templ_path))
-
     return str(
         root_info_templ.render(
             r=r,
             today=TODAY))
 
 
-def render_root_matrix_templ(pth: ProjectPaths, r: PaliRoot, roots_count_dict):
+def render_root_matrix_templ(
+        __pth__: ProjectPaths,
+        r: PaliRoot,
+        roots_count_dict: Dict[str, int],
+        root_matrix_templ: Template
+) -> str:
     """render html of root matrix"""
 
-    root_matrix_templ = Template(filename=str(pth.root_matrix_templ_path))
-
     count = roots_count_dict[r.root]
 
     return str(
@@ -180,21 +238,14 @@ def render_root_matrix_templ(pth: ProjectPaths, r: PaliRoot, roots_count_dict):
             today=TODAY))
 
 
-def render_root_families_templ(pth: ProjectPaths, r: PaliRoot, db_session: Session):
+def render_root_families_templ(
+        __pth__: ProjectPaths,
+        r: PaliRoot,
+        frs: List[FamilyRoot],
+        root_families_templ: Template
+) -> str:
     """render html of root families"""
 
-    root_families_templ = Template(filename=str(pth.root_families_templ_path))
-
-    frs = db_session.query(
-        FamilyRoot
-        ).filter(
-            FamilyRoot.root_id == r.root,
-            FamilyRoot.root_family != "info",
-            FamilyRoot.root_family != "matrix",
-        ).all()
-
-    frs = sorted(frs, key=lambda x: pali_sort_key(x.root_family))
-
     return str(
         root_families_templ.render(
             r=r,
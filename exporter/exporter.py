@@ -2,7 +2,7 @@
 
 """Export DPD for GoldenDict and MDict."""
 
-from typing import List
+from typing import Iterable, List
 import zipfile
 import csv
 import pickle
@@ -12,7 +12,7 @@ from pathlib import Path
 from rich import print
 from sqlalchemy.orm import Session
 
-from export_dpd import generate_dpd_html
+from export_dpd import generate_dpd_html, save_header_resources
 from export_roots import generate_root_html
 from export_epd import generate_epd_html
 from export_variant_spelling import generate_variant_spelling_html
@@ -27,8 +27,9 @@ from tools.tic_toc import tic, toc, bip, bop
 from tools.stardict import export_words_as_stardict_zip, ifo_from_opts
 from tools.sandhi_contraction import make_sandhi_contraction_dict
 from tools.paths import ProjectPaths
-from tools.configger import config_test
-from tools.utils import RenderedSizes, sum_rendered_sizes
+from tools.configger import config_read, config_test
+from tools.render_spool import RenderSpool
+from tools.utils import RenderResult, RenderedSizes, sum_rendered_sizes
 from tools import time_log
 
 tic()
@@ -40,7 +41,7 @@ def main():
     time_log.log("exporter.py::main()")
 
     pth = ProjectPaths()
-    db_session: Session = get_db_session(pth.dpd_db_path)
+    db_session: Session = get_db_session(pth.dpd_db_path, "export")
     sandhi_contractions = make_sandhi_contraction_dict(db_session)
 
     cf_set = cf_set_gen(pth)
@@ -56,57 +57,70 @@ def main():
     time_log.log("make_roots_count_dict()")
     roots_count_dict = make_roots_count_dict(db_session)
 
+    # every part of the dictionary gets spooled to disk as soon as
+    # it's rendered, and streamed from there to the writers
+    spool = RenderSpool(pth.render_spool_dir)
+
     time_log.log("generate_dpd_html()")
-    dpd_data_list, sizes = generate_dpd_html(db_session, pth, sandhi_contractions, cf_set)
+    sizes = generate_dpd_html(db_session, pth, sandhi_contractions, cf_set, spool)
     rendered_sizes.append(sizes)
 
     time_log.log("generate_root_html()")
     root_data_list, sizes = generate_root_html(db_session, pth, roots_count_dict)
+    spool.extend("roots", root_data_list)
     rendered_sizes.append(sizes)
+    del root_data_list
 
     time_log.log("generate_variant_spelling_html()")
     variant_spelling_data_list, sizes = generate_variant_spelling_html(pth)
+    spool.extend("variant_spelling", variant_spelling_data_list)
     rendered_sizes.append(sizes)
+    del variant_spelling_data_list
 
     time_log.log("generate_epd_html()")
     epd_data_list, sizes = generate_epd_html(db_session, pth)
+    spool.extend("epd", epd_data_list)
     rendered_sizes.append(sizes)
+    del epd_data_list
 
     time_log.log("generate_help_html()")
     help_data_list, sizes = generate_help_html(db_session, pth)
+    spool.extend("help", help_data_list)
     rendered_sizes.append(sizes)
+    del help_data_list
 
     db_session.close()
 
-    combined_data_list: list = (
-        dpd_data_list +
-        root_data_list +
-        variant_spelling_data_list +
-        epd_data_list +
-        help_data_list
-    )
-
     time_log.log("write_limited_datalist()")
-    write_limited_datalist(combined_data_list)
+    write_limited_datalist(spool)
 
     time_log.log("write_size_dict()")
     write_size_dict(pth, sum_rendered_sizes(rendered_sizes))
 
+    resource_paths: List[Path] = []
+    if config_read("dictionary", "header") == "linked":
+        time_log.log("save_header_resources()")
+        resource_paths = save_header_resources(pth)
+
     time_log.log("export_to_goldendict()")
-    export_to_goldendict(pth, combined_data_list)
+    export_to_goldendict(pth, spool, resource_paths)
 
     time_log.log("goldendict_unzip_and_copy()")
     goldendict_unzip_and_copy(pth)
 
     if make_mdct is True:
         time_log.log("export_to_mdict()")
-        export_to_mdict(combined_data_list, pth)
+        export_to_mdict(spool, pth)
 
     toc()
     time_log.log("exporter.py::main() return")
 
 
-def export_to_goldendict(pth: ProjectPaths, data_list: list) -> None:
+def export_to_goldendict(
+        pth: ProjectPaths,
+        data_list: Iterable[RenderResult],
+        resource_paths: List[Path]
+) -> None:
     """generate goldedict zip"""
     bip()
 
@@ -127,6 +141,10 @@ def export_to_goldendict(pth: ProjectPaths, data_list: list) -> None:
         destination = 'dpd/android.bmp'
         zipf.write(source_path, destination)
 
+        # add css and js linked from the header
+        for resource_path in resource_paths:
+            zipf.write(resource_path, f"dpd/res/{resource_path.name}")
+
     print(f"{bop():>29}")
 
 
@@ -163,7 +181,7 @@ def write_size_dict(pth: ProjectPaths, size_dict):
     print(f"{bop():>38}")
 
 
-def write_limited_datalist(combined_data_list):
+def write_limited_datalist(combined_data_list: Iterable[RenderResult]):
     """A limited dataset for troubleshooting purposes"""
 
     limited_data_list = [
@@ -27,7 +27,7 @@ def cf_set_gen(pth: ProjectPaths) -> Set[str]:
     if _cached_cf_set is not None:
         return _cached_cf_set
 
-    db_session = get_db_session(pth.dpd_db_path)
+    db_session = get_db_session(pth.dpd_db_path, "export")
     cf_db = db_session.query(
         PaliWord
     ).filter(PaliWord.family_compound != ""
@@ -2,37 +2,29 @@
 
 """Prepare data and export to MDict."""
 
-from functools import reduce
 from rich import print
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, Tuple
 from tools.tic_toc import bip, bop
 from tools.writemdict.writemdict import MDictWriter
 
 
-def mdict_synonyms(all_items, item):
-    all_items.append((item['word'], item['definition_html']))
-    for word in item['synonyms']:
-        if word != item['word']:
-            all_items.append((word, f"""@@@LINK={item["word"]}"""))
-    return all_items
+def mdict_items(data_list: Iterable[Dict]) -> Iterator[Tuple[str, str]]:
+    """Each entry with 'MDict' and an h3 tag, followed by links from all
+    its synonyms, streamed straight into the writer."""
 
+    for i in data_list:
+        word = i['word']
+        definition_html = i['definition_html'].replace("GoldenDict", "MDict")
+        yield word, f"<h3>{word}</h3>{definition_html}"
 
-def export_to_mdict(data_list: List[Dict], PTH) -> None:
-    print("[green]converting to mdict")
+        link = f"@@@LINK={word}"
+        for synonym in i['synonyms']:
+            if synonym != word:
+                yield synonym, link
 
-    bip()
-    print("[white]adding 'mdict' and h3 tag", end=" ")
-    for i in data_list:
-        i['definition_html'] = i['definition_html'].replace(
-            "GoldenDict", "MDict")
-        i['definition_html'] = f"<h3>{i['word']}</h3>{i['definition_html']}"
-    print(bop())
 
-    bip()
-    print("[white]reducing synonyms", end=" ")
-    dpd_data = reduce(mdict_synonyms, data_list, [])
-    del data_list
-    print(bop())
+def export_to_mdict(data_list: Iterable[Dict], PTH) -> None:
+    print("[green]converting to mdict")
 
     print("[white]writing mdict", end=" ")
 
@@ -43,7 +35,7 @@ the Digital Pāḷi Dictionary website</a></p>"""
 
     bip()
     writer = MDictWriter(
-        dpd_data,
+        mdict_items(data_list),
         title="Digital Pāḷi Dictionary",
         description=description)
     print(bop())
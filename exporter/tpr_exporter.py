@@ -5,20 +5,21 @@
 import csv
 import json
 import os
-import pandas as pd
 import re
 import sqlite3
 
 from rich import print
-from mako.template import Template
 from sqlalchemy.orm import Session
+from typing import List
 from zipfile import ZipFile, ZIP_DEFLATED
 
 from db.get_db_session import get_db_session
 from db.models import PaliWord, PaliRoot, Sandhi
 from export_dpd import render_dpd_definition_templ
+from tools.mako_templates import get_template
 from tools.pali_sort_key import pali_sort_key
 from tools.paths import ProjectPaths
+from tools.sql_dump import SqlDumpWriter, SqlTable, copy_tables_to_db
 from tools.tic_toc import tic, toc
 from tools.headwords_clean_set import make_clean_headwords_set
 from tools.uposatha_day import uposatha_today
@@ -31,15 +32,16 @@ def main():
     print("[bright_yellow]generate tpr data")
 
     pth = ProjectPaths()
-    db_session: Session = get_db_session(pth.dpd_db_path)
+    db_session: Session = get_db_session(pth.dpd_db_path, "export")
 
     dpd_db = db_session.query(PaliWord).all()
     all_headwords_clean = make_clean_headwords_set(dpd_db)
     tpr_data_list = generate_tpr_data(pth, db_session, dpd_db, all_headwords_clean)
     sandhi_data_list = generate_sandhi_data(db_session, all_headwords_clean)
     write_tsvs(pth, tpr_data_list, sandhi_data_list)
-    tpr_df, i2h_df, sandhi_df = copy_to_sqlite_db(pth, tpr_data_list, sandhi_data_list)
-    tpr_updater(pth, tpr_df, i2h_df, sandhi_df)
+    tpr_tables = make_tpr_tables(pth, tpr_data_list, sandhi_data_list)
+    copy_to_sqlite_db(tpr_tables)
+    tpr_updater(pth, tpr_tables)
     copy_zip_to_tpr_downloads(pth)
     toc()
 
@@ -48,7 +50,7 @@ def generate_tpr_data(pth: ProjectPaths, db_session: Session, dpd_db, __all_head
     print("[green]compiling pali word data")
     dpd_length = len(dpd_db)
     tpr_data_list = []
-    dpd_definition_templ = Template(filename=str(pth.dpd_definition_templ_path))
+    dpd_definition_templ = get_template(pth, pth.dpd_definition_templ_path)
 
     for counter, i in enumerate(dpd_db):
 
@@ -278,99 +280,64 @@ def write_tsvs(pth: ProjectPaths, tpr_data_list, sandhi_data_list):
         writer.writerows(sandhi_data_list)
 
 
-def copy_to_sqlite_db(pth: ProjectPaths, tpr_data_list, sandhi_data_list):
+def make_tpr_tables(pth: ProjectPaths, tpr_data_list, sandhi_data_list) -> List[SqlTable]:
+    """The rows of the three tpr tables, in the order of the sql updater."""
+
+    with open(pth.tpr_i2h_tsv_path, newline="") as f:
+        reader = csv.reader(f, delimiter="\t")
+        next(reader)
+        i2h_rows = [(row[0], row[1]) for row in reader]
+
+    return [
+        SqlTable(
+            name="dpd_inflections_to_headwords",
+            columns=["inflection", "headwords"],
+            rows=i2h_rows),
+        SqlTable(
+            name="dpd",
+            columns=["word", "definition", "book_id"],
+            rows=[
+                (i["word"], i["definition"], i["book_id"])
+                for i in tpr_data_list]),
+        SqlTable(
+            name="dpd_word_split",
+            columns=["word", "breakup"],
+            rows=[(i["word"], i["breakup"]) for i in sandhi_data_list]),
+    ]
+
+
+def copy_to_sqlite_db(tpr_tables: List[SqlTable]):
     print("[green]copying data_list to tpr db", end=" ")
 
-    # data frames
-    tpr_df = pd.DataFrame(tpr_data_list)
-    i2h_df = pd.read_csv(pth.tpr_i2h_tsv_path, sep="\t")
-    sandhi_df = pd.DataFrame(sandhi_data_list)
-
     try:
         conn = sqlite3.connect(
             '../../.local/share/tipitaka_pali_reader/tipitaka_pali.db')
-        c = conn.cursor()
-
-        # dpd table
-        c.execute("DROP TABLE if exists dpd")
-        c.execute("CREATE TABLE dpd (word, definition, book_id)")
-        tpr_df.to_sql('dpd', conn, if_exists='append', index=False)
-
-        # inflection_to_headwords
-        c.execute("DROP TABLE if exists dpd_inflections_to_headwords")
-        c.execute(
-            "CREATE TABLE dpd_inflections_to_headwords (inflection, headwords)")
-        i2h_df.to_sql(
-            'dpd_inflections_to_headwords',
-            conn, if_exists='append', index=False)
-
-        # dpd_word_split
-        c.execute("DROP TABLE if exists dpd_word_split")
-        c.execute(
-            "CREATE TABLE dpd_word_split (word, breakup)")
-        sandhi_df.to_sql(
-            'dpd_word_split',
-            conn, if_exists='append', index=False)
-        print("[white]ok")
-
+        copy_tables_to_db(conn, tpr_tables)
         conn.close()
-
-        return tpr_df, i2h_df, sandhi_df
+        print("[white]ok")
 
     except Exception as e:
         print("[red] an error occurred copying to db")
         print(f"[red]{e}")
-        return tpr_df, i2h_df, sandhi_df
 
 
-def tpr_updater(pth: ProjectPaths, tpr_df, i2h_df, sandhi_df):
+def tpr_updater(pth: ProjectPaths, tpr_tables: List[SqlTable]):
     print("[green]making tpr sql updater")
 
-    sql_string = ""
-    sql_string += "BEGIN TRANSACTION;\n"
-    sql_string += "DELETE FROM dpd;\n"
-    sql_string += "DELETE FROM dpd_inflections_to_headwords;\n"
-    sql_string += "DELETE FROM dpd_word_split;\n"
-    sql_string += "COMMIT;\n"
-    sql_string += "BEGIN TRANSACTION;\n"
-
-    print("writing inflections to headwords")
-
-    for row in range(len(i2h_df)):
-        inflection = i2h_df.iloc[row, 0]
-        headword = i2h_df.iloc[row, 1]
-        headword = headword.replace("'", "''")
-        if row % 50000 == 0:
-            print(f"{row:>10,} / {len(i2h_df):<10,}{inflection:<10}")
-        sql_string += f"""INSERT INTO "dpd_inflections_to_headwords" \
-("inflection", "headwords") VALUES ('{inflection}', '{headword}');\n"""
-
-    print("writing dpd")
-
-    for row in range(len(tpr_df)):
-        word = tpr_df.iloc[row, 0]
-        definition = tpr_df.iloc[row, 1]
-        definition = definition.replace("'", "''")
-        book_id = tpr_df.iloc[row, 2]
-        if row % 50000 == 0:
-            print(f"{row:>10,} / {len(tpr_df):<10,}{word:<10}")
-        sql_string += f"""INSERT INTO "dpd" ("word","definition","book_id")\
- VALUES ('{word}', '{definition}', {book_id});\n"""
-
-    print("writing deconstructor")
-
-    for row in range(len(sandhi_df)):
-        word = sandhi_df.iloc[row, 0]
-        breakup = sandhi_df.iloc[row, 1]
-        if row % 50000 == 0:
-            print(f"{row:>10,} / {len(sandhi_df):<10,}{word:<10}")
-        sql_string += f"""INSERT INTO "dpd_word_split" ("word","breakup")\
- VALUES ('{word}', '{breakup}');\n"""
-
-    sql_string += "COMMIT;\n"
-
     with open(pth.tpr_sql_file_path, "w") as f:
-        f.write(sql_string)
+        dump = SqlDumpWriter(f)
+
+        dump.begin()
+        for table in tpr_tables:
+            dump.delete_all(table["name"])
+        dump.commit()
+
+        dump.begin()
+        for table in tpr_tables:
+            count = dump.insert_rows(
+                table["name"], table["columns"], table["rows"])
+            print(f"{table['name']:<30}{count:>10,}")
+        dump.commit()
 
 
 def copy_zip_to_tpr_downloads(pth: ProjectPaths):
@@ -4,11 +4,8 @@
 
 import psutil
 from typing import List, Tuple, TypedDict
-import pandas as pd
 import pickle
 import re
-from multiprocessing.managers import ListProxy
-from multiprocessing import Process, Manager
 
 from rich import print
 from mako.template import Template
@@ -20,10 +17,12 @@ from db.models import PaliWord, DerivedData
 
 from tools.pos import INDECLINABLES, CONJUGATIONS, DECLENSIONS
 from tools.configger import config_test, config_update
+from tools.frequency_matrix import FrequencyMatrix, load_frequency_matrix
+from tools.mako_templates import get_template
+from tools.parallel_map import parallel_map_chunks
 from tools.tic_toc import tic, toc
 from tools.superscripter import superscripter_uni
 from tools.paths import ProjectPaths
-from tools.utils import list_into_batches
 
 
 def main():
@@ -54,9 +53,10 @@ def main():
         changed_headwords = []
         html_file_missing = []
 
-    dicts = make_dfs_and_dicts(pth)
+    print("[green]loading frequency matrix")
+    freq_matrix = load_frequency_matrix(pth)
     num_logical_cores = psutil.cpu_count()
-    make_data_dict_and_html(pth, db_session, dicts, num_logical_cores, regenerate_all)
+    make_data_dict_and_html(pth, db_session, freq_matrix, num_logical_cores, regenerate_all)
     db_session.close()
 
     # config update
@@ -127,165 +127,6 @@ def test_html_file_missing(db_session: Session):
         print("ok")
 
 
-def make_dfs_and_dicts(pth: ProjectPaths) -> List[dict]:
-    print("[green]making word count dicts and df's")
-
-    wc_dir = pth.word_count_dir
-
-    vinaya_pārājika_mūla = pd.read_csv(wc_dir.joinpath("vinaya_pārājika_mūla.csv"), sep="\t", header=None)
-    vinaya_pārājika_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("vinaya_pārājika_aṭṭhakathā.csv"), sep="\t", header=None)
-    vinaya_ṭīkā = pd.read_csv(wc_dir.joinpath("vinaya_ṭīkā.csv"), sep="\t", header=None)
-    vinaya_pācittiya_mūla = pd.read_csv(wc_dir.joinpath("vinaya_pācittiya_mūla.csv"), sep="\t", header=None)
-    vinaya_pācittiya_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("vinaya_pācittiya_aṭṭhakathā.csv"), sep="\t", header=None)
-    vinaya_mahāvagga_mūla = pd.read_csv(wc_dir.joinpath("vinaya_mahāvagga_mūla.csv"), sep="\t", header=None)
-    vinaya_mahāvagga_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("vinaya_mahāvagga_aṭṭhakathā.csv"), sep="\t", header=None)
-    vinaya_cūḷavagga_mūla = pd.read_csv(wc_dir.joinpath("vinaya_cūḷavagga_mūla.csv"), sep="\t", header=None)
-    vinaya_cūḷavagga_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("vinaya_cūḷavagga_aṭṭhakathā.csv"), sep="\t", header=None)
-    vinaya_parivāra_mūla = pd.read_csv(wc_dir.joinpath("vinaya_parivāra_mūla.csv"), sep="\t", header=None)
-    vinaya_parivāra_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("vinaya_parivāra_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_dīgha_mūla = pd.read_csv(wc_dir.joinpath("sutta_dīgha_mūla.csv"), sep="\t", header=None)
-    sutta_dīgha_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_dīgha_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_dīgha_ṭīkā = pd.read_csv(wc_dir.joinpath("sutta_dīgha_ṭīkā.csv"), sep="\t", header=None)
-    sutta_majjhima_mūla = pd.read_csv(wc_dir.joinpath("sutta_majjhima_mūla.csv"), sep="\t", header=None)
-    sutta_majjhima_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_majjhima_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_majjhima_ṭīkā = pd.read_csv(wc_dir.joinpath("sutta_majjhima_ṭīkā.csv"), sep="\t", header=None)
-    sutta_saṃyutta_mūla = pd.read_csv(wc_dir.joinpath("sutta_saṃyutta_mūla.csv"), sep="\t", header=None)
-    sutta_saṃyutta_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_saṃyutta_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_saṃyutta_ṭīkā = pd.read_csv(wc_dir.joinpath("sutta_saṃyutta_ṭīkā.csv"), sep="\t", header=None)
-    sutta_aṅguttara_mūla = pd.read_csv(wc_dir.joinpath("sutta_aṅguttara_mūla.csv"), sep="\t", header=None)
-    sutta_aṅguttara_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_aṅguttara_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_aṅguttara_ṭīkā = pd.read_csv(wc_dir.joinpath("sutta_aṅguttara_ṭīkā.csv"), sep="\t", header=None)
-    sutta_khuddaka1_mūla = pd.read_csv(wc_dir.joinpath("sutta_khuddaka1_mūla.csv"), sep="\t", header=None)
-    sutta_khuddaka1_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_khuddaka1_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_khuddaka2_mūla = pd.read_csv(wc_dir.joinpath("sutta_khuddaka2_mūla.csv"), sep="\t", header=None)
-    sutta_khuddaka2_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_khuddaka2_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_khuddaka3_mūla = pd.read_csv(wc_dir.joinpath("sutta_khuddaka3_mūla.csv"), sep="\t", header=None)
-    sutta_khuddaka3_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("sutta_khuddaka3_aṭṭhakathā.csv"), sep="\t", header=None)
-    sutta_khuddaka3_ṭīkā = pd.read_csv(wc_dir.joinpath("sutta_khuddaka3_ṭīkā.csv"), sep="\t", header=None)
-    abhidhamma_dhammasaṅgaṇī_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_dhammasaṅgaṇī_mūla.csv"), sep="\t", header=None)
-    abhidhamma_vibhāṅga_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_vibhāṅga_mūla.csv"), sep="\t", header=None)
-    abhidhamma_dhātukathā_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_dhātukathā_mūla.csv"), sep="\t", header=None)
-    abhidhamma_puggalapaññatti_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_puggalapaññatti_mūla.csv"), sep="\t", header=None)
-    abhidhamma_kathāvatthu_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_kathāvatthu_mūla.csv"), sep="\t", header=None)
-    abhidhamma_yamaka_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_yamaka_mūla.csv"), sep="\t", header=None)
-    abhidhamma_paṭṭhāna_mūla = pd.read_csv(wc_dir.joinpath("abhidhamma_paṭṭhāna_mūla.csv"), sep="\t", header=None)
-    abhidhamma_aṭṭhakathā = pd.read_csv(wc_dir.joinpath("abhidhamma_aṭṭhakathā.csv"), sep="\t", header=None)
-    abhidhamma_ṭīkā = pd.read_csv(wc_dir.joinpath("abhidhamma_ṭīkā.csv"), sep="\t", header=None)
-    aññā_visuddhimagga = pd.read_csv(wc_dir.joinpath("aññā_visuddhimagga.csv"), sep="\t", header=None)
-    aññā_visuddhimagga_ṭīkā = pd.read_csv(wc_dir.joinpath("aññā_visuddhimagga_ṭīkā.csv"), sep="\t", header=None)
-    aññā_leḍī = pd.read_csv(wc_dir.joinpath("aññā_leḍī.csv"), sep="\t", header=None)
-    aññā_buddha_vandanā = pd.read_csv(wc_dir.joinpath("aññā_buddha_vandanā.csv"), sep="\t", header=None)
-    aññā_vaṃsa = pd.read_csv(wc_dir.joinpath("aññā_vaṃsa.csv"), sep="\t", header=None)
-    aññā_byākaraṇa = pd.read_csv(wc_dir.joinpath("aññā_byākaraṇa.csv"), sep="\t", header=None)
-    aññā_pucchavisajjana = pd.read_csv(wc_dir.joinpath("aññā_pucchavisajjana.csv"), sep="\t", header=None)
-    aññā_nīti = pd.read_csv(wc_dir.joinpath("aññā_nīti.csv"), sep="\t", header=None)
-    aññā_pakiṇṇaka = pd.read_csv(wc_dir.joinpath("aññā_pakiṇṇaka.csv"), sep="\t", header=None)
-    aññā_sihaḷa = pd.read_csv(wc_dir.joinpath("aññā_sihaḷa.csv"), sep="\t", header=None)
-
-    vinaya_pārājika_mūla_dict = dict(vinaya_pārājika_mūla.values.tolist())
-    vinaya_pārājika_aṭṭhakathā_dict = dict(vinaya_pārājika_aṭṭhakathā.values.tolist())
-    vinaya_ṭīkā_dict = dict(vinaya_ṭīkā.values.tolist())
-    vinaya_pācittiya_mūla_dict = dict(vinaya_pācittiya_mūla.values.tolist())
-    vinaya_pācittiya_aṭṭhakathā_dict = dict(vinaya_pācittiya_aṭṭhakathā.values.tolist())
-    vinaya_mahāvagga_mūla_dict = dict(vinaya_mahāvagga_mūla.values.tolist())
-    vinaya_mahāvagga_aṭṭhakathā_dict = dict(vinaya_mahāvagga_aṭṭhakathā.values.tolist())
-    vinaya_cūḷavagga_mūla_dict = dict(vinaya_cūḷavagga_mūla.values.tolist())
-    vinaya_cūḷavagga_aṭṭhakathā_dict = dict(vinaya_cūḷavagga_aṭṭhakathā.values.tolist())
-    vinaya_parivāra_mūla_dict = dict(vinaya_parivāra_mūla.values.tolist())
-    vinaya_parivāra_aṭṭhakathā_dict = dict(vinaya_parivāra_aṭṭhakathā.values.tolist())
-    sutta_dīgha_mūla_dict = dict(sutta_dīgha_mūla.values.tolist())
-    sutta_dīgha_aṭṭhakathā_dict = dict(sutta_dīgha_aṭṭhakathā.values.tolist())
-    sutta_dīgha_ṭīkā_dict = dict(sutta_dīgha_ṭīkā.values.tolist())
-    sutta_majjhima_mūla_dict = dict(sutta_majjhima_mūla.values.tolist())
-    sutta_majjhima_aṭṭhakathā_dict = dict(sutta_majjhima_aṭṭhakathā.values.tolist())
-    sutta_majjhima_ṭīkā_dict = dict(sutta_majjhima_ṭīkā.values.tolist())
-    sutta_saṃyutta_mūla_dict = dict(sutta_saṃyutta_mūla.values.tolist())
-    sutta_saṃyutta_aṭṭhakathā_dict = dict(sutta_saṃyutta_aṭṭhakathā.values.tolist())
-    sutta_saṃyutta_ṭīkā_dict = dict(sutta_saṃyutta_ṭīkā.values.tolist())
-    sutta_aṅguttara_mūla_dict = dict(sutta_aṅguttara_mūla.values.tolist())
-    sutta_aṅguttara_aṭṭhakathā_dict = dict(sutta_aṅguttara_aṭṭhakathā.values.tolist())
-    sutta_aṅguttara_ṭīkā_dict = dict(sutta_aṅguttara_ṭīkā.values.tolist())
-    sutta_khuddaka1_mūla_dict = dict(sutta_khuddaka1_mūla.values.tolist())
-    sutta_khuddaka1_aṭṭhakathā_dict = dict(sutta_khuddaka1_aṭṭhakathā.values.tolist())
-    sutta_khuddaka2_mūla_dict = dict(sutta_khuddaka2_mūla.values.tolist())
-    sutta_khuddaka2_aṭṭhakathā_dict = dict(sutta_khuddaka2_aṭṭhakathā.values.tolist())
-    sutta_khuddaka3_mūla_dict = dict(sutta_khuddaka3_mūla.values.tolist())
-    sutta_khuddaka3_aṭṭhakathā_dict = dict(sutta_khuddaka3_aṭṭhakathā.values.tolist())
-    sutta_khuddaka3_ṭīkā_dict = dict(sutta_khuddaka3_ṭīkā.values.tolist())
-    abhidhamma_dhammasaṅgaṇī_mūla_dict = dict(abhidhamma_dhammasaṅgaṇī_mūla.values.tolist())
-    abhidhamma_vibhāṅga_mūla_dict = dict(abhidhamma_vibhāṅga_mūla.values.tolist())
-    abhidhamma_dhātukathā_mūla_dict = dict(abhidhamma_dhātukathā_mūla.values.tolist())
-    abhidhamma_puggalapaññatti_mūla_dict = dict(abhidhamma_puggalapaññatti_mūla.values.tolist())
-    abhidhamma_kathāvatthu_mūla_dict = dict(abhidhamma_kathāvatthu_mūla.values.tolist())
-    abhidhamma_yamaka_mūla_dict = dict(abhidhamma_yamaka_mūla.values.tolist())
-    abhidhamma_paṭṭhāna_mūla_dict = dict(abhidhamma_paṭṭhāna_mūla.values.tolist())
-    abhidhamma_aṭṭhakathā_dict = dict(abhidhamma_aṭṭhakathā.values.tolist())
-    abhidhamma_ṭīkā_dict = dict(abhidhamma_ṭīkā.values.tolist())
-    aññā_visuddhimagga_dict = dict(aññā_visuddhimagga.values.tolist())
-    aññā_visuddhimagga_ṭīkā_dict = dict(aññā_visuddhimagga_ṭīkā.values.tolist())
-    aññā_leḍī_dict = dict(aññā_leḍī.values.tolist())
-    aññā_buddha_vandanā_dict = dict(aññā_buddha_vandanā.values.tolist())
-    aññā_vaṃsa_dict = dict(aññā_vaṃsa.values.tolist())
-    aññā_byākaraṇa_dict = dict(aññā_byākaraṇa.values.tolist())
-    aññā_pucchavisajjana_dict = dict(aññā_pucchavisajjana.values.tolist())
-    aññā_nīti_dict = dict(aññā_nīti.values.tolist())
-    aññā_pakiṇṇaka_dict = dict(aññā_pakiṇṇaka.values.tolist())
-    aññā_sihaḷa_dict = dict(aññā_sihaḷa.values.tolist())
-
-    dicts = [
-        vinaya_pārājika_mūla_dict,
-        vinaya_pārājika_aṭṭhakathā_dict,
-        vinaya_ṭīkā_dict,
-        vinaya_pācittiya_mūla_dict,
-        vinaya_pācittiya_aṭṭhakathā_dict,
-        vinaya_mahāvagga_mūla_dict,
-        vinaya_mahāvagga_aṭṭhakathā_dict,
-        vinaya_cūḷavagga_mūla_dict,
-        vinaya_cūḷavagga_aṭṭhakathā_dict,
-        vinaya_parivāra_mūla_dict,
-        vinaya_parivāra_aṭṭhakathā_dict,
-        sutta_dīgha_mūla_dict,
-        sutta_dīgha_aṭṭhakathā_dict,
-        sutta_dīgha_ṭīkā_dict,
-        sutta_majjhima_mūla_dict,
-        sutta_majjhima_aṭṭhakathā_dict,
-        sutta_majjhima_ṭīkā_dict,
-        sutta_saṃyutta_mūla_dict,
-        sutta_saṃyutta_aṭṭhakathā_dict,
-        sutta_saṃyutta_ṭīkā_dict,
-        sutta_aṅguttara_mūla_dict,
-        sutta_aṅguttara_aṭṭhakathā_dict,
-        sutta_aṅguttara_ṭīkā_dict,
-        sutta_khuddaka1_mūla_dict,
-        sutta_khuddaka1_aṭṭhakathā_dict,
-        sutta_khuddaka2_mūla_dict,
-        sutta_khuddaka2_aṭṭhakathā_dict,
-        sutta_khuddaka3_mūla_dict,
-        sutta_khuddaka3_aṭṭhakathā_dict,
-        sutta_khuddaka3_ṭīkā_dict,
-        abhidhamma_dhammasaṅgaṇī_mūla_dict,
-        abhidhamma_aṭṭhakathā_dict,
-        abhidhamma_ṭīkā_dict,
-        abhidhamma_vibhāṅga_mūla_dict,
-        abhidhamma_dhātukathā_mūla_dict,
-        abhidhamma_puggalapaññatti_mūla_dict,
-        abhidhamma_kathāvatthu_mūla_dict,
-        abhidhamma_yamaka_mūla_dict,
-        abhidhamma_paṭṭhāna_mūla_dict,
-        aññā_visuddhimagga_dict,
-        aññā_visuddhimagga_ṭīkā_dict,
-        aññā_leḍī_dict,
-        aññā_buddha_vandanā_dict,
-        aññā_vaṃsa_dict,
-        aññā_byākaraṇa_dict,
-        aññā_pucchavisajjana_dict,
-        aññā_nīti_dict,
-        aññā_pakiṇṇaka_dict,
-        aññā_sihaḷa_dict
-    ]
-    return dicts
-
-
 def colourme(value, hi, low):
     value = value
     hi = hi
@@ -333,21 +174,15 @@ class ParsedResult(TypedDict):
     id: int
     freq_html: str
 
-def _parse_item_pair(i: PaliWord, j: DerivedData, dicts: List[dict]) -> ParsedResult:
-    inflections = j.inflections_list
-
-    section = 1
+def _parse_item_pair(
+        i: PaliWord,
+        j: DerivedData,
+        counts: List[int],
+        freq_templ: Template
+) -> ParsedResult:
     d = {}
-    for dict in dicts:
-        count = 0
-        for inflection in inflections:
-            if inflection in dict:
-                infl = dict.get(inflection)
-                if infl is not None:
-                    count += infl
-
+    for section, count in enumerate(counts, start=1):
         d[str(section)] = {"data": count, "class": ""}
-        section += 1
 
     d_values = [v["data"] for __k__, v, in d.items()]
 
@@ -375,8 +210,7 @@ def _parse_item_pair(i: PaliWord, j: DerivedData, dicts: List[dict]) -> ParsedRe
         elif i.pos in DECLENSIONS:
             map_html += f"""<p class="heading underlined">Exact matches of <b>{superscripter_uni(i.pali_1)} and its declensions</b> in the Chaṭṭha Saṅgāyana corpus.</p>"""
 
-        template = Template(filename='frequency/frequency.html')
-        map_html += str(template.render(d=d))
+        map_html += str(freq_templ.render(d=d))
 
     else:
         map_html += f"""<p class="heading">There are no exact matches of <b>{superscripter_uni(i.pali_1)} or it's inflections</b> in the Chaṭṭha Saṅgāyana corpus.</p>"""
@@ -385,7 +219,7 @@ def _parse_item_pair(i: PaliWord, j: DerivedData, dicts: List[dict]) -> ParsedRe
 
 def make_data_dict_and_html(pth: ProjectPaths,
                             db_session: Session,
-                            dicts: List[dict],
+                            freq_matrix: FrequencyMatrix,
                             use_n_processes: int,
                             regenerate_all: bool):
     print("[green]compiling data csvs and html")
@@ -405,27 +239,27 @@ def make_data_dict_and_html(pth: ProjectPaths,
     # Filter the PaliWord and Derived data list, while keeping the related items together in a Tuple.
     filtered_pairs: List[ItemPair] = [(i, j) for (i, j) in zip(dpd_db, dd_db) if _keep(i)]
 
-    # Split the list into batches, each batch will be assigned to a Process() thread.
-    batches: List[List[ItemPair]] = list_into_batches(filtered_pairs, use_n_processes)
-
-    processes: List[Process] = []
+    # Count all the inflections of every headword in every section in one go.
+    freq_counts = freq_matrix.headword_counts(
+        [j.inflections_list for (__i__, j) in filtered_pairs])
+    counts_dict = {
+        i.id: counts for (i, __j__), counts
+        in zip(filtered_pairs, freq_counts.tolist())}
 
-    # The Manager allows shared memory between the worker threads.
-    manager = Manager()
-    results_list: ListProxy = manager.list()
+    # Compile the template before the workers are forked, so they all share it.
+    freq_templ = get_template(pth, pth.freq_map_templ_path)
 
-    # Don't need to pass everything as arguments, sub-threads have access to
-    # memory objects of the parent scope. This is a good way to access shared
-    # read-only memory object between threads.
+    # Don't need to pass everything as arguments, the forked workers have
+    # access to memory objects of the parent scope. This is a good way to
+    # access shared read-only memory object between processes.
 
-    def _parse_batch(batch: List[ItemPair], batch_idx: int):
-        """Takes a batch of items (and the necessary lookup dicts for the work), applies the work with _parse_item_pair() to each work item.
+    def _parse_batch(batch_idx: int, batch: List[ItemPair]) -> List[ParsedResult]:
+        """Takes a batch of items (and the necessary counts for the work), applies the work with _parse_item_pair() to each work item.
 
-        The results are added to a ListProxy, which is going to be a list() in shared memory from the multiprocessing Manager().
+        The results of the whole batch are sent back to the main process in one go.
         """
 
-        res = [_parse_item_pair(i, j, dicts) for (i, j) in batch]
-        results_list.extend(res)
+        res = [_parse_item_pair(i, j, counts_dict[i.id], freq_templ) for (i, j) in batch]
 
         # Save the details of the first item of the batch for logging and review.
         first_word, _ = batch[0]
@@ -438,34 +272,15 @@ def make_data_dict_and_html(pth: ProjectPaths,
                 first_word.pali_1).with_suffix(".html"), "w") as f:
             f.write(first_map_html)
 
-    for batch_idx, batch in enumerate(batches):
-        # Assign a Process() thread to each batch list.
-        p = Process(target=_parse_batch, args=(batch, batch_idx,))
-        w, _ = batch[0]
-        print(f"Batch {batch_idx}: start, len {len(batch):>10,}, from {w.pali_1}")
-
-        # Start the Process's target function, i.e. _parse_batch()
-        p.start()
-
-        # Keep a handle to the process.
-        processes.append(p)
-
-    # At this point the thread workers are started.
-    #
-    # However, the main thread will not automatically wait for sub-threads to
-    # complete, it would simply continue (and exit), terminating the worker
-    # threads before they complete.
-
-    # Process.join() blocks the main thread (i.e. makes it wait) until the
-    # process whose join() method is called terminates.
-    for p in processes:
-        p.join()
+        return res
 
-    # At this point all worker processes are completed and the main thread will
-    # continue.
+    # Split the list into batches and map them over a pool of worker processes.
+    # The results come back in the same order as the batches.
+    batch_results = parallel_map_chunks(
+        _parse_batch, filtered_pairs, num_workers=use_n_processes, report=True)
 
-    # Convert the ListProxy from Manager() back to a regular list()
-    add_to_db: List[ParsedResult] = list(results_list)
+    add_to_db: List[ParsedResult] = [
+        i for batch_res in batch_results for i in batch_res]
 
     # Add the results to the database.
     print("[green]adding to db", end=" ")
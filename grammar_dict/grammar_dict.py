@@ -13,13 +13,15 @@ from mako.template import Template
 from os import popen
 from pathlib import Path
 from rich import print
-from typing import List
+from sqlalchemy.orm import Session
+from typing import Dict, List, Sequence, Set, Tuple, TypedDict
 
 from db.get_db_session import get_db_session
 from db.models import PaliWord, Sandhi, InflectionTemplates
 
 from tools.goldendict_path import goldedict_path
 from tools.niggahitas import add_niggahitas
+from tools.parallel_map import parallel_map_chunks
 from tools.pali_sort_key import pali_sort_key
 from tools.paths import ProjectPaths
 from tools.tic_toc import tic, toc
@@ -30,6 +32,24 @@ from tools.writemdict.writemdict import MDictWriter
 
 sys.path.insert(1, 'tools/writemdict')
 
+# (grammar, inflection)
+TemplateInflections = List[Tuple[str, str]]
+
+# {inflection: {(headword, pos, grammar): None}}, an ordered set of each
+DataLines = Dict[str, Dict[Tuple[str, str, str], None]]
+
+# {inflection: {"<tr>...</tr>": None}}
+HtmlLines = Dict[str, Dict[str, None]]
+
+
+class GrammarWord(TypedDict):
+    pali_1: str
+    pali_clean: str
+    pos: str
+    stem: str
+    pattern: str
+
+
 def main():
     tic()
     """Generating a grammar dictionary which shows
@@ -92,13 +112,6 @@ def main():
 
     print("[green]generating grammar dictionary")
 
-    # grammar_dict structure {inflection: [(headword, pos, grammar)]}
-    grammar_dict = {}
-
-    # grammar_dict_html structure {inflection: "html"}
-    grammar_dict_html = {}
-    grammar_dict_table = {}
-
     with open(pth.grammar_css_path) as f:
         grammar_css = f.read()
 
@@ -109,109 +122,31 @@ def main():
     html_header += "<body><div class='grammar_dict'><table class='grammar_dict'>"
     html_table_header = "<div class='dpd_grammar'><table class='dpd_grammar'>"
 
-    for counter, i in enumerate(db):
-        # words with ! in stem must get inflection table but no synonsyms
-        if "!" in i.stem:
-            i.stem = "!"
-        # remove * from irregular inflections
-        if i.stem == "*":
-            i.stem = ""
-
-        # process indeclinables
-        if i.stem == "-":
-            data_line = (i.pali_1, i.pos, "indeclineable")
-            html_line = f"<tr><td><b>{i.pos}</b></td><td colspan='3'>indeclineable</td></tr>"
-
-            # grammar_dict update
-            if i.pali_clean not in grammar_dict:
-                grammar_dict[i.pali_clean] = [data_line]
-            else:
-                if data_line not in grammar_dict[i.pali_clean]:
-                    grammar_dict[i.pali_clean].append(data_line)
+    words: List[GrammarWord] = [
+        GrammarWord(
+            pali_1=i.pali_1,
+            pali_clean=i.pali_clean,
+            pos=i.pos,
+            stem=i.stem,
+            pattern=i.pattern)
+        for i in db]
+    template_inflections = load_template_inflections(db_session)
+    data_lines, html_lines = generate_grammar_lines(
+        words, template_inflections, all_words_set)
 
-            # grammar_dict_html update
-            if i.pali_clean not in grammar_dict_html:
-                grammar_dict_html[i.pali_clean] = f"{html_header}{html_line}"
-                grammar_dict_table[i.pali_clean] = f"{html_table_header}{html_line}"
-            else:
-                if html_line not in grammar_dict_html[i.pali_clean]:
-                    grammar_dict_html[i.pali_clean] += html_line
-                    grammar_dict_table[i.pali_clean] += html_line
-
-        elif i.stem == "!":
-            # !!! this must get added
-            pass
-
-        elif not i.pali_1:
-            # !!! this must get added
-            pass
+    # grammar_dict structure {inflection: [(headword, pos, grammar)]}
+    grammar_dict = {
+        inflection: list(lines) for inflection, lines in data_lines.items()}
 
-        # generate all inflections
-        else:
-            # get template
-            template = db_session.query(
-                InflectionTemplates
-            ).filter(
-                InflectionTemplates.pattern == i.pattern
-            ).first()
-
-            template_data = loads(template.data)
-
-            # data is a nest of lists
-            # list[] table
-            # list[[]] row
-            # list[[[]]] cell
-            # row 0 is the top header
-            # column 0 is the grammar header
-            # odd rows > 0 are inflections
-            # even rows > 0 are grammar info
-
-            for row_number, row_data in enumerate(template_data):
-
-                for column_number, cell_data in enumerate(row_data):
-
-                    if (row_number > 0 and
-                        column_number % 2 == 1 and
-                            column_number > 0):
-                        grammar: str = [row_data[column_number+1]][0][0]
-
-                        for inflection in cell_data:
-                            if inflection:
-                                inflected_word = f"{i.stem}{inflection}"
-                                if inflected_word in all_words_set:
-
-                                    data_line = (i.pali_1, i.pos, grammar)
-                                    html_line = "<tr>"
-                                    html_line += f"<td><b>{i.pos}</b></td>"
-                                    html_line += f"<td>{grammar}</td>"
-                                    html_line += "<td>of</td>"
-                                    html_line += f"<td>{i.pali_clean}</td>"
-                                    html_line += "</tr>"
-
-                                    # grammar_dict update
-                                    if inflected_word not in grammar_dict:
-                                        grammar_dict[inflected_word] = [data_line]
-                                    else:
-                                        if data_line not in grammar_dict[inflected_word]:
-                                            grammar_dict[inflected_word].append(data_line)
-
-                                    # grammar_dict_html update
-                                    if inflected_word not in grammar_dict_html:
-                                        grammar_dict_html[inflected_word] = f"{html_header}{html_line}"
-                                        grammar_dict_table[inflected_word] = f"{html_table_header}{html_line}"
-                                    else:
-                                        if html_line not in grammar_dict_html[inflected_word]:
-                                            grammar_dict_html[inflected_word] += html_line
-                                            grammar_dict_table[inflected_word] += html_line
-
-        if counter % 5000 == 0:
-            print(f"{counter:>10,} / {len(db):<10,}{i.pali_1[:17]:>17}")
-
-    for item in grammar_dict_html:
-        grammar_dict_html[item] += "</table></div></body></html>"
-
-    for item in grammar_dict_table:
-        grammar_dict_table[item] += "</table></div>"
+    # grammar_dict_html structure {inflection: "html"}
+    grammar_dict_html = {}
+    grammar_dict_table = {}
+    for inflection, lines in html_lines.items():
+        rows = "".join(lines)
+        grammar_dict_html[inflection] = \
+            f"{html_header}{rows}</table></div></body></html>"
+        grammar_dict_table[inflection] = \
+            f"{html_table_header}{rows}</table></div>"
 
     print(f"[green]saving grammar_dict pickle{len(grammar_dict):>14,}")
     # save pickle file
@@ -234,6 +169,118 @@ def main():
     toc()
 
 
+def load_template_inflections(
+        db_session: Session
+) -> Dict[str, TemplateInflections]:
+    """Every (grammar, inflection) of every inflection template,
+    in table order."""
+
+    # data is a nest of lists
+    # list[] table
+    # list[[]] row
+    # list[[[]]] cell
+    # row 0 is the top header
+    # column 0 is the grammar header
+    # odd rows > 0 are inflections
+    # even rows > 0 are grammar info
+
+    template_inflections = {}
+    for template in db_session.query(InflectionTemplates).all():
+        inflections: TemplateInflections = []
+        for row_data in loads(template.data)[1:]:
+            for column_number in range(1, len(row_data), 2):
+                grammar: str = row_data[column_number+1][0]
+                for inflection in row_data[column_number]:
+                    if inflection:
+                        inflections.append((grammar, inflection))
+        template_inflections[template.pattern] = inflections
+
+    return template_inflections
+
+
+def grammar_lines_for_words(
+        words: Sequence[GrammarWord],
+        template_inflections: Dict[str, TemplateInflections],
+        all_words_set: Set[str]
+) -> Tuple[DataLines, HtmlLines]:
+    """The data lines and html rows of every inflected word of the words,
+    each kept once in the order they are first found."""
+
+    data_lines: DataLines = {}
+    html_lines: HtmlLines = {}
+
+    def add_line(inflected_word, data_line, html_line):
+        if inflected_word not in data_lines:
+            data_lines[inflected_word] = {}
+            html_lines[inflected_word] = {}
+        data_lines[inflected_word][data_line] = None
+        html_lines[inflected_word][html_line] = None
+
+    for i in words:
+        stem = i["stem"]
+        # words with ! in stem must get inflection table but no synonsyms
+        if "!" in stem:
+            stem = "!"
+        # remove * from irregular inflections
+        if stem == "*":
+            stem = ""
+
+        # process indeclinables
+        if stem == "-":
+            add_line(
+                i["pali_clean"],
+                (i["pali_1"], i["pos"], "indeclineable"),
+                f"<tr><td><b>{i['pos']}</b></td><td colspan='3'>indeclineable</td></tr>")
+
+        elif stem == "!":
+            # !!! this must get added
+            pass
+
+        elif not i["pali_1"]:
+            # !!! this must get added
+            pass
+
+        # generate all inflections
+        else:
+            for grammar, inflection in template_inflections[i["pattern"]]:
+                inflected_word = f"{stem}{inflection}"
+                if inflected_word in all_words_set:
+                    add_line(
+                        inflected_word,
+                        (i["pali_1"], i["pos"], grammar),
+                        f"<tr><td><b>{i['pos']}</b></td><td>{grammar}</td><td>of</td><td>{i['pali_clean']}</td></tr>")
+
+    return data_lines, html_lines
+
+
+def generate_grammar_lines(
+        words: List[GrammarWord],
+        template_inflections: Dict[str, TemplateInflections],
+        all_words_set: Set[str]
+) -> Tuple[DataLines, HtmlLines]:
+    """Find the lines of batches of words in parallel, and merge them in
+    order, so the result is the same as finding them one word at a time."""
+
+    def _batch_lines(__batch_idx__: int, batch: Sequence[GrammarWord]):
+        return grammar_lines_for_words(
+            batch, template_inflections, all_words_set)
+
+    data_lines: DataLines = {}
+    html_lines: HtmlLines = {}
+    for batch_data_lines, batch_html_lines in parallel_map_chunks(
+            _batch_lines, words):
+        for inflected_word, lines in batch_data_lines.items():
+            if inflected_word not in data_lines:
+                data_lines[inflected_word] = lines
+                html_lines[inflected_word] = batch_html_lines[inflected_word]
+            else:
+                data_lines[inflected_word].update(lines)
+                html_lines[inflected_word].update(
+                    batch_html_lines[inflected_word])
+
+    return data_lines, html_lines
+
+
 def make_data_lists(grammar_dict_html):
     gd_data_list: List[dict] = []
     md_data_list: List[dict] = []
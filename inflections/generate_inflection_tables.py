@@ -7,8 +7,10 @@ import json
 import pickle
 
 from rich import print
-from typing import List, Dict, Tuple
+from sqlalchemy.dialects.sqlite import insert
+from typing import List, Dict, Optional, Tuple, TypedDict, Union
 
+from db.bulk_load import column_defaults
 from db.get_db_session import get_db_session
 from db.models import PaliWord, InflectionTemplates, DerivedData
 
@@ -17,10 +19,12 @@ from tools.tic_toc import tic, toc
 from tools.pos import CONJUGATIONS
 from tools.pos import DECLENSIONS
 from tools.superscripter import superscripter_uni
+from tools.parallel_map import parallel_map
 from tools.paths import ProjectPaths
 
 
 PTH = ProjectPaths()
+DERIVED_DATA_DEFAULTS = column_defaults(DerivedData.__table__)  # type: ignore
 db_session = get_db_session(PTH.dpd_db_path)
 dpd_db = db_session.query(PaliWord).all()
 
@@ -33,6 +37,21 @@ with open(PTH.all_tipitaka_words_path, "rb") as f:
     all_tipitaka_words: set = pickle.load(f)
 
 
+class WordParts(TypedDict):
+    id: int
+    pali_1: str
+    pali_clean: str
+    pos: str
+    stem: str
+    pattern: str
+
+
+class CompiledTemplate(TypedDict):
+    like: Optional[str]
+    # literal html, or (inflection, html before the word, html after the word)
+    parts: List[Union[str, Tuple[str, str, str]]]
+
+
 def main():
     """main program"""
     tic()
@@ -48,78 +67,111 @@ def main():
         test_changes()
 
     print("[green]generating html tables and lists")
-    add_to_db = []
+    changed_headwords_set = set(changed_headwords)
+    changed_templates_set = set(changed_templates)
+    words: List[WordParts] = []
     for i in dpd_db:
 
-        test1 = i.pali_1 in changed_headwords
-        test2 = i.pattern in changed_templates
+        test1 = i.pali_1 in changed_headwords_set
+        test2 = i.pattern in changed_templates_set
         test3 = regenerate_all is True
 
         if test1 or test2 or test3:
+            words.append(WordParts(
+                id=i.id,
+                pali_1=i.pali_1,
+                pali_clean=i.pali_clean,
+                pos=i.pos,
+                stem=i.stem,
+                pattern=i.pattern))
 
-            # regenerate is true then delete the whole table
-            # regenerate is false then just delete the row
-            # pattern != "" then add html table and list
-            # stem contains "!" then add table and clean headword
-            # pattern == "" then no table, just add clean headword
+    compiled_templates = compile_templates()
+    add_to_db = generate_derived_data(words, compiled_templates)
 
-            if regenerate_all is True:
-                db_session.execute(DerivedData.__table__.delete()) # type: ignore
+    print("[green]adding to db", end=" ")
+    save_derived_data(add_to_db, regenerate_all)
+    print(f"{len(add_to_db):,}")
 
-            else:
-                exists = db_session.query(DerivedData).filter(
-                    DerivedData.id == i.id).first()
+    with open(PTH.changed_headwords_path, "wb") as f:
+        pickle.dump(changed_headwords, f)
 
-                if exists is not None:
-                    db_session.delete(exists)
+    with open(PTH.template_changed_path, "wb") as f:
+        pickle.dump(changed_templates, f)
 
-            if i.pattern:
-                html, inflections_list = generate_inflection_table(i)
+    # # !!! find all unused patterns !!!
 
-                derived_data = DerivedData(
-                    id=i.id,
-                    # pali_1=i.pali_1,
-                    inflections=",".join(inflections_list),
-                    html_table=html
-                )
+    # config update
+    config_update("regenerate", "inflections", "no")
 
-                if "!" in i.stem:
-                    derived_data = DerivedData(
-                        id=i.id,
-                        # pali_1=i.pali_1,
-                        inflections=i.pali_clean,
-                        html_table=html,
-                    )
+    db_session.close()
+    toc()
 
-            else:
-                derived_data = DerivedData(
-                    id=i.id,
-                    inflections=i.pali_clean
-                )
 
-            add_to_db.append(derived_data)
+def generate_derived_data(
+        words: List[WordParts],
+        compiled_templates: Dict[str, CompiledTemplate]
+) -> List[Dict]:
+    """Generate the derived data rows of all the words in parallel.
+    The workers are forked after the templates are compiled, so they all
+    share them."""
 
-    db_session.commit()
+    def _parse_word(word: WordParts) -> Dict:
+        return derived_data_row_for_word(word, compiled_templates)
 
-    print("[green]adding to db")
+    return parallel_map(_parse_word, words)
 
-    for row in add_to_db:
-        db_session.add(row)
 
-    with open(PTH.changed_headwords_path, "wb") as f:
-        pickle.dump(changed_headwords, f)
+def derived_data_row_for_word(
+        word: WordParts,
+        compiled_templates: Dict[str, CompiledTemplate]
+) -> Dict:
+    """pattern != "" then add html table and list
+    stem contains "!" then add table and clean headword
+    pattern == "" then no table, just add clean headword"""
 
-    with open(PTH.template_changed_path, "wb") as f:
-        pickle.dump(changed_templates, f)
+    if word["pattern"]:
+        html, inflections_list = generate_inflection_table(
+            word, compiled_templates)
 
-    # # !!! find all unused patterns !!!
+        if "!" in word["stem"]:
+            return derived_data_row(word["id"], word["pali_clean"], html)
+        else:
+            return derived_data_row(
+                word["id"], ",".join(inflections_list), html)
 
-    # config update
-    config_update("regenerate", "inflections", "no")
+    else:
+        return derived_data_row(word["id"], word["pali_clean"], "")
+
+
+def derived_data_row(id: int, inflections: str, html_table: str) -> Dict:
+    """A whole derived_data row, the other columns get reset to their
+    defaults, just like a newly added row."""
+
+    return {
+        **DERIVED_DATA_DEFAULTS,
+        "id": id,
+        "inflections": inflections,
+        "html_table": html_table,
+    }
+
+
+def save_derived_data(add_to_db: List[Dict], regenerate_all: bool) -> None:
+    """Write all the rows in one transaction. Regenerate all empties the
+    table first, otherwise changed rows get replaced with an upsert."""
+
+    if regenerate_all is True:
+        db_session.execute(DerivedData.__table__.delete())  # type: ignore
+
+    if add_to_db:
+        stmt = insert(DerivedData)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DerivedData.id],
+            set_={
+                column: stmt.excluded[column]
+                for column in add_to_db[0] if column != "id"})
+        db_session.execute(stmt, add_to_db)
 
     db_session.commit()
-    db_session.close()
-    toc()
 
 
 def test_inflection_template_changed():
@@ -292,88 +344,119 @@ def test_changes() -> None:
     test_missing_id()
 
 
-def generate_inflection_table(i: PaliWord) -> Tuple[str, list]:
+def compile_templates() -> Dict[str, CompiledTemplate]:
+    """Parse every inflection template once into a flat list of html parts,
+    so a table is only the stem added to each inflection."""
+
+    compiled_templates: Dict[str, CompiledTemplate] = {}
+
+    for t in db_session.query(InflectionTemplates).all():
+        if not t.data:
+            continue
+
+        table_data = json.loads(t.data)
+        parts: List[Union[str, Tuple[str, str, str]]] = []
+
+        # data is a nest of lists
+        # list[] table
+        # list[[]] row
+        # list[[[]]] cell
+        # row 0 is the top header
+        # column 0 is the grammar header
+        # odd rows > 0 are inflections
+        # even rows > 0 are grammar info
+
+        for row_number, row_data in enumerate(table_data):
+            parts.append("<tr>")
+            for column_number, cell_data in enumerate(row_data):
+                if row_number == 0:
+                    if column_number == 0:
+                        parts.append("<th></th>")
+                    if column_number % 2 == 1:
+                        parts.append(f"<th>{cell_data[0]}</th>")
+                elif row_number > 0:
+                    if column_number == 0:
+                        parts.append(f"<th>{cell_data[0]}</th>")
+                    elif column_number % 2 == 1 and column_number > 0:
+                        title: str = row_data[column_number + 1][0]
+
+                        for inflection in cell_data:
+                            if not inflection:
+                                parts.append(f"<td title='{title}'></td>")
+                            elif len(cell_data) == 1:
+                                parts.append(
+                                    (inflection, f"<td title='{title}'>", "</td>"))
+                            elif inflection == cell_data[0]:
+                                parts.append(
+                                    (inflection, f"<td title='{title}'>", "<br>"))
+                            elif inflection != cell_data[-1]:
+                                parts.append((inflection, "", "<br>"))
+                            else:
+                                parts.append((inflection, "", "</td>"))
+
+            parts.append("</tr>")
+
+        compiled_templates[t.pattern] = CompiledTemplate(
+            like=t.like, parts=parts)
+
+    return compiled_templates
+
+
+def generate_inflection_table(
+        word: WordParts,
+        compiled_templates: Dict[str, CompiledTemplate]
+) -> Tuple[str, list]:
     """generate the inflection table based on stem + pattern and template"""
 
-    if i.it is None or i.it.data is None:
+    template = compiled_templates.get(word["pattern"])
+    if template is None:
         return "", []
 
-    table_data = json.loads(i.it.data)
-    inflections_list: list = [i.pali_clean]
+    pos = word["pos"]
+    inflections_list: list = [word["pali_clean"]]
+    inflections_set: set = {word["pali_clean"]}
 
     # heading
-    html: str = "<p class='heading'>"
-    html += f"<b>{superscripter_uni(i.pali_1)}</b> is <b>{i.pattern}</b> "
-    if i.it.like != "irreg":
-        if i.pos in CONJUGATIONS:
-            html += "conjugation "
-        elif i.pos in DECLENSIONS:
-            html += "declension "
-        html += f"(like <b>{i.it.like})</b>"
+    html: List[str] = ["<p class='heading'>"]
+    html.append(
+        f"<b>{superscripter_uni(word['pali_1'])}</b> is <b>{word['pattern']}</b> ")
+    if template["like"] != "irreg":
+        if pos in CONJUGATIONS:
+            html.append("conjugation ")
+        elif pos in DECLENSIONS:
+            html.append("declension ")
+        html.append(f"(like <b>{template['like']})</b>")
     else:
-        if i.pos in CONJUGATIONS:
-            html += "conjugation "
-        if i.pos in DECLENSIONS:
-            html += "declension "
-        html += "(irregular)"
-    html += "</p>"
-
-    html += "<table class='inflection'>"
-    stem = re.sub(r"\!|\*", "", i.stem)
-
-    # data is a nest of lists
-    # list[] table
-    # list[[]] row
-    # list[[[]]] cell
-    # row 0 is the top header
-    # column 0 is the grammar header
-    # odd rows > 0 are inflections
-    # even rows > 0 are grammar info
-
-    for row in enumerate(table_data):
-        row_number: int = row[0]
-        row_data: List[list] = row[1]
-        html += "<tr>"
-        for column in enumerate(row_data):
-            column_number: int = column[0]
-            cell_data: List = column[1]
-            if row_number == 0:
-                if column_number == 0:
-                    html += "<th></th>"
-                if column_number % 2 == 1:
-                    html += f"<th>{cell_data[0]}</th>"
-            elif row_number > 0:
-                if column_number == 0:
-                    html += f"<th>{cell_data[0]}</th>"
-                elif column_number % 2 == 1 and column_number > 0:
-                    title: str = [row_data[column_number + 1]][0][0]
-
-                    for inflection in cell_data:
-                        if not inflection:
-                            html += f"<td title='{title}'></td>"
-                        else:
-                            word_clean = f"{stem}{inflection}"
-                            if word_clean in all_tipitaka_words:
-                                word = f"{stem}<b>{inflection}</b>"
-                            else:
-                                word = f"<span class='gray'>{stem}<b>{inflection}</b></span>"
-
-                            if len(cell_data) == 1:
-                                html += f"<td title='{title}'>{word}</td>"
-                            else:
-                                if inflection == cell_data[0]:
-                                    html += f"<td title='{title}'>{word}<br>"
-                                elif inflection != cell_data[-1]:
-                                    html += f"{word}<br>"
-                                else:
-                                    html += f"{word}</td>"
-                            if word_clean not in inflections_list:
-                                inflections_list.append(word_clean)
-
-        html += "</tr>"
-    html += "</table>"
-
-    return html, inflections_list
+        if pos in CONJUGATIONS:
+            html.append("conjugation ")
+        if pos in DECLENSIONS:
+            html.append("declension ")
+        html.append("(irregular)")
+    html.append("</p>")
+
+    html.append("<table class='inflection'>")
+    stem = re.sub(r"\!|\*", "", word["stem"])
+
+    for part in template["parts"]:
+        if isinstance(part, str):
+            html.append(part)
+            continue
+
+        inflection, before, after = part
+        word_clean = f"{stem}{inflection}"
+        if word_clean in all_tipitaka_words:
+            html.append(f"{before}{stem}<b>{inflection}</b>{after}")
+        else:
+            html.append(
+                f"{before}<span class='gray'>{stem}<b>{inflection}</b></span>{after}")
+
+        if word_clean not in inflections_set:
+            inflections_set.add(word_clean)
+            inflections_list.append(word_clean)
+
+    html.append("</table>")
+
+    return "".join(html), inflections_list
 
 
 if __name__ == "__main__":
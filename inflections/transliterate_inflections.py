@@ -17,24 +17,23 @@ from subprocess import check_output
 from typing import Dict, List, TypedDict
 
 import psutil
-from multiprocessing.managers import ListProxy
-from multiprocessing import Process, Manager
+
+from sqlalchemy.orm import selectinload
 
 from db.get_db_session import get_db_session
 from db.models import PaliWord
 
 from tools.configger import config_test, config_update
 from tools.tic_toc import tic, toc
+from tools.parallel_map import parallel_map_chunks
 from tools.paths import ProjectPaths
-from tools.utils import list_into_batches
 
 def _parse_batch(batch: List[PaliWord],
                  pth: ProjectPaths,
                  changed_headwords: list,
                  changed_templates: list,
                  regenerate_all: bool,
-                 results_list: ListProxy,
-                 batch_idx: int):
+                 batch_idx: int) -> Dict[str, "WordInflections"]:
 
     # aksharamukha works much faster with large text files than smaller lists
     # inflections_to_transliterate_string contains the inflections,
@@ -168,13 +167,13 @@ def _parse_batch(batch: List[PaliWord],
             translit_dict[headword]["thai"].update(
                 set(new_inflections[headword]["thai"]))
 
-    results_list.append(translit_dict)
-
     json_input_for_translit.unlink()
     json_output_from_translit.unlink()
 
     print(f"Batch {batch_idx}: done, from {batch[0].pali_1}")
 
+    return translit_dict
+
 
 class WordInflections(TypedDict):
     sinhala: set
@@ -186,7 +185,10 @@ def main():
 
     pth = ProjectPaths()
     db_session = get_db_session(pth.dpd_db_path)
-    dpd_db = db_session.query(PaliWord).all()
+    # the costs and the workers need the derived data of every word,
+    # so it's loaded up front instead of one lazy query at a time
+    dpd_db = db_session.query(PaliWord).options(
+        selectinload(PaliWord.dd)).all()
 
     with open(pth.changed_headwords_path, "rb") as f:
         changed_headwords: list = pickle.load(f)
@@ -205,31 +207,36 @@ def main():
 
     print(f"[green]regenerate all [white]{regenerate_all}")
 
-    num_logical_cores = psutil.cpu_count()
-    batches: List[List[PaliWord]] = list_into_batches(dpd_db, num_logical_cores)
-
-    processes: List[Process] = []
-    manager = Manager()
-    results_list: ListProxy = manager.list()
-
-    for batch_idx, batch in enumerate(batches):
-        p = Process(target=_parse_batch, args=(batch,
-                                               pth,
-                                               changed_headwords,
-                                               changed_templates,
-                                               regenerate_all,
-                                               results_list,
-                                               batch_idx,))
-
+    def _parse_chunk(batch_idx: int, batch: List[PaliWord]):
         print(f"Batch {batch_idx}: start, len {len(batch):>10,}, from {batch[0].pali_1}")
+        return _parse_batch(batch,
+                            pth,
+                            changed_headwords,
+                            changed_templates,
+                            regenerate_all,
+                            batch_idx)
+
+    def _cost(i: PaliWord) -> int:
+        """Only the changed words get transliterated."""
+        if (
+            regenerate_all
+            or i.pattern in changed_templates
+            or i.pali_1 in changed_headwords
+        ):
+            return 10 + len(i.dd.inflections_list)
+        else:
+            return 1
 
-        p.start()
-        processes.append(p)
-
-    for p in processes:
-        p.join()
-
-    results_translit_dict: List[Dict[str, WordInflections]] = list(results_list)
+    # aksharamukha is faster with large batches, so only two batches per core,
+    # of roughly equal amounts of inflections
+    num_logical_cores = psutil.cpu_count()
+    results_translit_dict: List[Dict[str, WordInflections]] = \
+        parallel_map_chunks(
+            _parse_chunk, dpd_db,
+            num_workers=num_logical_cores,
+            num_chunks=num_logical_cores * 2,
+            costs=[_cost(i) for i in dpd_db],
+            report=True)
 
     translit_dict: Dict[str, WordInflections] = dict()
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""Benchmark the sandhi splitter on a fixed sample of words.
+Compares the rules index against scanning every rule at each split position,
+and shows how often the split cache is hit.
+Args:
+--sample = number of words in the sample (default 500)
+"""
+
+import argparse
+import pickle
+import time
+
+from rich import print
+from typing import Dict, List, Tuple
+
+import sandhi_splitter as ss
+
+from tools.paths import ProjectPaths
+
+
+class RulesScan:
+    """Stand-in for the rules index which scans every rule,
+    the way the splitter worked before the index."""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get(self, key: Tuple[str, str], default):
+        chA, chB = key
+        found = [
+            (rule, values["ch1"], values["ch2"])
+            for rule, values in self.rules.items()
+            if values["chA"] == chA and values["chB"] == chB]
+        return found or default
+
+
+def main():
+    print("[bright_yellow]sandhi splitter benchmark")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sample", type=int, default=500, help="Number of words to split")
+    args = parser.parse_args()
+
+    pth = ProjectPaths()
+    setup_globals(pth)
+
+    rules_index = ss.rules_index
+    sample = make_sample(ss.unmatched_set, args.sample)
+    print(f"[green]{'sample':<20}[white]{len(sample):>10,}")
+
+    scan_time, scan_matches = time_sample(sample, RulesScan(ss.rules))
+    print(f"[green]{'rules scan':<20}[white]{scan_time:>10.2f}s")
+
+    index_time, index_matches = time_sample(sample, rules_index)
+    print(f"[green]{'rules index':<20}[white]{index_time:>10.2f}s")
+
+    hits, misses = ss.split_cache_stats()
+    print(f"[green]{'cache hits':<20}[white]{hits:>10,}")
+    print(f"[green]{'cache misses':<20}[white]{misses:>10,}")
+
+    print(f"[green]{'speedup':<20}[white]{scan_time / index_time:>10.1f}x")
+
+    if scan_matches == index_matches:
+        print(f"[green]{'matches':<20}[white]{'identical':>10}")
+    else:
+        print(f"[red]{'matches':<20}{'differ!':>10}")
+
+
+def setup_globals(pth: ProjectPaths) -> None:
+    """Load the splitter's globals without touching its output files."""
+
+    ss.rules = ss.import_sandhi_rules(pth)
+    ss.rules_index = ss.make_rules_index(ss.rules)
+
+    with open(pth.unmatched_set_path, "rb") as f:
+        ss.unmatched_set = pickle.load(f)
+
+    with open(pth.all_inflections_set_path, "rb") as f:
+        ss.all_inflections_set = pickle.load(f)
+
+    (ss.inflections_trie,
+        ss.inflections_trie_reversed) = ss.load_inflections_tries(pth)
+
+
+def make_sample(unmatched_set, sample_size: int) -> List[str]:
+    """Every nth word of the sorted unmatched set, so the sample is
+    the same on every run."""
+
+    words = sorted(
+        word for word in unmatched_set
+        if len(word) <= ss.max_word_length
+        and word not in ss.problem_children)
+
+    step = max(1, len(words) // sample_size)
+    return words[::step][:sample_size]
+
+
+def time_sample(
+        sample: List[str],
+        rules_index
+) -> Tuple[float, Dict[str, List]]:
+    """Split every word in the sample, return the time and the matches."""
+
+    ss.rules_index = rules_index
+    ss.clear_split_cache()
+    ss.matches_dict = {}
+    sample_matches = {}
+
+    start = time.perf_counter()
+    for counter, word in enumerate(sample):
+        sample_matches[word] = ss.split_word(counter, word)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, sample_matches
+
+
+if __name__ == "__main__":
+    main()
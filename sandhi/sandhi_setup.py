@@ -27,6 +27,7 @@ from db.get_db_session import get_db_session
 from tools.cst_sc_text_sets import make_cst_text_set
 from tools.cst_sc_text_sets import make_sc_text_set
 from tools.cst_sc_text_sets import make_other_pali_texts_set
+from tools.inflections_trie import save_inflections_trie
 from tools.tic_toc import tic, toc
 from tools.paths import ProjectPaths
 
@@ -134,6 +135,21 @@ def main():
 
     save_assets(pth)
 
+    def save_inflections_tries(pth: ProjectPaths) -> None:
+        """Forward trie for prefixes, reversed trie for suffixes."""
+
+        print(f"[green]{'saving inflections tries':<35}", end="")
+
+        node_count = save_inflections_trie(
+            pth.all_inflections_trie_path, all_inflections_set)
+        node_count += save_inflections_trie(
+            pth.all_inflections_trie_reversed_path,
+            set(i[::-1] for i in all_inflections_set))
+
+        print(f"[white]{node_count:>10,}")
+
+    save_inflections_tries(pth)
+
     def make_matches_dict(pth: ProjectPaths) -> None:
         print(f"[green]{'saving matches_dict':<35}", end="")
         matches_dict = {}
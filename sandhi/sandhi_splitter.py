@@ -2,15 +2,25 @@
 
 """Recursive algorithm to deconstruct compounds and split sandhi. """
 
+import argparse
+import hashlib
+import multiprocessing
 import pickle
+import psutil
 import re
+import queue
+import shutil
 import pandas as pd
 import cProfile
 
+from multiprocessing import Process, Queue
+from pathlib import Path
 from rich import print
-from typing import Optional, Set, TypedDict, Union, Self
+from typing import Dict, List, Optional, Set, Tuple, TypedDict, Union, Self
+from functools import lru_cache
 from os import popen
 
+from tools.inflections_trie import InflectionsTrie, INFLECTION, NOLAST
 from tools.pali_alphabet import vowels
 from tools.tic_toc import tic, toc, bip, bop
 from tools.paths import ProjectPaths
@@ -40,6 +50,7 @@ global max_recursions
 global profiler
 global profiler_on
 global max_word_length
+global split_cache_max_size
 clean_list_max_length = 2
 fuzzy_list_max_length = 4
 clean_word_min_length = 2
@@ -49,6 +60,7 @@ max_recursions = 15
 profiler_on = False
 profiler: Optional[cProfile.Profile] = None
 max_word_length = 100
+split_cache_max_size = 200_000
 
 problem_children = [
     "ahirikānottappakodhūpanāhamakkhapaḷāsaissāmacchariyamāyāsāṭheyyathambhasārambhamānātimānamadapamādataṇhāavijjā",
@@ -311,12 +323,15 @@ def comp(d):
     return f"{d.front}{d.word}{d.back}"
 
 
-def setup(pth: ProjectPaths):
+def setup(pth: ProjectPaths, resume: bool = False):
     print("[green]importing assets")
 
     global rules
     rules = import_sandhi_rules(pth)
 
+    global rules_index
+    rules_index = make_rules_index(rules)
+
     global shortlist_set
     shortlist_set = make_shortlist_set(pth)
 
@@ -328,12 +343,10 @@ def setup(pth: ProjectPaths):
     with open(pth.all_inflections_set_path, "rb") as f:
         all_inflections_set = pickle.load(f)
 
-    global all_inflections_nofirst
-    global all_inflections_nolast
-
-    (all_inflections_nofirst,
-        all_inflections_nolast) = make_all_inflections_nfl_nll(
-            all_inflections_set)
+    global inflections_trie
+    global inflections_trie_reversed
+    (inflections_trie,
+        inflections_trie_reversed) = load_inflections_tries(pth)
 
     # initalise matches.csv
     with open(pth.matches_path, "w") as f:
@@ -343,6 +356,11 @@ def setup(pth: ProjectPaths):
     with open(pth.sandhi_timer_path, "w") as f:
         f.write("")
 
+    # initialise worker shards, unless resuming from a checkpoint
+    if not resume:
+        for shard in pth.sandhi_shards_dir.glob("*.tsv"):
+            shard.unlink()
+
 
 def import_sandhi_rules(pth: ProjectPaths):
     print("[green]importing sandhi rules", end=" ")
@@ -383,6 +401,26 @@ def import_sandhi_rules(pth: ProjectPaths):
     return sandhi_rules
 
 
+def make_rules_index(rules) -> Dict[Tuple[str, str], List[Tuple[int, str, str]]]:
+    """Index the sandhi rules by the junction characters chA and chB,
+    so each split position only tries the rules that can apply.
+    {(chA, chB): [(rule, ch1, ch2), ...]}"""
+
+    print("[green]making sandhi rules index", end=" ")
+
+    rules_index: Dict[Tuple[str, str], List[Tuple[int, str, str]]] = {}
+
+    for rule, values in rules.items():
+        key = (values["chA"], values["chB"])
+        if key not in rules_index:
+            rules_index[key] = []
+        rules_index[key] += [(rule, values["ch1"], values["ch2"])]
+
+    print(f"[white]{len(rules_index):,}")
+
+    return rules_index
+
+
 def make_shortlist_set(pth: ProjectPaths):
 
     print("[green]making shortlist set", end=" ")
@@ -397,23 +435,216 @@ def make_shortlist_set(pth: ProjectPaths):
     return shortlist_set
 
 
-def make_all_inflections_nfl_nll(all_inflections_set):
-    """all inflections with no first letter, no last letter"""
+def load_inflections_tries(
+        pth: ProjectPaths
+) -> Tuple[InflectionsTrie, InflectionsTrie]:
+    """memory-map the inflections tries saved by sandhi_setup.
+    the forward trie finds inflections and inflections with no last letter
+    at the front of a word, the reversed trie finds inflections and
+    inflections with no first letter at the back of a word."""
+
+    print("[green]loading inflections tries", end=" ")
+
+    inflections_trie = InflectionsTrie(pth.all_inflections_trie_path)
+    inflections_trie_reversed = InflectionsTrie(
+        pth.all_inflections_trie_reversed_path)
+
+    print(f"[white]{inflections_trie.node_count:,}")
+
+    return inflections_trie, inflections_trie_reversed
+
+
+def front_list(word: str, mask: int) -> List[str]:
+    """all words in the trie at the front of the word, longest first,
+    in the same order as testing word[:-i] for i in range(len(word))"""
+
+    if not word:
+        return []
+
+    lengths = inflections_trie.prefix_lengths(word, mask)
+    front = [
+        word[:length] for length in reversed(lengths)
+        if 0 < length < len(word)]
+
+    # word[:-0] is the empty string
+    if lengths[:1] == [0]:
+        front.insert(0, "")
+
+    return front
+
+
+def back_list(word: str, mask: int) -> List[str]:
+    """all words in the reversed trie at the back of the word, longest first,
+    in the same order as testing word[i:] for i in range(len(word))"""
+
+    lengths = inflections_trie_reversed.prefix_lengths(word[::-1], mask)
+    return [
+        word[len(word) - length:] for length in reversed(lengths)
+        if length > 0]
+
+
+# compounds share long heads and tails, so the same fragments come up
+# again and again during recursion. the candidate splits of a fragment only
+# depend on the fragment itself, so they are cached across words.
+
+@lru_cache(maxsize=split_cache_max_size)
+def two_word_splits(word: str) -> Tuple[Tuple[str, str, Optional[int]], ...]:
+    """all splits of the word into two inflections,
+    rule is None for a clean split"""
+
+    splits = []
+
+    for x in range(0, len(word)-1):
+
+        wordA = word[:-x-1]
+        wordB = word[-1-x:]
+        try:
+            wordA_lastletter = wordA[len(wordA)-1]
+        except Exception:
+            wordA_lastletter = ""
+        wordB_firstletter = wordB[0]
+
+        # blah blah
+
+        if (wordA in all_inflections_set and
+                wordB in all_inflections_set):
+            splits.append((wordA, wordB, None))
+
+        # bla* *lah
 
-    print("[green]making all inflections nfl & nll", end=" ")
+        for rule, ch1, ch2 in rules_index.get(
+                (wordA_lastletter, wordB_firstletter), []):
+            word1 = wordA[:-1] + ch1
+            word2 = ch2 + wordB[1:]
 
-    all_inflections_nofirst = set()
-    all_inflections_nolast = set()
+            if (word1 in all_inflections_set and
+                    word2 in all_inflections_set):
+                splits.append((word1, word2, rule))
 
-    for inflection in all_inflections_set:
-        # no first letter
-        all_inflections_nofirst.add(inflection[1:])
-        # no last letter
-        all_inflections_nolast.add(inflection[:-1])
+    return tuple(splits)
 
-    print(f"[white]{len(all_inflections_nofirst):,}")
 
-    return all_inflections_nofirst, all_inflections_nolast
+@lru_cache(maxsize=split_cache_max_size)
+def lwff_clean_splits(word: str) -> Tuple[str, ...]:
+    """the longest clean words from the front"""
+
+    return tuple(front_list(word, INFLECTION)[:clean_list_max_length])
+
+
+@lru_cache(maxsize=split_cache_max_size)
+def lwfb_clean_splits(word: str) -> Tuple[str, ...]:
+    """the longest clean words from the back"""
+
+    return tuple(back_list(word, INFLECTION)[:clean_list_max_length])
+
+
+@lru_cache(maxsize=split_cache_max_size)
+def lwff_fuzzy_splits(
+        word: str
+) -> Tuple[Tuple[str, str, str, str, int], ...]:
+    """the longest fuzzy words from the front and the sandhi rules
+    which turn them into an inflection.
+    (wordA_fuzzy, wordB_fuzzy, word1, word2, rule)"""
+
+    splits = []
+
+    # inflections or inflections with no last letter
+    if len(word) >= fuzzy_word_min_length:
+        lwff_fuzzy_list = front_list(word, INFLECTION | NOLAST)
+    else:
+        lwff_fuzzy_list = []
+
+    for lwff_fuzzy in lwff_fuzzy_list[:fuzzy_list_max_length]:
+
+        if len(lwff_fuzzy) >= fuzzy_word_min_length:
+
+            wordA_fuzzy = lwff_fuzzy
+            wordB_fuzzy = re.sub(f"^{wordA_fuzzy}", "", word, count=1)
+
+            try:
+                wordA_lastletter = wordA_fuzzy[-1]
+            except Exception:
+                wordA_lastletter = ""
+            try:
+                wordB_firstletter = wordB_fuzzy[0]
+            except Exception:
+                wordB_firstletter = ""
+
+            for rule, ch1, ch2 in rules_index.get(
+                    (wordA_lastletter, wordB_firstletter), []):
+                word1 = wordA_fuzzy[:-1] + ch1
+                word2 = ch2 + wordB_fuzzy[1:]
+
+                if word1 in all_inflections_set:
+                    splits.append(
+                        (wordA_fuzzy, wordB_fuzzy, word1, word2, rule))
+
+    return tuple(splits)
+
+
+@lru_cache(maxsize=split_cache_max_size)
+def lwfb_fuzzy_splits(
+        word: str
+) -> Tuple[Tuple[str, str, str, str, int], ...]:
+    """the longest fuzzy words from the back and the sandhi rules
+    which turn them into an inflection.
+    (wordA_fuzzy, wordB_fuzzy, word1, word2, rule)"""
+
+    splits = []
+
+    # inflections or inflections with no first letter
+    if len(word) > 0:
+        lwfb_fuzzy_list = back_list(word, INFLECTION | NOLAST)
+    else:
+        lwfb_fuzzy_list = []
+
+    for lwfb_fuzzy in lwfb_fuzzy_list[:fuzzy_list_max_length]:
+
+        if len(lwfb_fuzzy) >= fuzzy_word_min_length:
+            wordA_fuzzy = re.sub(f"{lwfb_fuzzy}$", "", word, count=1)
+            wordB_fuzzy = lwfb_fuzzy
+
+            try:
+                wordA_lastletter = wordA_fuzzy[-1]
+            except Exception:
+                wordA_lastletter = ""
+            try:
+                wordB_firstletter = wordB_fuzzy[0]
+            except Exception:
+                wordB_firstletter = ""
+
+            for rule, ch1, ch2 in rules_index.get(
+                    (wordA_lastletter, wordB_firstletter), []):
+                word1 = wordA_fuzzy[:-1] + ch1
+                word2 = ch2 + wordB_fuzzy[1:]
+
+                if word2 in all_inflections_set:
+                    splits.append(
+                        (wordA_fuzzy, wordB_fuzzy, word1, word2, rule))
+
+    return tuple(splits)
+
+
+split_cache = (
+    two_word_splits,
+    lwff_clean_splits,
+    lwfb_clean_splits,
+    lwff_fuzzy_splits,
+    lwfb_fuzzy_splits,
+)
+
+
+def split_cache_stats() -> Tuple[int, int]:
+    """hits and misses of all the split caches"""
+
+    hits = sum(f.cache_info().hits for f in split_cache)
+    misses = sum(f.cache_info().misses for f in split_cache)
+    return hits, misses
+
+
+def clear_split_cache() -> None:
+    for f in split_cache:
+        f.cache_clear()
 
 
 def main():
@@ -421,6 +652,18 @@ def main():
 
     print("[bright_yellow]sandhi splitter")
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers", type=int, default=psutil.cpu_count(),
+        help="Number of worker processes")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Resume a killed run from the last checkpoint")
+    parser.add_argument(
+        "--no_store", action="store_true",
+        help="Split every word, ignoring the splits stored by the last run")
+    args = parser.parse_args()
+
     global profiler
     if profiler_on is True:
         profiler = cProfile.Profile()
@@ -428,93 +671,448 @@ def main():
 
     pth = ProjectPaths()
     # make globally accessable vaiables
-    setup(pth)
+    setup(pth, args.resume)
 
-    global matches_dict
     with open(pth.matches_dict_path, "rb") as f:
-        matches_dict = pickle.load(f)
+        manual_matches_dict = pickle.load(f)
 
-    time_dict = {}
     global unmatched_len_init
     unmatched_len_init = len(unmatched_set)
 
-    print(f"[green]splitting sandhi [white]{unmatched_len_init:,}")
+    fingerprint = make_fingerprint(pth)
+    reused_splits: Dict[str, List[Tuple[str, ...]]] = {}
+    if not args.no_store:
+        reused_splits = load_split_store(pth, fingerprint)
+
+    checkpoint_dict = {}
+    if args.resume:
+        checkpoint_dict = restore_checkpoint(pth)
+        print(f"[green]resuming from checkpoint [white]{len(checkpoint_dict):,}")
+
+    # longest words first, so the slowest words don't end up at the tail
+    words_to_split = sorted(
+        [
+            word for word in unmatched_set
+            if len(word) <= max_word_length
+            and word not in problem_children
+            and word not in checkpoint_dict
+            and word not in reused_splits
+        ],
+        key=len, reverse=True)
+
+    print(f"[green]splitting sandhi [white]{len(words_to_split):,} / {unmatched_len_init:,}")
+
+    # the profiler can only see the current process
+    num_workers = 1 if profiler is not None else max(1, args.workers)
+    print(f"[green]workers [white]{num_workers}")
+
+    # the workers are always forked, as they rely on the globals from setup
+    ctx = multiprocessing.get_context("fork")
+
+    word_queue: Queue = ctx.Queue()
+    for word in words_to_split:
+        word_queue.put(word)
+    for __worker__ in range(num_workers):
+        word_queue.put(None)
+
+    progress = ctx.Value("i", len(checkpoint_dict) + len(reused_splits))
+    stats_queue: Queue = ctx.Queue()
+
+    if num_workers == 1:
+        split_worker(0, word_queue, progress, stats_queue, pth)
+        cache_stats = [stats_queue.get()]
+
+    else:
+        # workers are forked, so they share the rules, inflection set and
+        # memory-mapped tries loaded in setup without loading them again.
+        processes: List[Process] = []
+        for worker_idx in range(num_workers):
+            p = ctx.Process(
+                target=split_worker,
+                args=(worker_idx, word_queue, progress, stats_queue, pth))
+            p.start()
+            processes.append(p)
+
+        cache_stats = collect_worker_stats(processes, stats_queue)
+
+        for p in processes:
+            p.join()
+
+    checkpoint_dict = restore_checkpoint(pth)
+    merge_shards(pth, manual_matches_dict, reused_splits)
+
+    time_dict = {
+        word: seconds for word, (seconds, __count__)
+        in checkpoint_dict.items()}
+    try:
+        save_timer_dict(pth, time_dict)
+    except KeyError as e:
+        print(f"[red] {e}")
+
+    all_splits = read_shards(pth, checkpoint_dict)
+    all_splits.update(reused_splits)
+    save_split_store(pth, fingerprint, all_splits)
+
+    for word, matches in all_splits.items():
+        if matches:
+            unmatched_set.discard(word)
+
+    summary(pth, all_splits, len(reused_splits), cache_stats)
+    toc()
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats('profiler.prof')
+        yes_no = input("open profiler? (y/n) ")
+        if yes_no == "y":
+            popen("tuna profiler.prof")
+
+
+def split_word(counter: int, word: str) -> List[Tuple[str, str, str, str]]:
+    """Run all splitting methods on a single word and return its matches."""
+
+    global w
+    w = Word(word)
+    matches_dict[word] = []
 
-    for counter, word in enumerate(unmatched_set.copy()):
-        if len(word) <= max_word_length and word not in problem_children:
+    # d is a dictionary of data accessed using dot notation
+    d = DotDict(default_dot_dict_init(counter, word))
+
+    # two word sandhi
+    d = two_word_sandhi(d)
+
+    # three word sandhi
+    if not w.matches:
+        d = three_word_sandhi(d)
+
+    # # four word sandhi
+    # if not w.matches :
+    #     d = four_word_sandhi(d)
+
+    # # recursive removal
+    if not w.matches:
+        recursive_removal(d)
+
+    # a na an nā
+    if d.word.startswith(("a", "na", "an", "nā")):
+        d = remove_neg(d)
+
+    # sa
+    elif d.word.startswith("sa"):
+        d = remove_sa(d)
+
+    # su
+    elif d.word.startswith("su"):
+        d = remove_su(d)
+
+    # dur
+    elif d.word.startswith("du"):
+        d = remove_dur(d)
+
+    return matches_dict.pop(word)
+
+
+def split_worker(
+        worker_idx: int,
+        word_queue: Queue,
+        progress,
+        stats_queue: Queue,
+        pth: ProjectPaths
+) -> None:
+    """Split words from the queue until a None sentinel is reached.
+    Matches are streamed to the worker's own shard, and each finished word is
+    recorded in the worker's checkpoint, together with the size of the shard
+    at that point, so that a killed run can be resumed.
+    The split cache hits and misses are sent back on the stats queue."""
+
+    global matches_dict
+    matches_dict = {}
+
+    matches_shard_path, checkpoint_shard_path = shard_paths(pth, worker_idx)
+
+    with open(matches_shard_path, "a") as matches_file, \
+            open(checkpoint_shard_path, "a") as checkpoint_file:
+
+        while True:
+            word = word_queue.get()
+            if word is None:
+                break
+
+            with progress.get_lock():
+                progress.value += 1
+                counter = progress.value
 
             bip()
-            global w
-            w = Word(word)
-            matches_dict[word] = []
+            matches = split_word(counter, word)
+            seconds = bop()
 
-            # d is a dictionary of data accessed using dot notation
-            d = DotDict(default_dot_dict_init(counter, word))
+            for item in matches:
+                matches_file.write(f"{word}\t")
+                for column in item:
+                    matches_file.write(f"{column}\t")
+                matches_file.write("\n")
+            matches_file.flush()
 
-            # debug
-            # if d.init != "aniccabhāvāpattidosadassanatthaṃ":
-            #     continue
-            # if d.count > 1000:
-            #     break
+            checkpoint_file.write(
+                f"{word}\t{seconds}\t{len(matches)}\t{matches_file.tell()}\n")
+            checkpoint_file.flush()
 
-            # two word sandhi
-            d = two_word_sandhi(d)
+            if counter % 1000 == 0:
+                print(f"{counter:>10,} / {unmatched_len_init:<10,}{word}")
 
-            # three word sandhi
-            if not w.matches:
-                d = three_word_sandhi(d)
+    stats_queue.put(split_cache_stats())
 
-            # # four word sandhi
-            # if not w.matches :
-            #     d = four_word_sandhi(d)
 
-            # # recursive removal
-            if not w.matches:
-                recursive_removal(d)
+def collect_worker_stats(
+        processes: List[Process],
+        stats_queue: Queue,
+        timeout: float = 5
+) -> List:
+    """The cache stats of every worker. Raises if a worker dies before
+    sending them, instead of waiting for it forever."""
 
-            # a na an nā
-            if d.word.startswith(("a", "na", "an", "nā")):
-                d = remove_neg(d)
+    cache_stats = []
+    while len(cache_stats) < len(processes):
+        try:
+            cache_stats.append(stats_queue.get(timeout=timeout))
+            continue
+        except queue.Empty:
+            pass
 
-            # sa
-            elif d.word.startswith("sa"):
-                d = remove_sa(d)
+        failed = [p for p in processes if p.exitcode not in (None, 0)]
+        all_done = all(p.exitcode is not None for p in processes)
+        if failed or (all_done and stats_queue.empty()):
+            for p in processes:
+                if p.is_alive():
+                    p.terminate()
+            exit_codes = ", ".join(
+                f"{p.name}: {p.exitcode}" for p in processes)
+            raise RuntimeError(
+                f"sandhi splitter worker failed ({exit_codes}), "
+                "rerun with --resume to continue from the checkpoint")
 
-            # su
-            elif d.word.startswith("su"):
-                d = remove_su(d)
+    return cache_stats
 
-            # dur
-            elif d.word.startswith("du"):
-                d = remove_dur(d)
 
-            time_dict[word] = bop()
+def shard_paths(pth: ProjectPaths, worker_idx: int) -> Tuple[Path, Path]:
+    """Paths of a worker's matches shard and checkpoint shard."""
 
-            if d.count % 1000 == 0:
-                print(
-                    f"{d.count:>10,} / {unmatched_len_init:<10,}{d.word}")
+    return (
+        pth.sandhi_shards_dir.joinpath(f"matches_{worker_idx}.tsv"),
+        pth.sandhi_shards_dir.joinpath(f"checkpoint_{worker_idx}.tsv"))
 
-                save_matches(pth, matches_dict)
-                save_timer_dict(pth, time_dict)
-                matches_dict = {}
-                time_dict = {}
 
-    save_matches(pth, matches_dict)
+def restore_checkpoint(pth: ProjectPaths) -> Dict[str, Tuple[float, int]]:
+    """Read all worker checkpoints and truncate the shards back to the last
+    fully processed word. Returns {word: (seconds, match_count)}."""
 
-    try:
-        save_timer_dict(pth, time_dict)
-    except KeyError as e:
-        print(f"[red] {e}")
+    checkpoint_dict: Dict[str, Tuple[float, int]] = {}
 
-    summary(pth)
-    toc()
+    worker_idxs = set(
+        int(shard.stem.split("_")[1])
+        for shard in pth.sandhi_shards_dir.glob("*.tsv"))
 
-    if profiler is not None:
-        profiler.disable()
-        profiler.dump_stats('profiler.prof')
-        yes_no = input("open profiler? (y/n) ")
-        if yes_no == "y":
-            popen("tuna profiler.prof")
+    for worker_idx in sorted(worker_idxs):
+        matches_shard_path, checkpoint_shard_path = shard_paths(pth, worker_idx)
+
+        data = b""
+        if checkpoint_shard_path.exists():
+            with open(checkpoint_shard_path, "rb") as f:
+                data = f.read()
+
+        # drop a half written last line
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            with open(checkpoint_shard_path, "r+b") as f:
+                f.truncate(len(complete))
+
+        matches_size = 0
+        for line in complete.decode("utf-8").splitlines():
+            word, seconds, match_count, matches_size = line.split("\t")
+            checkpoint_dict[word] = (float(seconds), int(match_count))
+
+        # drop matches of a word that was not checkpointed
+        if matches_shard_path.exists():
+            with open(matches_shard_path, "r+b") as f:
+                f.truncate(int(matches_size))
+
+    return checkpoint_dict
+
+
+def merge_shards(
+        pth: ProjectPaths,
+        manual_matches_dict,
+        reused_splits: Dict[str, List[Tuple[str, ...]]]
+) -> None:
+    """Append the manual corrections and the splits reused from the store,
+    then all the worker shards, to matches.tsv."""
+
+    print("[green]merging shards")
+
+    save_matches(pth, manual_matches_dict)
+    save_matches(pth, reused_splits)
+
+    with open(pth.matches_path, "ab") as f:
+        for matches_shard_path in sorted(
+                pth.sandhi_shards_dir.glob("matches_*.tsv")):
+            with open(matches_shard_path, "rb") as shard:
+                shutil.copyfileobj(shard, f)
+
+
+def read_shards(
+        pth: ProjectPaths,
+        checkpoint_dict: Dict[str, Tuple[float, int]]
+) -> Dict[str, List[Tuple[str, ...]]]:
+    """Read the matches of every checkpointed word back from the shards."""
+
+    splits: Dict[str, List[Tuple[str, ...]]] = {
+        word: [] for word in checkpoint_dict}
+
+    for matches_shard_path in pth.sandhi_shards_dir.glob("matches_*.tsv"):
+        with open(matches_shard_path) as f:
+            for line in f:
+                word, *columns = line.rstrip("\n").split("\t")
+                splits[word].append(tuple(columns[:4]))
+
+    return splits
+
+
+def make_fingerprint(pth: ProjectPaths) -> str:
+    """A hash of everything besides the inflections which changes
+    the splits: the rules, the dampers and the splitter itself."""
+
+    fingerprint = hashlib.sha1()
+    fingerprint.update(pth.sandhi_rules_path.read_bytes())
+    fingerprint.update(Path(__file__).read_bytes())
+    fingerprint.update(str((
+        clean_list_max_length, fuzzy_list_max_length,
+        clean_word_min_length, fuzzy_word_min_length,
+        max_matches, max_recursions)).encode())
+
+    return fingerprint.hexdigest()
+
+
+def load_split_store(
+        pth: ProjectPaths,
+        fingerprint: str
+) -> Dict[str, List[Tuple[str, ...]]]:
+    """Splits from the last run which are still valid for the current
+    unmatched set. If the rules or the splitter changed, nothing is valid,
+    if inflections changed, only words which could contain them are split
+    again."""
+
+    print("[green]loading split store", end=" ")
+
+    if not pth.sandhi_split_store_path.exists():
+        print("[white]none")
+        return {}
+
+    with open(pth.sandhi_split_store_path, "rb") as f:
+        store = pickle.load(f)
+
+    if store["fingerprint"] != fingerprint:
+        print("[white]rules or splitter changed")
+        return {}
+
+    changed_inflections = store["inflections"] ^ all_inflections_set
+    stored_splits = {
+        word: matches for word, matches in store["splits"].items()
+        if word in unmatched_set}
+    changed_words = find_changed_words(
+        set(stored_splits), changed_inflections)
+
+    reused_splits = {
+        word: matches for word, matches in stored_splits.items()
+        if word not in changed_words}
+
+    print(f"[white]{len(reused_splits):,}")
+    print(f"[green]changed inflections [white]{len(changed_inflections):,}", end=" ")
+    print(f"[green]words to split again [white]{len(changed_words):,}")
+
+    return reused_splits
+
+
+def find_changed_words(
+        words: Set[str],
+        changed_inflections: Set[str]
+) -> Set[str]:
+    """Words that could be split with any of the changed inflections.
+
+    An inflection used in a split is a piece of the word which can start
+    with (the end of) a ch2 of a sandhi rule, and end with (the start of)
+    a ch1 of a sandhi rule, or with the 'a' of negation. So the inflection
+    without those parts, its core, must be somewhere in the word."""
+
+    if not changed_inflections:
+        return set()
+
+    heads = {""} | {"a"}
+    tails = {""}
+    for __rule__, values in rules.items():
+        ch1, ch2 = values["ch1"], values["ch2"]
+        heads.update(ch2[i:] for i in range(len(ch2)))
+        tails.update(ch1[:i] for i in range(1, len(ch1) + 1))
+
+    cores: Set[str] = set()
+    for inflection in changed_inflections:
+        for head in heads:
+            if not inflection.startswith(head):
+                continue
+            for tail in tails:
+                if (
+                    inflection.endswith(tail)
+                    and len(head) + len(tail) <= len(inflection)
+                ):
+                    cores.add(inflection[len(head):len(inflection)-len(tail)])
+
+    # a core of nothing can be anywhere
+    if "" in cores:
+        return set(words)
+
+    # look up long cores by their first three letters
+    short_cores = [core for core in cores if len(core) < 3]
+    long_cores: Dict[str, List[str]] = {}
+    for core in cores:
+        if len(core) >= 3:
+            if core[:3] not in long_cores:
+                long_cores[core[:3]] = []
+            long_cores[core[:3]] += [core]
+
+    changed_words: Set[str] = set()
+    for word in words:
+        if any(core in word for core in short_cores):
+            changed_words.add(word)
+            continue
+
+        trigrams = set(word[i:i+3] for i in range(len(word) - 2))
+        for trigram in trigrams.intersection(long_cores):
+            if any(core in word for core in long_cores[trigram]):
+                changed_words.add(word)
+                break
+
+    return changed_words
+
+
+def save_split_store(
+        pth: ProjectPaths,
+        fingerprint: str,
+        splits: Dict[str, List[Tuple[str, ...]]]
+) -> None:
+    """Save all the splits of this run, so the next run only needs to
+    split new words and words affected by changed inflections."""
+
+    print("[green]saving split store", end=" ")
+
+    store = {
+        "fingerprint": fingerprint,
+        "inflections": all_inflections_set,
+        "splits": splits,
+    }
+
+    with open(pth.sandhi_split_store_path, "wb") as f:
+        pickle.dump(store, f)
+
+    print(f"[white]{len(splits):,}")
 
 
 def save_matches(pth: ProjectPaths, matches_dict):
@@ -794,45 +1392,39 @@ def remove_apievaiti(d: DotDict) -> DotDict:
             wordA = d.word[:-2]
             wordB = d.word[-2:]
 
-        for rule in rules:
-            chA = rules[rule]["chA"]
-            chB = rules[rule]["chB"]
-            ch1 = rules[rule]["ch1"]
-            ch2 = rules[rule]["ch2"]
+        try:
+            wordA_lastletter = wordA[-1]
+        except Exception:
+            wordA_lastletter = wordA
+        wordB_firstletter = wordB[0]
+
+        for rule, ch1, ch2 in rules_index.get(
+                (wordA_lastletter, wordB_firstletter), []):
+            word1 = wordA[:-1] + ch1
+            word2 = ch2 + wordB[1:]
+
+            if word2 in ["api", "eva", "iti"]:
+                d.word = d.word.replace(wordB, "")
+                d.word = d.word.replace(wordA, word1)
+                d.back = f" + {word2}{d.back}"
+                d.comm = "apievaiti"
+                d.rules_back = f"{rule+2},{d.rules_back}"
+                d.path += " > apievaiti"
 
-            try:
-                wordA_lastletter = wordA[-1]
-            except Exception:
-                wordA_lastletter = wordA
-            wordB_firstletter = wordB[0]
-
-            if (wordA_lastletter == chA and
-                    wordB_firstletter == chB):
-                word1 = wordA[:-1] + ch1
-                word2 = ch2 + wordB[1:]
-
-                if word2 in ["api", "eva", "iti"]:
-                    d.word = d.word.replace(wordB, "")
-                    d.word = d.word.replace(wordA, word1)
-                    d.back = f" + {word2}{d.back}"
-                    d.comm = "apievaiti"
-                    d.rules_back = f"{rule+2},{d.rules_back}"
-                    d.path += " > apievaiti"
-
-                    if d.word in all_inflections_set:
-                        d.comm = f"match! = {comp(d)}"
-
-                        if comp(d) not in w.matches:
-                            matches_dict[d.init] += [
-                                (comp(d), "xword-pi", "apievaiti", d.path)]
-                            w.matches.add(comp(d))
-                            d.matches.add(comp(d))
-                            unmatched_set.discard(d.init)
+                if d.word in all_inflections_set:
+                    d.comm = f"match! = {comp(d)}"
 
-                    else:
-                        recursive_removal(d)
+                    if comp(d) not in w.matches:
+                        matches_dict[d.init] += [
+                            (comp(d), "xword-pi", "apievaiti", d.path)]
+                        w.matches.add(comp(d))
+                        d.matches.add(comp(d))
+                        unmatched_set.discard(d.init)
 
-                    d = DotDict(d_orig)
+                else:
+                    recursive_removal(d)
+
+                d = DotDict(d_orig)
 
     return d_orig
 
@@ -845,15 +1437,7 @@ def remove_lwff_clean(d: DotDict) -> DotDict:
 
     if comp(d) not in w.matches:
 
-        lwff_clean_list = []
-
-        for i in range(len(d.word)):
-            if d.word[:-i] in all_inflections_set:
-                lwff_clean_list.append(d.word[:-i])
-
-        lwff_clean_list = lwff_clean_list[:clean_list_max_length]
-
-        for lwff_clean in lwff_clean_list:
+        for lwff_clean in lwff_clean_splits(d.word):
 
             if len(lwff_clean) >= clean_word_min_length:
                 d.path += " > front_clean"
@@ -888,15 +1472,7 @@ def remove_lwfb_clean(d: DotDict) -> DotDict:
 
     if comp(d) not in w.matches:
 
-        lwfb_clean_list = []
-
-        for i in range(len(d.word)):
-            if d.word[i:] in all_inflections_set:
-                lwfb_clean_list.append(d.word[i:])
-
-        lwfb_clean_list = lwfb_clean_list[:clean_list_max_length]
-
-        for lwfb_clean in lwfb_clean_list:
+        for lwfb_clean in lwfb_clean_splits(d.word):
 
             if len(lwfb_clean) >= clean_word_min_length:
                 d.path += " > back_clean"
@@ -930,69 +1506,32 @@ def remove_lwff_fuzzy(d: DotDict) -> DotDict:
 
     if comp(d) not in d.matches:
 
-        lwff_fuzzy_list = []
-
-        if len(d.word) >= fuzzy_word_min_length:
-            for i in range(len(d.word)):
-                fuzzy_word = d.word[:-i]
-
-                if (fuzzy_word in all_inflections_nolast or
-                        fuzzy_word in all_inflections_set):
-                    lwff_fuzzy_list.append(fuzzy_word)
-
-        lwff_fuzzy_list = lwff_fuzzy_list[:fuzzy_list_max_length]
-
-        for lwff_fuzzy in lwff_fuzzy_list:
+        for (wordA_fuzzy, wordB_fuzzy,
+                word1, word2, rule) in lwff_fuzzy_splits(d.word):
 
-            if len(lwff_fuzzy) >= fuzzy_word_min_length:
+            d.path += " > front_fuzzy"
+            d.word = re.sub(
+                f"^{wordA_fuzzy}", "", d.word, count=1)
+            d.word = re.sub(
+                f"^{wordB_fuzzy}", word2, d.word, count=1)
+            d.front = f"{d.front}{word1} + "
+            d.comm = f"lwff_fuzzy [yellow]{word1} + {word2}"
+            d.rules_front += f"{rule+2},"
 
-                wordA_fuzzy = lwff_fuzzy
-                wordB_fuzzy = re.sub(f"^{wordA_fuzzy}", "", d.word, count=1)
-
-                try:
-                    wordA_lastletter = wordA_fuzzy[-1]
-                except Exception:
-                    wordA_lastletter = ""
-                try:
-                    wordB_firstletter = wordB_fuzzy[0]
-                except Exception:
-                    wordB_firstletter = ""
-
-                for rule in rules:
-                    chA = rules[rule]["chA"]
-                    chB = rules[rule]["chB"]
-                    ch1 = rules[rule]["ch1"]
-                    ch2 = rules[rule]["ch2"]
-
-                    if (wordA_lastletter == chA and
-                            wordB_firstletter == chB):
-                        word1 = wordA_fuzzy[:-1] + ch1
-                        word2 = ch2 + wordB_fuzzy[1:]
-
-                        if word1 in all_inflections_set:
-                            d.path += " > front_fuzzy"
-                            d.word = re.sub(
-                                f"^{wordA_fuzzy}", "", d.word, count=1)
-                            d.word = re.sub(
-                                f"^{wordB_fuzzy}", word2, d.word, count=1)
-                            d.front = f"{d.front}{word1} + "
-                            d.comm = f"lwff_fuzzy [yellow]{word1} + {word2}"
-                            d.rules_front += f"{rule+2},"
-
-                            if d.word in all_inflections_set:
-                                if comp(d) not in w.matches:
-                                    matches_dict[d.init] += [(
-                                        comp(d), "xword-fff",
-                                        f"{comp_rules(d)}", d.path)]
-                                    w.matches.add(comp(d))
-                                    d.matches.add(comp(d))
-                                    unmatched_set.discard(d.init)
+            if d.word in all_inflections_set:
+                if comp(d) not in w.matches:
+                    matches_dict[d.init] += [(
+                        comp(d), "xword-fff",
+                        f"{comp_rules(d)}", d.path)]
+                    w.matches.add(comp(d))
+                    d.matches.add(comp(d))
+                    unmatched_set.discard(d.init)
 
-                            else:
-                                d.comm = f"recursing lwff_fuzzy {comp(d)}"
-                                recursive_removal(d)
+            else:
+                d.comm = f"recursing lwff_fuzzy {comp(d)}"
+                recursive_removal(d)
 
-                            d = DotDict(d_orig)
+            d = DotDict(d_orig)
 
     return d_orig
 
@@ -1005,70 +1544,34 @@ def remove_lwfb_fuzzy(d: DotDict) -> DotDict:
 
     if comp(d) not in w.matches:
 
-        lwfb_fuzzy_list = []
-
-        if len(d.word) > 0:
-            for i in range(len(d.word)):
-                fuzzy_word = d.word[i:]
-
-                if (fuzzy_word in all_inflections_nofirst or
-                        fuzzy_word in all_inflections_set):
-                    lwfb_fuzzy_list.append(fuzzy_word)
-
-        lwfb_fuzzy_list = lwfb_fuzzy_list[:fuzzy_list_max_length]
-
-        for lwfb_fuzzy in lwfb_fuzzy_list:
+        for (wordA_fuzzy, wordB_fuzzy,
+                word1, word2, rule) in lwfb_fuzzy_splits(d.word):
 
-            if len(lwfb_fuzzy) >= fuzzy_word_min_length:
-                wordA_fuzzy = re.sub(f"{lwfb_fuzzy}$", "", d.word, count=1)
-                wordB_fuzzy = lwfb_fuzzy
-
-                try:
-                    wordA_lastletter = wordA_fuzzy[-1]
-                except Exception:
-                    wordA_lastletter = ""
-                try:
-                    wordB_firstletter = wordB_fuzzy[0]
-                except Exception:
-                    wordB_firstletter = ""
-
-                for rule in rules:
-                    chA = rules[rule]["chA"]
-                    chB = rules[rule]["chB"]
-                    ch1 = rules[rule]["ch1"]
-                    ch2 = rules[rule]["ch2"]
-
-                    if (wordA_lastletter == chA and
-                            wordB_firstletter == chB):
-                        word1 = wordA_fuzzy[:-1] + ch1
-                        word2 = ch2 + wordB_fuzzy[1:]
-
-                        if word2 in all_inflections_set:
-                            d.path += " > back_fuzzy"
-                            d.word = re.sub(
-                                f"{wordB_fuzzy}$", "", d.word, count=1)
-                            d.word = re.sub(
-                                f"{wordA_fuzzy}$", word1, d.word, count=1)
-                            # d.back = re.sub(
-                            #     f"{wordB_fuzzy}$", word2, d.back, count=1)
-                            d.back = f" + {word2}{d.back}"
-                            d.comm = f"lwfb_fuzzy [yellow]{word1} + {word2}"
-                            d.rules_back = f"{rule+2},{d.rules_back}"
+            d.path += " > back_fuzzy"
+            d.word = re.sub(
+                f"{wordB_fuzzy}$", "", d.word, count=1)
+            d.word = re.sub(
+                f"{wordA_fuzzy}$", word1, d.word, count=1)
+            # d.back = re.sub(
+            #     f"{wordB_fuzzy}$", word2, d.back, count=1)
+            d.back = f" + {word2}{d.back}"
+            d.comm = f"lwfb_fuzzy [yellow]{word1} + {word2}"
+            d.rules_back = f"{rule+2},{d.rules_back}"
 
-                            if d.word in all_inflections_set:
-                                if comp(d) not in w.matches:
-                                    matches_dict[d.init] += [(
-                                        comp(d), "xword-fbf",
-                                        f"{comp_rules(d)}", d.path)]
-                                    w.matches.add(comp(d))
-                                    d.matches.add(comp(d))
-                                    unmatched_set.discard(d.init)
+            if d.word in all_inflections_set:
+                if comp(d) not in w.matches:
+                    matches_dict[d.init] += [(
+                        comp(d), "xword-fbf",
+                        f"{comp_rules(d)}", d.path)]
+                    w.matches.add(comp(d))
+                    d.matches.add(comp(d))
+                    unmatched_set.discard(d.init)
 
-                            else:
-                                d.comm = f"recursing lwfb_fuzzy {comp(d)}"
-                                recursive_removal(d)
+            else:
+                d.comm = f"recursing lwfb_fuzzy {comp(d)}"
+                recursive_removal(d)
 
-                            d = DotDict(d_orig)
+            d = DotDict(d_orig)
 
     return d_orig
 
@@ -1081,22 +1584,13 @@ def two_word_sandhi(d: DotDict) -> DotDict:
 
     if comp(d) not in w.matches:
 
-        for x in range(0, len(d.word)-1):
-
-            wordA = d.word[:-x-1]
-            wordB = d.word[-1-x:]
-            try:
-                wordA_lastletter = wordA[len(wordA)-1]
-            except Exception:
-                wordA_lastletter = ""
-            wordB_firstletter = wordB[0]
+        for word1, word2, rule in two_word_splits(d.word):
 
             # blah blah
 
-            if (wordA in all_inflections_set and
-                    wordB in all_inflections_set):
-                d.front = f"{d.front}{wordA} + "
-                d.word = wordB
+            if rule is None:
+                d.front = f"{d.front}{word1} + "
+                d.word = word2
                 d.rules_front += "0,"
                 d.path += " > 2.1"
                 if d.comm == "start":
@@ -1106,46 +1600,32 @@ def two_word_sandhi(d: DotDict) -> DotDict:
 
                 if comp(d) not in d.matches:
                     matches_dict[d.init] += [(
-                        f"{d.front}{wordB}{d.back}",
+                        f"{d.front}{word2}{d.back}",
                         d.comm, comp_rules(d), d.path)]
                     w.matches.add(comp(d))
                     d.matches.add(comp(d))
                     unmatched_set.discard(d.init)
 
-                d = DotDict(d_orig)
-
             # bla* *lah
 
-            for rule in rules:
-                chA = rules[rule]["chA"]
-                chB = rules[rule]["chB"]
-                ch1 = rules[rule]["ch1"]
-                ch2 = rules[rule]["ch2"]
-
-                if (wordA_lastletter == chA and
-                        wordB_firstletter == chB):
-                    word1 = wordA[:-1] + ch1
-                    word2 = ch2 + wordB[1:]
-
-                    if (word1 in all_inflections_set and
-                            word2 in all_inflections_set):
-                        d.front = f"{d.front}{word1} + "
-                        d.word = word2
-                        d.rules_front += f"{rule+2},"
-                        d.path += " > 2.2"
-                        if d.comm == "start":
-                            d.comm = "start2.2"
-                        else:
-                            d.comm = "x2.2"
-
-                        if comp(d) not in w.matches:
-                            matches_dict[d.init] += [
-                                (comp(d), d.comm, f"{comp_rules(d)}", d.path)]
-                            w.matches.add(comp(d))
-                            d.matches.add(comp(d))
-                            unmatched_set.discard(d.init)
+            else:
+                d.front = f"{d.front}{word1} + "
+                d.word = word2
+                d.rules_front += f"{rule+2},"
+                d.path += " > 2.2"
+                if d.comm == "start":
+                    d.comm = "start2.2"
+                else:
+                    d.comm = "x2.2"
 
-                    d = DotDict(d_orig)
+                if comp(d) not in w.matches:
+                    matches_dict[d.init] += [
+                        (comp(d), d.comm, f"{comp_rules(d)}", d.path)]
+                    w.matches.add(comp(d))
+                    d.matches.add(comp(d))
+                    unmatched_set.discard(d.init)
+
+            d = DotDict(d_orig)
 
     return d_orig
 
@@ -1209,130 +1689,106 @@ def three_word_sandhi(d: DotDict) -> DotDict:
                 # blah bla* *lah
                 if wordA in all_inflections_set:
 
-                    for rule in rules:
-                        chA = rules[rule]["chA"]
-                        chB = rules[rule]["chB"]
-                        ch1 = rules[rule]["ch1"]
-                        ch2 = rules[rule]["ch2"]
+                    for rule, ch1, ch2 in rules_index.get(
+                            (wordB_lastletter, wordC_firstletter), []):
+                        word2 = wordB[:-1] + ch1
+                        word3 = ch2 + wordC[1:]
 
-                        if (wordB_lastletter == chA and
-                                wordC_firstletter == chB):
-                            word2 = wordB[:-1] + ch1
-                            word3 = ch2 + wordC[1:]
+                        if (wordA in all_inflections_set and
+                            word2 in all_inflections_set and
+                                word3 in all_inflections_set):
 
-                            if (wordA in all_inflections_set and
-                                word2 in all_inflections_set and
-                                    word3 in all_inflections_set):
-
-                                d.front = f"{d.front}{wordA} + "
-                                d.word = word2
-                                d.back = f" + {word3}{d.back}"
-                                d.rules_front += "0,"
-                                d.rules_back = f"{rule+2},{d.rules_back}"
-                                d.path += " > 3.2"
-                                if d.comm == "start":
-                                    d.comm = "start3.2"
-                                else:
-                                    d.comm = "x3.2"
-
-                                if comp(d) not in w.matches:
-                                    matches_dict[d.init] += [(
-                                        comp(d), d.comm,
-                                        f"{comp_rules(d)}", d.path)]
-                                    w.matches.add(comp(d))
-                                    d.matches.add(comp(d))
-                                    unmatched_set.discard(d.init)
-
-                                d = DotDict(d_orig)
+                            d.front = f"{d.front}{wordA} + "
+                            d.word = word2
+                            d.back = f" + {word3}{d.back}"
+                            d.rules_front += "0,"
+                            d.rules_back = f"{rule+2},{d.rules_back}"
+                            d.path += " > 3.2"
+                            if d.comm == "start":
+                                d.comm = "start3.2"
+                            else:
+                                d.comm = "x3.2"
+
+                            if comp(d) not in w.matches:
+                                matches_dict[d.init] += [(
+                                    comp(d), d.comm,
+                                    f"{comp_rules(d)}", d.path)]
+                                w.matches.add(comp(d))
+                                d.matches.add(comp(d))
+                                unmatched_set.discard(d.init)
+
+                            d = DotDict(d_orig)
 
                 # bla* *lah blah
 
                 if wordC in all_inflections_set:
 
-                    for rule in rules:
-                        chA = rules[rule]["chA"]
-                        chB = rules[rule]["chB"]
-                        ch1 = rules[rule]["ch1"]
-                        ch2 = rules[rule]["ch2"]
+                    for rule, ch1, ch2 in rules_index.get(
+                            (wordA_lastletter, wordB_firstletter), []):
+                        word1 = wordA[:-1] + ch1
+                        word2 = ch2 + wordB[1:]
 
-                        if (wordA_lastletter == chA and
-                                wordB_firstletter == chB):
-                            word1 = wordA[:-1] + ch1
-                            word2 = ch2 + wordB[1:]
+                        if (word1 in all_inflections_set and
+                            word2 in all_inflections_set and
+                                wordC in all_inflections_set):
 
-                            if (word1 in all_inflections_set and
-                                word2 in all_inflections_set and
-                                    wordC in all_inflections_set):
-
-                                d.front = f"{d.front}{word1} + "
-                                d.word = word2
-                                d.back = f" + {wordC}{d.back}"
-                                d.rules_front += f"{rule+2},"
-                                d.rules_back = f"0,{d.rules_back}"
-                                d.path += " > 3.3"
-                                if d.comm == "start":
-                                    d.comm = "start3.3"
-                                else:
-                                    d.comm = "x3.3"
-
-                                if comp(d) not in w.matches:
-                                    matches_dict[d.init] += [(
-                                        comp(d), d.comm,
-                                        f"{comp_rules(d)}", d.path)]
-                                    w.matches.add(comp(d))
-                                    d.matches.add(comp(d))
-                                    unmatched_set.discard(d.init)
-
-                                d = DotDict(d_orig)
+                            d.front = f"{d.front}{word1} + "
+                            d.word = word2
+                            d.back = f" + {wordC}{d.back}"
+                            d.rules_front += f"{rule+2},"
+                            d.rules_back = f"0,{d.rules_back}"
+                            d.path += " > 3.3"
+                            if d.comm == "start":
+                                d.comm = "start3.3"
+                            else:
+                                d.comm = "x3.3"
+
+                            if comp(d) not in w.matches:
+                                matches_dict[d.init] += [(
+                                    comp(d), d.comm,
+                                    f"{comp_rules(d)}", d.path)]
+                                w.matches.add(comp(d))
+                                d.matches.add(comp(d))
+                                unmatched_set.discard(d.init)
+
+                            d = DotDict(d_orig)
 
                 # bla* *la* *lah
 
-                for rulex in rules:
-                    chAx = rules[rulex]["chA"]
-                    chBx = rules[rulex]["chB"]
-                    ch1x = rules[rulex]["ch1"]
-                    ch2x = rules[rulex]["ch2"]
+                for rulex, ch1x, ch2x in rules_index.get(
+                        (wordA_lastletter, wordB_firstletter), []):
+                    word1 = wordA[:-1] + ch1x
+                    word2 = ch2x + wordB[1:]
 
-                    if (wordA_lastletter == chAx and
-                            wordB_firstletter == chBx):
-                        word1 = wordA[:-1] + ch1x
-                        word2 = ch2x + wordB[1:]
+                    for ruley, ch1y, ch2y in rules_index.get(
+                            (wordB_lastletter, wordC_firstletter), []):
+                        word2 = (ch2x + wordB[1:])[:-1] + ch1y
+                        word3 = ch2y + wordC[1:]
 
-                        for ruley in rules:
-                            chAy = rules[ruley]["chA"]
-                            chBy = rules[ruley]["chB"]
-                            ch1y = rules[ruley]["ch1"]
-                            ch2y = rules[ruley]["ch2"]
-
-                            if (wordB_lastletter == chAy and
-                                    wordC_firstletter == chBy):
-                                word2 = (ch2x + wordB[1:])[:-1] + ch1y
-                                word3 = ch2y + wordC[1:]
-
-                                if (word1 in all_inflections_set and
-                                        word2 in all_inflections_set and
-                                        word3 in all_inflections_set):
-
-                                    d.front = f"{d.front}{word1} + "
-                                    d.word = word2
-                                    d.back = f" + {word3}{d.back}"
-                                    d.rules_front += f"{rulex+2},"
-                                    d.rules_back = f"{ruley+2},{d.rules_back}"
-                                    d.path += " > 3.4"
-                                    if d.comm == "start":
-                                        d.comm = "start3.4"
-                                    else:
-                                        d.comm = "x3.4"
+                        if (word1 in all_inflections_set and
+                                word2 in all_inflections_set and
+                                word3 in all_inflections_set):
 
-                                    if comp(d) not in w.matches:
-                                        matches_dict[d.init] += [(
-                                            comp(d), d.comm,
-                                            f"{comp_rules(d)}", d.path)]
-                                        w.matches.add(comp(d))
-                                        d.matches.add(comp(d))
-                                        unmatched_set.discard(d.init)
+                            d.front = f"{d.front}{word1} + "
+                            d.word = word2
+                            d.back = f" + {word3}{d.back}"
+                            d.rules_front += f"{rulex+2},"
+                            d.rules_back = f"{ruley+2},{d.rules_back}"
+                            d.path += " > 3.4"
+                            if d.comm == "start":
+                                d.comm = "start3.4"
+                            else:
+                                d.comm = "x3.4"
 
-                                    d = DotDict(d_orig)
+                            if comp(d) not in w.matches:
+                                matches_dict[d.init] += [(
+                                    comp(d), d.comm,
+                                    f"{comp_rules(d)}", d.path)]
+                                w.matches.add(comp(d))
+                                d.matches.add(comp(d))
+                                unmatched_set.discard(d.init)
+
+                            d = DotDict(d_orig)
 
     return d_orig
 
@@ -1366,66 +1822,48 @@ def four_word_sandhi(d: DotDict) -> DotDict:
 
                     # bla* *la* *la* *lah
 
-                    for rulex in rules:
-                        chAx = rules[rulex]["chA"]
-                        chBx = rules[rulex]["chB"]
-                        ch1x = rules[rulex]["ch1"]
-                        ch2x = rules[rulex]["ch2"]
-
-                        if (wordA_lastletter == chAx and
-                                wordB_firstletter == chBx):
-                            word1 = wordA[:-1] + ch1x
-                            word2 = ch2x + wordB[1:]
-
-                            for ruley in rules:
-                                chAy = rules[ruley]["chA"]
-                                chBy = rules[ruley]["chB"]
-                                ch1y = rules[ruley]["ch1"]
-                                ch2y = rules[ruley]["ch2"]
-
-                                if wordB_lastletter == chAy and \
-                                        wordC_firstletter == chBy:
-                                    word2 = (ch2x + wordB[1:])[:-1] + ch1y
-                                    word3 = ch2y + wordC[1:]
-
-                                    for rulez in rules:
-                                        chAz = rules[rulez]["chA"]
-                                        chBz = rules[rulez]["chB"]
-                                        ch1z = rules[rulez]["ch1"]
-                                        ch2z = rules[rulez]["ch2"]
-
-                                        if (wordC_lastletter == chAz and
-                                                wordD_firstletter == chBz):
-                                            word3 = (
-                                                ch2y + wordC[1:])[:-1] + ch1z
-                                            word4 = ch2z + wordD[1:]
-
-                                            if (word1 in all_inflections_set
-                                                and
-                                                word2 in all_inflections_set
-                                                and
-                                                word3 in all_inflections_set
-                                                and
-                                                    word4 in all_inflections_set):
-                                                d.front = f"{d.front}{word1} + {word2} + "
-                                                d.word = word3
-                                                d.back = f" + {word4}{d.back}"
-                                                d.rules_front += f"{rulex+2},{ruley+2}"
-                                                d.rules_back = f"{rulez+2},{d.rules_back}"
-                                                d.path += " > 4"
-                                                d.comm = "x4"
-
-                                                if comp(d) not in w.matches:
-                                                    matches_dict[d.init] += [(
-                                                        comp(d), d.comm,
-                                                        f"{comp_rules(d)}",
-                                                        d.path)]
-                                                    w.matches.add(comp(d))
-                                                    d.matches.add(comp(d))
-                                                    unmatched_set.discard(
-                                                        d.init)
-
-                                                d = DotDict(d_orig)
+                    for rulex, ch1x, ch2x in rules_index.get(
+                            (wordA_lastletter, wordB_firstletter), []):
+                        word1 = wordA[:-1] + ch1x
+                        word2 = ch2x + wordB[1:]
+
+                        for ruley, ch1y, ch2y in rules_index.get(
+                                (wordB_lastletter, wordC_firstletter), []):
+                            word2 = (ch2x + wordB[1:])[:-1] + ch1y
+                            word3 = ch2y + wordC[1:]
+
+                            for rulez, ch1z, ch2z in rules_index.get(
+                                    (wordC_lastletter, wordD_firstletter), []):
+                                word3 = (
+                                    ch2y + wordC[1:])[:-1] + ch1z
+                                word4 = ch2z + wordD[1:]
+
+                                if (word1 in all_inflections_set
+                                    and
+                                    word2 in all_inflections_set
+                                    and
+                                    word3 in all_inflections_set
+                                    and
+                                        word4 in all_inflections_set):
+                                    d.front = f"{d.front}{word1} + {word2} + "
+                                    d.word = word3
+                                    d.back = f" + {word4}{d.back}"
+                                    d.rules_front += f"{rulex+2},{ruley+2}"
+                                    d.rules_back = f"{rulez+2},{d.rules_back}"
+                                    d.path += " > 4"
+                                    d.comm = "x4"
+
+                                    if comp(d) not in w.matches:
+                                        matches_dict[d.init] += [(
+                                            comp(d), d.comm,
+                                            f"{comp_rules(d)}",
+                                            d.path)]
+                                        w.matches.add(comp(d))
+                                        d.matches.add(comp(d))
+                                        unmatched_set.discard(
+                                            d.init)
+
+                                    d = DotDict(d_orig)
 
     return d_orig
 
@@ -1451,7 +1889,12 @@ def dprint(d: DotDict) -> None:
     print()
 
 
-def summary(pth: ProjectPaths):
+def summary(
+        pth: ProjectPaths,
+        all_splits: Dict[str, List[Tuple[str, ...]]],
+        reused_count: int,
+        cache_stats: List[Tuple[int, int]]
+):
 
     print("[green]writing unmatched set")
 
@@ -1469,16 +1912,25 @@ def summary(pth: ProjectPaths):
     print(
         f"[green]matched:\t{matched:,} / {unmatched_len_init:,}\t[white]{matched_perc:.2f}%")
 
-    word_count = len(matches_dict)
+    word_count = len(all_splits)
     match_count = 0
 
-    for __word__, matches in matches_dict.items():
+    for __word__, matches in all_splits.items():
         match_count += len(matches)
 
-    match_average = match_count / word_count
+    match_average = match_count / word_count if word_count else 0
 
     print(f"[green]match count:\t{match_count:,}")
     print(f"[green]match average:\t{match_average:.4f}")
+    print(f"[green]reused:\t\t{reused_count:,} / {word_count:,}")
+
+    cache_hits = sum(hits for hits, __misses__ in cache_stats)
+    cache_misses = sum(misses for __hits__, misses in cache_stats)
+    cache_total = cache_hits + cache_misses
+    cache_hit_perc = (cache_hits/cache_total)*100 if cache_total else 0
+
+    print(f"[green]cache hits:\t{cache_hits:,} / {cache_total:,}\t[white]{cache_hit_perc:.2f}%")
+    print(f"[green]cache misses:\t{cache_misses:,}")
 
 
 if __name__ == "__main__":
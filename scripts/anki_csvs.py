@@ -14,7 +14,7 @@ from sqlalchemy.orm.session import Session
 from db.models import PaliWord, PaliRoot
 from db.get_db_session import get_db_session
 
-from tools.pali_sort_key import pali_sort_key
+from tools.pali_sort_key import pali_sort_key, pali_sort_keys
 from tools.paths import ProjectPaths
 from tools.tic_toc import tic, toc
 from tools.tsv_read_write import write_tsv_list
@@ -228,7 +228,7 @@ def full_db(pth: ProjectPaths, dpd_db):
     dpd_df = pd.read_csv(pth.dpd_full_path, sep="\t", dtype=str)
     dpd_df.sort_values(
         by=["Pāli1"], inplace=True, ignore_index=True,
-        key=lambda x: x.map(pali_sort_key))
+        key=pali_sort_keys)
     dpd_df.to_csv(
         pth.dpd_full_path, sep="\t", index=False,
         quoting=csv.QUOTE_NONNUMERIC, quotechar='"')
@@ -272,7 +272,7 @@ def roots(pth: ProjectPaths, db_session: Session, roots_db):
     dpd_df = pd.read_csv(pth.roots_csv_path, sep="\t", dtype=str)
     dpd_df.sort_values(
         by=["Root"], inplace=True, ignore_index=True,
-        key=lambda x: x.map(pali_sort_key))
+        key=pali_sort_keys)
     dpd_df.to_csv(
         pth.roots_csv_path, sep="\t", index=False,
         quoting=csv.QUOTE_NONNUMERIC, quotechar='"')
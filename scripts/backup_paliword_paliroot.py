@@ -4,72 +4,50 @@
 
 from git import Repo
 from rich import print
-import csv
 
-from sqlalchemy.orm.session import Session
+from sqlalchemy.engine import Connection
 
-from db.get_db_session import get_db_session
+from db.get_db_session import get_db_engine
 from db.models import PaliWord, PaliRoot
+from db.tsv_backup import backup_table
 from tools.tic_toc import tic, toc
 from tools.paths import ProjectPaths
 
 
-def backup_paliword_paliroot(pth: ProjectPaths):
+def backup_paliword_paliroot(pth: ProjectPaths, incremental: bool = True):
     tic()
     print("[bright_yellow]backing paliword and paliroot tables to tsv")
-    db_session = get_db_session(pth.dpd_db_path)
-    backup_paliwords(db_session, pth)
-    backup_paliroots(db_session, pth)
-    db_session.close()
+    db_engine = get_db_engine(pth.dpd_db_path)
+    with db_engine.connect() as conn:
+        backup_paliwords(conn, pth, incremental)
+        backup_paliroots(conn, pth, incremental)
+    db_engine.dispose()
     git_commit()
     toc()
 
 
-def backup_paliwords(db_session: Session, pth: ProjectPaths):
+def backup_paliwords(
+        conn: Connection, pth: ProjectPaths, incremental: bool = True):
     """Backup PaliWord table to TSV."""
-    print("[green]writing PaliWord table")
-    db = db_session.query(PaliWord).all()
+    print("[green]writing PaliWord table", end=" ")
+    count = backup_table(
+        conn, PaliWord.__table__, pth.pali_word_path,  # type: ignore
+        exclude_columns=["created_at", "updated_at"],
+        incremental=incremental)
+    print(f"[white]{count:,}")
 
-    with open(pth.pali_word_path, 'w', newline='') as tsvfile:
-        exclude_columns = [
-            "created_at", "updated_at"]
-        csvwriter = csv.writer(
-            tsvfile, delimiter="\t", quotechar='"', quoting=csv.QUOTE_ALL)
-        column_names = [
-            column.name for column in PaliWord.__mapper__.columns
-            if column.name not in exclude_columns]
-        csvwriter.writerow(column_names)
 
-        for i in db:
-            row = [
-                getattr(i, column.name)
-                for column in PaliWord.__mapper__.columns
-                if column.name not in exclude_columns]
-            csvwriter.writerow(row)
-
-
-def backup_paliroots(db_session: Session, pth: ProjectPaths):
+def backup_paliroots(
+        conn: Connection, pth: ProjectPaths, incremental: bool = True):
     """Backup PaliRoot table to TSV."""
-    print("[green]writing PaliRoot table")
-    db = db_session.query(PaliRoot).all()
-
-    with open(pth.pali_root_path, 'w', newline='') as tsvfile:
-        exclude_columns = [
+    print("[green]writing PaliRoot table", end=" ")
+    count = backup_table(
+        conn, PaliRoot.__table__, pth.pali_root_path,  # type: ignore
+        exclude_columns=[
             "created_at", "updated_at",
-            "root_info", "root_matrix"]
-        csvwriter = csv.writer(
-            tsvfile, delimiter="\t", quotechar='"', quoting=csv.QUOTE_ALL)
-        column_names = [
-            column.name for column in PaliRoot.__mapper__.columns
-            if column.name not in exclude_columns]
-        csvwriter.writerow(column_names)
-
-        for i in db:
-            row = [
-                getattr(i, column.name)
-                for column in PaliRoot.__mapper__.columns
-                if column.name not in exclude_columns]
-            csvwriter.writerow(row)
+            "root_info", "root_matrix"],
+        incremental=incremental)
+    print(f"[white]{count:,}")
 
 
 def git_commit():
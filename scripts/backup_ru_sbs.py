@@ -5,12 +5,12 @@
 
 from git import Repo
 from rich import print
-import csv
 
-from sqlalchemy.orm.session import Session
+from sqlalchemy.engine import Connection
 
-from db.get_db_session import get_db_session
+from db.get_db_session import get_db_engine
 from db.models import Russian, SBS
+from db.tsv_backup import backup_table
 from tools.tic_toc import tic, toc
 from tools.paths import ProjectPaths
 
@@ -19,50 +19,24 @@ def backup_ru_sbs():
     tic()
     print("[bright_yellow]backing russian and sbs tables to tsv")
     pth = ProjectPaths()
-    db_session = get_db_session(pth.dpd_db_path)
-    backup_russian(db_session, pth)
-    backup_sbs(db_session, pth)
-    db_session.close()
+    db_engine = get_db_engine(pth.dpd_db_path)
+    with db_engine.connect() as conn:
+        backup_russian(conn, pth)
+        backup_sbs(conn, pth)
+    db_engine.dispose()
     toc()
 
 
-def backup_russian(db_session: Session, pth: ProjectPaths):
+def backup_russian(conn: Connection, pth: ProjectPaths):
     """Backup Russian table to TSV."""
     print("[green]writing Russian table")
-    db = db_session.query(Russian).all()
+    backup_table(conn, Russian.__table__, pth.russian_path)  # type: ignore
 
-    with open(pth.russian_path, 'w', newline='') as tsvfile:
-        csvwriter = csv.writer(
-            tsvfile, delimiter="\t", quotechar='"', quoting=csv.QUOTE_ALL)
-        column_names = [
-            column.name for column in Russian.__mapper__.columns]
-        csvwriter.writerow(column_names)
 
-        for i in db:
-            row = [
-                getattr(i, column.name)
-                for column in Russian.__mapper__.columns]
-            csvwriter.writerow(row)
-
-
-def backup_sbs(db_session: Session, pth: ProjectPaths):
+def backup_sbs(conn: Connection, pth: ProjectPaths):
     """Backup SBS tables to TSV."""
     print("[green]writing SBS table")
-    db = db_session.query(SBS).all()
-
-    with open(pth.sbs_path, 'w', newline='') as tsvfile:
-
-        csvwriter = csv.writer(
-            tsvfile, delimiter="\t", quotechar='"', quoting=csv.QUOTE_ALL)
-        column_names = [
-            column.name for column in SBS.__mapper__.columns]
-        csvwriter.writerow(column_names)
-
-        for i in db:
-            row = [
-                getattr(i, column.name)
-                for column in SBS.__mapper__.columns]
-            csvwriter.writerow(row)
+    backup_table(conn, SBS.__table__, pth.sbs_path)  # type: ignore
 
 
 def git_commit():
@@ -7,6 +7,7 @@ from pathlib import Path
 from rich import print
 from typing import Dict, List
 
+from db.bulk_load import bulk_insert
 from db.models import PaliWord, InflectionTemplates
 from db.get_db_session import get_db_session
 from tools.paths import ProjectPaths
@@ -293,7 +294,7 @@ def add_to_db(cpd, dpd_length):
                 meaning_lit = ""
 
             if i.stem:
-                cpd_data = PaliWord(
+                cpd_data = dict(
                     pali_1=i.pali_1,
                     pali_2=i.pali_1,
                     user_id=user_id,
@@ -317,7 +318,8 @@ def add_to_db(cpd, dpd_length):
                 )
                 add_to_db.append(cpd_data)
 
-        db_session.add_all(add_to_db)
+        bulk_insert(
+            db_session.connection(), PaliWord.__table__, add_to_db)  # type: ignore
         db_session.commit()
         db_session.close()
         print(f"[green]{'words added to db':<40}{len(add_to_db)}")
@@ -2,19 +2,22 @@
 
 """Rebuild the databse from scratch from files in backup_tsv folder."""
 
-import csv
 import sys
 
 from rich import print
 
-from sqlalchemy.orm.session import Session
+from sqlalchemy.engine import Connection
 
-from db.get_db_session import get_db_session
+from db.bulk_load import indexes_dropped, load_tsv
+from db.get_db_session import get_db_engine
 from db.db_helpers import create_db_if_not_exists
 from db.models import PaliWord, PaliRoot, Russian, SBS
 from tools.tic_toc import tic, toc
 from tools.paths import ProjectPaths
 
+TSV_TABLES = [
+    PaliWord.__table__, PaliRoot.__table__, Russian.__table__, SBS.__table__]
+
 
 def main():
     tic()
@@ -25,7 +28,7 @@ def main():
     if pth.dpd_db_path.exists():
         pth.dpd_db_path.unlink()
 
-    create_db_if_not_exists(pth.dpd_db_path)
+    create_db_if_not_exists(pth.dpd_db_path, "bulk")
 
     for p in [
         pth.pali_root_path,
@@ -37,73 +40,52 @@ def main():
             print(f"[bright_red]TSV backup file does not exist: {p}")
             sys.exit(1)
 
-    db_session = get_db_session(pth.dpd_db_path)
-
-    make_pali_word_table_data(pth, db_session)
-    make_pali_root_table_data(pth, db_session)
-    make_russian_table_data(pth, db_session)
-    make_sbs_table_data(pth, db_session)
+    db_engine = get_db_engine(pth.dpd_db_path, "bulk")
+    with db_engine.begin() as conn:
+        with indexes_dropped(conn, TSV_TABLES):
+            make_all_table_data(pth, conn)
+    db_engine.dispose()
 
-    db_session.commit()
-    db_session.close()
     print("[bright_green]database restored successfully")
     toc()
 
 
-def make_pali_word_table_data(pth: ProjectPaths, db_session: Session):
-    """Read TSV and return PaliWord table data."""
+def make_all_table_data(pth: ProjectPaths, conn: Connection):
+    make_pali_word_table_data(pth, conn)
+    make_pali_root_table_data(pth, conn)
+    make_russian_table_data(pth, conn)
+    make_sbs_table_data(pth, conn)
+
+
+def make_pali_word_table_data(pth: ProjectPaths, conn: Connection) -> int:
+    """Load the PaliWord table from TSV."""
     print("[green]creating PaliWord table data")
-    with open(pth.pali_word_path, 'r', newline='') as tsvfile:
-        csvreader = csv.reader(tsvfile, delimiter="\t", quotechar='"')
-        columns = next(csvreader)
-        for row in csvreader:
-            data = {}
-            for col_name, value in zip(columns, row):
-                if col_name not in ("created_at", "updated_at"):
-                    data[col_name] = value
-            db_session.add(PaliWord(**data))
-
-
-def make_pali_root_table_data(pth: ProjectPaths, db_session: Session):
-    """Read TSV and return PaliRoot table data."""
+    return load_tsv(
+        conn, PaliWord.__table__, pth.pali_word_path,  # type: ignore
+        skip_columns=("created_at", "updated_at"))
+
+
+def make_pali_root_table_data(pth: ProjectPaths, conn: Connection) -> int:
+    """Load the PaliRoot table from TSV."""
     print("[green]creating PaliRoot table data")
-    with open(pth.pali_root_path, 'r', newline='') as tsvfile:
-        csvreader = csv.reader(tsvfile, delimiter="\t", quotechar='"')
-        columns = next(csvreader)
-        for row in csvreader:
-            data = {}
-            for col_name, value in zip(columns, row):
-                if col_name not in (
-                    "created_at", "updated_at",
-                        "root_info", "root_matrix"):
-                    data[col_name] = value
-            db_session.add(PaliRoot(**data))
-
-
-def make_russian_table_data(pth: ProjectPaths, db_session: Session):
-    """Read TSV and return Russian table data."""
+    return load_tsv(
+        conn, PaliRoot.__table__, pth.pali_root_path,  # type: ignore
+        skip_columns=(
+            "created_at", "updated_at", "root_info", "root_matrix"))
+
+
+def make_russian_table_data(pth: ProjectPaths, conn: Connection) -> int:
+    """Load the Russian table from TSV."""
     print("[green]creating Russian table data")
-    with open(pth.russian_path, 'r', newline='') as tsvfile:
-        csvreader = csv.reader(tsvfile, delimiter="\t", quotechar='"')
-        columns = next(csvreader)
-        for row in csvreader:
-            data = {}
-            for col_name, value in zip(columns, row):
-                data[col_name] = value
-            db_session.add(Russian(**data))
-
-
-def make_sbs_table_data(pth: ProjectPaths, db_session: Session):
-    """Read TSV and return SBS table data."""
+    return load_tsv(
+        conn, Russian.__table__, pth.russian_path)  # type: ignore
+
+
+def make_sbs_table_data(pth: ProjectPaths, conn: Connection) -> int:
+    """Load the SBS table from TSV."""
     print("[green]creating SBS table data")
-    with open(pth.sbs_path, 'r', newline='') as tsvfile:
-        csvreader = csv.reader(tsvfile, delimiter="\t", quotechar='"')
-        columns = next(csvreader)
-        for row in csvreader:
-            data = {}
-            for col_name, value in zip(columns, row):
-                data[col_name] = value
-            db_session.add(SBS(**data))
+    return load_tsv(
+        conn, SBS.__table__, pth.sbs_path)  # type: ignore
 
 
 if __name__ == "__main__":
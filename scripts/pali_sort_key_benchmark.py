@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""Compare the old regex Pāḷi sort key with the translation table key and
+the batch API, sorting the whole pali_1 column."""
+
+import re
+import time
+
+import pandas as pd
+
+from rich import print
+
+from db.get_db_session import get_db_session
+from db.models import PaliWord
+from tools.pali_sort_key import letter_to_number
+from tools.pali_sort_key import pali_sort_key, pali_sort_keys, pali_sorted
+from tools.paths import ProjectPaths
+
+
+def regex_sort_key(word: str) -> str:
+    """The sort key as it was, building the regex on every call."""
+
+    pattern = '|'.join(re.escape(key) for key in letter_to_number.keys())
+
+    def replace(match):
+        return letter_to_number[match.group(0)]
+
+    return re.sub(pattern, replace, word)
+
+
+def timer(name: str, func, repeat: int = 3):
+    """Run func repeat times, print and return the best time and result."""
+
+    best = float("inf")
+    for __ in range(repeat):
+        pali_sort_key.cache_clear()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"[green]{name:<30}[white]{best:>10.3f}s")
+    return best, result
+
+
+def main():
+    print("[bright_yellow]pāḷi sort key benchmark")
+    pth = ProjectPaths()
+    db_session = get_db_session(pth.dpd_db_path)
+    words = [i.pali_1 for i in db_session.query(PaliWord.pali_1).all()]
+    series = pd.Series(words)
+    print(f"[green]{'words':<30}[white]{len(words):>10,}")
+
+    before, expected = timer(
+        "regex key sorted",
+        lambda: sorted(words, key=regex_sort_key), repeat=1)
+    after, result = timer(
+        "sort key sorted",
+        lambda: sorted(words, key=pali_sort_key))
+    batch, batch_result = timer(
+        "pali_sorted",
+        lambda: pali_sorted(words))
+    __, series_result = timer(
+        "series regex key",
+        lambda: series.sort_values(
+            key=lambda x: x.map(regex_sort_key), kind="stable"), repeat=1)
+    __, series_batch_result = timer(
+        "series pali_sort_keys",
+        lambda: series.sort_values(key=pali_sort_keys, kind="stable"))
+
+    print(f"[green]{'speedup':<30}[white]{before / after:>10.1f}x")
+    print(f"[green]{'batch speedup':<30}[white]{before / batch:>10.1f}x")
+
+    if (
+        expected == result == batch_result
+        and series_result.equals(series_batch_result)
+    ):
+        print(f"[green]{'order':<30}[white]{'identical':>10}")
+    else:
+        print(f"[red]{'order':<30}{'differs!':>10}")
+
+
+if __name__ == "__main__":
+    main()
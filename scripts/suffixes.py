@@ -9,7 +9,7 @@ from rich import print
 
 from db.get_db_session import get_db_session
 from db.models import PaliWord
-from tools.pali_sort_key import pali_sort_key
+from tools.pali_sort_key import pali_sort_keys
 from tools.paths import ProjectPaths
 
 
@@ -49,7 +49,7 @@ def main_pandas():
         inplace=True,
         ignore_index=True,
         ascending=[False, True, True, False, True, True],
-        key=lambda x: x.map(pali_sort_key))
+        key=pali_sort_keys)
 
     df = df[[
         "count_suffix", "derivative", "suffix", "count_pos", "pos",
@@ -17,6 +17,7 @@ def config_initialize() -> None:
     config.set("regenerate", "inflections", "yes")
     config.set("regenerate", "transliterations", "yes")
     config.set("regenerate", "freq_maps", "yes")
+    config.set("regenerate", "dictionary", "yes")
 
     config.add_section("deconstructor")
     config.set("deconstructor", "include_cloud", "no")
@@ -42,6 +43,7 @@ def config_initialize() -> None:
     config.add_section("dictionary")
     config.set("dictionary", "make_mdict", "yes")
     config.set("dictionary", "make_link", "no")
+    config.set("dictionary", "header", "inline")
 
     config.add_section("openia")
     config.set("openia", "key", "")
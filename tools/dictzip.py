@@ -0,0 +1,164 @@
+"""Write dictzip (.dz) files, compressing the chunks in parallel.
+
+A dictzip file is a gzip file whose deflate stream is cut into chunks which
+can each be decompressed on their own, with the compressed size of every
+chunk listed in the gzip header. Here each chunk gets its own compressor,
+ending on a full flush, so the chunks are independent and get compressed on
+all cores at once. zlib releases the GIL, so threads are enough. The chunk
+table is assembled once all the chunks of a gzip member are compressed.
+
+Like idzip, a file too big for the chunk table of one gzip member is written
+as several members.
+
+Usage:
+with DictzipWriter(path) as f:
+    f.write(data)
+"""
+
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+import psutil
+
+# the largest uncompressed chunk which always compresses to under 64 kB
+CHUNK_LENGTH = 58315
+
+# the most chunk sizes which fit in the gzip extra field
+MAX_CHUNKS = (0xFFFF - 10) // 2
+
+# an empty, final deflate block, which ends the deflate stream of a member
+FINAL_BLOCK = b"\x03\x00"
+
+GZIP_MAGIC = b"\x1f\x8b"
+DEFLATE = 8
+FEXTRA = 4
+OS_UNIX = 3
+
+
+def compress_chunk(data: bytes, level: int) -> bytes:
+    """Compress a chunk on its own, ending on a byte boundary, so the chunks
+    can be joined into a single deflate stream."""
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def dictzip_header(chunk_length: int, chunk_sizes: List[int]) -> bytes:
+    """gzip member header with the dictzip chunk table in the extra field."""
+
+    chunk_count = len(chunk_sizes)
+    extra = (
+        b"RA"
+        + struct.pack("<HHHH", 6 + 2 * chunk_count, 1, chunk_length, chunk_count)
+        + struct.pack(f"<{chunk_count}H", *chunk_sizes))
+
+    return (
+        GZIP_MAGIC
+        + struct.pack("<BBIBB", DEFLATE, FEXTRA, int(time.time()), 0, OS_UNIX)
+        + struct.pack("<H", len(extra))
+        + extra)
+
+
+class DictzipWriter:
+    """Write-only dictzip file, compressing on all cores."""
+
+    def __init__(
+            self,
+            path: Path,
+            level: int = zlib.Z_DEFAULT_COMPRESSION,
+            chunk_length: int = CHUNK_LENGTH,
+            num_workers: Optional[int] = None
+    ):
+        if num_workers is None:
+            num_workers = psutil.cpu_count()
+
+        self.f = open(path, "wb")
+        self.level = level
+        self.chunk_length = chunk_length
+        self.buffer = bytearray()
+
+        self.executor = ThreadPoolExecutor(max_workers=num_workers)
+        # compressed chunks waiting to be written in order, with their data
+        self.pending: Deque[Tuple[Future, bytes]] = deque()
+        self.max_pending = num_workers * 4
+
+        self._new_member()
+
+    def _new_member(self) -> None:
+        self.member_data = tempfile.TemporaryFile()
+        self.chunk_sizes: List[int] = []
+        self.crc = 0
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        if len(self.buffer) < self.chunk_length:
+            return
+
+        start = 0
+        with memoryview(self.buffer) as view:
+            while len(self.buffer) - start >= self.chunk_length:
+                self._submit(bytes(view[start:start + self.chunk_length]))
+                start += self.chunk_length
+        del self.buffer[:start]
+
+    def _submit(self, chunk: bytes) -> None:
+        future = self.executor.submit(compress_chunk, chunk, self.level)
+        self.pending.append((future, chunk))
+        if len(self.pending) > self.max_pending:
+            self._write_chunk(*self.pending.popleft())
+
+    def _write_chunk(self, future: Future, chunk: bytes) -> None:
+        if len(self.chunk_sizes) == MAX_CHUNKS:
+            self._write_member()
+            self._new_member()
+
+        compressed = future.result()
+        self.member_data.write(compressed)
+        self.chunk_sizes.append(len(compressed))
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.size += len(chunk)
+
+    def _write_member(self) -> None:
+        """Write the header, all the chunks and the trailer of a member."""
+
+        # the final block goes at the end of the last chunk
+        self.member_data.write(FINAL_BLOCK)
+        if self.chunk_sizes:
+            self.chunk_sizes[-1] += len(FINAL_BLOCK)
+        else:
+            self.chunk_sizes.append(len(FINAL_BLOCK))
+
+        self.f.write(dictzip_header(self.chunk_length, self.chunk_sizes))
+        self.member_data.seek(0)
+        shutil.copyfileobj(self.member_data, self.f)
+        self.f.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+        self.member_data.close()
+
+    def close(self) -> None:
+        if self.f.closed:
+            return
+
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self._write_chunk(*self.pending.popleft())
+
+        self._write_member()
+        self.executor.shutdown()
+        self.f.close()
+
+    def __enter__(self) -> "DictzipWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,190 @@
+"""Sparse word × section frequency matrix of the Chaṭṭha Saṅgāyana corpus.
+
+All the section word counts in one matrix, stored row by row: the counts of
+word n are counts[indptr[n]:indptr[n+1]], in the sections with the same
+index. Saved to a single .npz file, which is rebuilt when any of the
+word count csvs are newer.
+
+Usage:
+freq_matrix = load_frequency_matrix(pth)
+counts = freq_matrix.headword_counts([i.inflections_list for i in dd_db])
+"""
+
+import numpy as np
+import pandas as pd
+
+from typing import Dict, List
+
+from tools.paths import ProjectPaths
+
+
+# the order of the sections in the frequency map
+FREQUENCY_SECTIONS = [
+    "vinaya_pārājika_mūla",
+    "vinaya_pārājika_aṭṭhakathā",
+    "vinaya_ṭīkā",
+    "vinaya_pācittiya_mūla",
+    "vinaya_pācittiya_aṭṭhakathā",
+    "vinaya_mahāvagga_mūla",
+    "vinaya_mahāvagga_aṭṭhakathā",
+    "vinaya_cūḷavagga_mūla",
+    "vinaya_cūḷavagga_aṭṭhakathā",
+    "vinaya_parivāra_mūla",
+    "vinaya_parivāra_aṭṭhakathā",
+    "sutta_dīgha_mūla",
+    "sutta_dīgha_aṭṭhakathā",
+    "sutta_dīgha_ṭīkā",
+    "sutta_majjhima_mūla",
+    "sutta_majjhima_aṭṭhakathā",
+    "sutta_majjhima_ṭīkā",
+    "sutta_saṃyutta_mūla",
+    "sutta_saṃyutta_aṭṭhakathā",
+    "sutta_saṃyutta_ṭīkā",
+    "sutta_aṅguttara_mūla",
+    "sutta_aṅguttara_aṭṭhakathā",
+    "sutta_aṅguttara_ṭīkā",
+    "sutta_khuddaka1_mūla",
+    "sutta_khuddaka1_aṭṭhakathā",
+    "sutta_khuddaka2_mūla",
+    "sutta_khuddaka2_aṭṭhakathā",
+    "sutta_khuddaka3_mūla",
+    "sutta_khuddaka3_aṭṭhakathā",
+    "sutta_khuddaka3_ṭīkā",
+    "abhidhamma_dhammasaṅgaṇī_mūla",
+    "abhidhamma_aṭṭhakathā",
+    "abhidhamma_ṭīkā",
+    "abhidhamma_vibhāṅga_mūla",
+    "abhidhamma_dhātukathā_mūla",
+    "abhidhamma_puggalapaññatti_mūla",
+    "abhidhamma_kathāvatthu_mūla",
+    "abhidhamma_yamaka_mūla",
+    "abhidhamma_paṭṭhāna_mūla",
+    "aññā_visuddhimagga",
+    "aññā_visuddhimagga_ṭīkā",
+    "aññā_leḍī",
+    "aññā_buddha_vandanā",
+    "aññā_vaṃsa",
+    "aññā_byākaraṇa",
+    "aññā_pucchavisajjana",
+    "aññā_nīti",
+    "aññā_pakiṇṇaka",
+    "aññā_sihaḷa",
+]
+
+
+class FrequencyMatrix:
+    """Word counts of every section, row by row."""
+
+    def __init__(
+            self,
+            words: np.ndarray,
+            indptr: np.ndarray,
+            sections: np.ndarray,
+            counts: np.ndarray
+    ):
+        self.words = words
+        self.indptr = indptr
+        self.sections = sections
+        self.counts = counts
+        self.word_index: Dict[str, int] = {
+            word: index for index, word in enumerate(words.tolist())}
+
+    def headword_counts(self, inflections_lists: List[List[str]]) -> np.ndarray:
+        """The counts of each list of inflections in every section,
+        as an array of shape (number of lists, number of sections)."""
+
+        word_index = self.word_index
+        row_ids = []
+        word_ids = []
+        for row_id, inflections in enumerate(inflections_lists):
+            for inflection in inflections:
+                word_id = word_index.get(inflection)
+                if word_id is not None:
+                    row_ids.append(row_id)
+                    word_ids.append(word_id)
+
+        rows = np.array(row_ids, dtype=np.int64)
+        word_ids = np.array(word_ids, dtype=np.int64)
+        starts = self.indptr[word_ids]
+        lengths = self.indptr[word_ids + 1] - starts
+
+        # the position of every count of every word found
+        offsets = np.cumsum(lengths) - lengths
+        positions = (
+            np.arange(lengths.sum())
+            - np.repeat(offsets, lengths)
+            + np.repeat(starts, lengths))
+
+        section_count = len(FREQUENCY_SECTIONS)
+        cells = (
+            np.repeat(rows, lengths) * section_count
+            + self.sections[positions])
+        totals = np.bincount(
+            cells,
+            weights=self.counts[positions],
+            minlength=len(inflections_lists) * section_count)
+
+        return totals.astype(np.int64).reshape(
+            len(inflections_lists), section_count)
+
+
+def make_frequency_matrix(pth: ProjectPaths) -> FrequencyMatrix:
+    """Read all the section word count csvs into one matrix."""
+
+    dfs = []
+    for section_id, section in enumerate(FREQUENCY_SECTIONS):
+        df = pd.read_csv(
+            pth.word_count_dir.joinpath(section).with_suffix(".csv"),
+            sep="\t", header=None, names=["word", "count"],
+            dtype={"word": str}, keep_default_na=False)
+        df["section"] = section_id
+        dfs.append(df)
+
+    df = pd.concat(dfs, ignore_index=True)
+    df.drop_duplicates(subset=["word", "section"], keep="last", inplace=True)
+
+    word_ids, words = pd.factorize(df["word"], sort=True)
+    order = np.lexsort((df["section"].to_numpy(), word_ids))
+    row_lengths = np.bincount(word_ids, minlength=len(words))
+
+    indptr = np.zeros(len(words) + 1, dtype=np.int64)
+    np.cumsum(row_lengths, out=indptr[1:])
+
+    return FrequencyMatrix(
+        words=np.asarray(words, dtype=str),
+        indptr=indptr,
+        sections=df["section"].to_numpy(dtype=np.int64)[order],
+        counts=df["count"].to_numpy(dtype=np.int64)[order])
+
+
+def save_frequency_matrix(pth: ProjectPaths, freq_matrix: FrequencyMatrix):
+    np.savez(
+        pth.freq_matrix_path,
+        words=freq_matrix.words,
+        indptr=freq_matrix.indptr,
+        sections=freq_matrix.sections,
+        counts=freq_matrix.counts)
+
+
+def load_frequency_matrix(pth: ProjectPaths) -> FrequencyMatrix:
+    """Load the saved matrix, or make and save it again if any of the
+    word count csvs changed since it was saved."""
+
+    csv_mtime = max(
+        pth.word_count_dir.joinpath(section).with_suffix(".csv").stat().st_mtime
+        for section in FREQUENCY_SECTIONS)
+
+    if (
+        pth.freq_matrix_path.exists()
+        and pth.freq_matrix_path.stat().st_mtime > csv_mtime
+    ):
+        with np.load(pth.freq_matrix_path) as npz:
+            return FrequencyMatrix(
+                words=npz["words"],
+                indptr=npz["indptr"],
+                sections=npz["sections"],
+                counts=npz["counts"])
+
+    freq_matrix = make_frequency_matrix(pth)
+    save_frequency_matrix(pth, freq_matrix)
+    return freq_matrix
@@ -0,0 +1,130 @@
+"""Compact, memory-mapped trie of inflections for prefix lookups.
+
+Nodes are all the prefixes of all the words, ordered by (length, word).
+That puts the children of every node next to each other, sorted by their last
+letter, so each node only needs to store its last letter and where its
+children start. The whole trie is three flat arrays written to a single file,
+which gets memory-mapped and shared by all processes reading it.
+
+Usage:
+save_inflections_trie(path, all_inflections_set)
+trie = InflectionsTrie(path)
+trie.prefix_lengths(word, INFLECTION | NOLAST)
+"""
+
+import mmap
+import struct
+
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, List, Set
+
+# node flags
+INFLECTION = 1
+# the inflection minus its last letter
+NOLAST = 2
+
+MAGIC = b"DPDTRIE1"
+HEADER = struct.Struct("<8sI")
+
+
+def save_inflections_trie(path: Path, inflections: Iterable[str]) -> int:
+    """Build a trie of the inflections and save it to path.
+    Returns the number of nodes."""
+
+    inflections_set: Set[str] = set(inflections)
+    nolast_set: Set[str] = set(i[:-1] for i in inflections_set)
+
+    prefixes_set: Set[str] = set()
+    for inflection in inflections_set:
+        for length in range(len(inflection) + 1):
+            prefixes_set.add(inflection[:length])
+
+    nodes = sorted(prefixes_set, key=lambda x: (len(x), x))
+    node_count = len(nodes)
+    del prefixes_set
+
+    chars = array("I", [0]) * node_count
+    flags = array("B", [0]) * node_count
+    # first_child[n] to first_child[n+1] are the children of node n
+    first_child = array("I", [0]) * (node_count + 1)
+
+    # parents are in the previous level in the same order as their children,
+    # so walk both levels together
+    parent = 0
+    for node_id in range(1, node_count):
+        node = nodes[node_id]
+        while nodes[parent] != node[:-1]:
+            parent += 1
+        first_child[parent + 1] += 1
+        chars[node_id] = ord(node[-1])
+
+    for node_id, node in enumerate(nodes):
+        if node in inflections_set:
+            flags[node_id] |= INFLECTION
+        if node in nolast_set:
+            flags[node_id] |= NOLAST
+
+    # children counts to offsets
+    first_child[0] = 1
+    for node_id in range(1, node_count + 1):
+        first_child[node_id] += first_child[node_id - 1]
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, node_count))
+        f.write(first_child.tobytes())
+        f.write(chars.tobytes())
+        f.write(flags.tobytes())
+
+    return node_count
+
+
+class InflectionsTrie:
+    """Read-only, memory-mapped trie saved by save_inflections_trie."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, node_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an inflections trie")
+
+        view = memoryview(self.mm)
+        start = HEADER.size
+        end = start + (node_count + 1) * 4
+        self.first_child = view[start:end].cast("I")
+        start, end = end, end + node_count * 4
+        self.chars = view[start:end].cast("I")
+        start, end = end, end + node_count
+        self.flags = view[start:end]
+        self.node_count = node_count
+
+    def prefix_lengths(self, word: str, mask: int) -> List[int]:
+        """Lengths of all the prefixes of the word whose node has any of the
+        flags in mask, shortest first, in a single walk down the trie."""
+
+        first_child = self.first_child
+        chars = self.chars
+        flags = self.flags
+
+        lengths = []
+        node = 0
+        if flags[0] & mask:
+            lengths.append(0)
+
+        for length, char in enumerate(word, start=1):
+            hi = first_child[node + 1]
+            code = ord(char)
+            node = bisect_left(chars, code, first_child[node], hi)
+            if node == hi or chars[node] != code:
+                break
+            if flags[node] & mask:
+                lengths.append(length)
+
+        return lengths
+
+    def __contains__(self, word: str) -> bool:
+        lengths = self.prefix_lengths(word, INFLECTION)
+        return bool(lengths) and lengths[-1] == len(word)
@@ -0,0 +1,31 @@
+"""Compile each Mako template once per process and share it.
+
+Compiled templates are also written as modules to temp/mako_modules, so a new
+process only has to import them, and forked workers inherit every template
+compiled before the fork.
+
+Usage:
+templ = get_template(pth, pth.header_templ_path)
+html = templ.render(...)
+"""
+
+from pathlib import Path
+from typing import Dict
+
+from mako.template import Template
+
+from tools.paths import ProjectPaths
+
+template_cache: Dict[str, Template] = {}
+
+
+def get_template(pth: ProjectPaths, templ_path: Path) -> Template:
+    """Return the compiled template at templ_path,
+    compiling it only the first time it's asked for."""
+
+    key = str(templ_path)
+    if key not in template_cache:
+        template_cache[key] = Template(
+            filename=key,
+            module_directory=str(pth.mako_modules_dir))
+    return template_cache[key]
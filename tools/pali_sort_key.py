@@ -1,6 +1,7 @@
 """Functions for sorting by Pāḷi alphabetical order."""
 
-import re
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional
 
 letter_to_number = {
         "√": "00",
@@ -48,6 +49,13 @@ letter_to_number = {
     }
 
 
+# the alternation in the original regex tried "k" before "kh" and so on,
+# so only single letters were ever replaced. a translation table does exactly
+# the same in a single pass over the word.
+pali_sort_table = str.maketrans(
+    {key: value for key, value in letter_to_number.items() if len(key) == 1})
+
+
 def pali_list_sorter(words: list) -> list:
     """Sort a list of words in Pāḷi alphabetical order.
     Usage:
@@ -57,17 +65,10 @@ def pali_list_sorter(words: list) -> list:
         return []
 
     else:
-        pattern = "|".join(key for key in letter_to_number.keys())
-
-        def replace(match):
-            return letter_to_number[match.group(0)]
-
-        sorted_words = sorted(
-            words, key=lambda word: re.sub(pattern, replace, word))
-
-        return sorted_words
+        return pali_sorted(words)
 
 
+@lru_cache(maxsize=2**18)
 def pali_sort_key(word: str) -> str:
     """A key for sorting in Pāḷi alphabetical order."
     Usage:
@@ -75,14 +76,46 @@ def pali_sort_key(word: str) -> str:
     db = sorted(db, key=lambda x: pali_sort_key(x.pali_1))
     df.sort_values(
         by="pali_1", inplace=True, ignore_index=True,
-        key=lambda x: x.map(pali_sort_key))"""
-
-    pattern = '|'.join(re.escape(key) for key in letter_to_number.keys())
-
-    def replace(match):
-        return letter_to_number[match.group(0)]
+        key=pali_sort_keys)"""
 
     if isinstance(word, int):
         return word
     else:
-        return re.sub(pattern, replace, word)
+        return word.translate(pali_sort_table)
+
+
+def pali_sort_keys(words):
+    """Pāḷi sort keys for a whole list or pandas Series in one pass.
+    Usage:
+    keys = pali_sort_keys(list_of_pali_words)
+    df.sort_values(
+        by="pali_1", inplace=True, ignore_index=True,
+        key=pali_sort_keys)"""
+
+    if hasattr(words, "map"):
+        return words.map(pali_sort_key)
+    else:
+        table = pali_sort_table
+        return [
+            word.translate(table) if isinstance(word, str) else word
+            for word in words]
+
+
+def pali_sorted(
+        words: Iterable,
+        key: Optional[Callable] = None,
+        reverse: bool = False
+) -> List:
+    """Sort anything in Pāḷi alphabetical order, computing each key once.
+    Usage:
+    words = pali_sorted(list_of_pali_words)
+    db = pali_sorted(db, key=lambda x: x.pali_1)"""
+
+    items = list(words)
+    if key is None:
+        keys = pali_sort_keys(items)
+    else:
+        keys = pali_sort_keys([key(item) for item in items])
+
+    order = sorted(range(len(items)), key=keys.__getitem__, reverse=reverse)
+    return [items[i] for i in order]
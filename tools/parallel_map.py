@@ -0,0 +1,206 @@
+"""Map a function over a list with a pool of forked worker processes.
+
+The list is split into many small chunks of consecutive items, which the pool
+hands out to whichever worker is free, so one slow chunk doesn't hold up the
+rest. Given a cost estimate of each item, the chunks are cut to roughly equal
+cost and the most expensive ones are handed out first.
+
+The workers are forked after the function and the list are set up, so they
+share them with the parent and only the chunk boundaries get sent to them.
+Each worker sends back the results of a whole chunk in a single pickle, and
+the results come back in the same order as the items.
+
+Usage:
+results = parallel_map(render_word, words)
+results = parallel_map_chunks(
+    render_batch, words, costs=[len(i.html) for i in words], report=True)
+"""
+
+import math
+import multiprocessing
+import os
+import time
+
+import psutil
+
+from bisect import bisect_left
+from itertools import accumulate
+from rich import print
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypedDict
+
+# called with the number of items done and the total number of items
+ProgressCallback = Callable[[int, int], None]
+
+# chunk_idx, start, end
+Chunk = Tuple[int, int, int]
+
+# the function and the items being mapped, inherited by the forked workers
+_chunk_func: Optional[Callable[[int, Sequence], Any]] = None
+_items: Sequence = []
+
+
+class WorkerStats(TypedDict):
+    chunks: int
+    items: int
+    busy: float
+
+
+def _run_chunk(chunk: Chunk) -> Tuple[int, int, float, Any]:
+    chunk_idx, start, end = chunk
+    assert _chunk_func is not None
+    started = time.perf_counter()
+    res = _chunk_func(chunk_idx, _items[start:end])
+    return chunk_idx, os.getpid(), time.perf_counter() - started, res
+
+
+def _map_items(func: Callable) -> Callable[[int, Sequence], List]:
+    def _map_chunk(__chunk_idx__: int, chunk: Sequence) -> List:
+        return [func(i) for i in chunk]
+    return _map_chunk
+
+
+def make_chunks(
+        item_count: int,
+        num_chunks: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        costs: Optional[Sequence[float]] = None
+) -> List[Chunk]:
+    """(chunk_idx, start, end) of every chunk. Defaults to eight chunks per
+    worker. With costs, the chunks are cut to roughly equal total cost
+    instead of equal length, unless all the costs are zero."""
+
+    if item_count == 0:
+        return []
+
+    if num_chunks is None:
+        if chunk_size is not None and costs is None:
+            num_chunks = math.ceil(item_count / max(chunk_size, 1))
+        else:
+            num_chunks = (num_workers or psutil.cpu_count()) * 8
+    num_chunks = max(min(num_chunks, item_count), 1)
+
+    cumulative_costs = list(accumulate(costs)) if costs is not None else []
+    total_cost = cumulative_costs[-1] if cumulative_costs else 0
+
+    # without any cost to balance, cut equal lengths
+    if total_cost > 0:
+        bounds = [0]
+        for n in range(1, num_chunks):
+            bound = bisect_left(
+                cumulative_costs, total_cost * n / num_chunks) + 1
+            if bounds[-1] < bound < item_count:
+                bounds.append(bound)
+        bounds.append(item_count)
+
+    else:
+        size = math.ceil(item_count / num_chunks)
+        bounds = list(range(0, item_count, size)) + [item_count]
+
+    return [
+        (chunk_idx, start, end)
+        for chunk_idx, (start, end) in enumerate(zip(bounds, bounds[1:]))
+        if end > start]
+
+
+def print_worker_stats(
+        worker_stats: Dict[int, WorkerStats],
+        wall_time: float
+) -> None:
+    """How busy each worker was, so stragglers are easy to spot."""
+
+    print(f"[green]{'worker':<10}{'chunks':>10}{'items':>10}{'busy':>10}{'util':>10}")
+    for worker_idx, stats in enumerate(worker_stats.values()):
+        utilisation = stats["busy"] / wall_time if wall_time else 0
+        print(
+            f"[white]{worker_idx:<10}{stats['chunks']:>10,}"
+            f"{stats['items']:>10,}{stats['busy']:>9.2f}s{utilisation:>10.0%}")
+
+
+def parallel_map_chunks(
+        func: Callable[[int, Sequence], Any],
+        items: Sequence,
+        num_workers: Optional[int] = None,
+        num_chunks: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        costs: Optional[Sequence[float]] = None,
+        progress: Optional[ProgressCallback] = None,
+        report: bool = False
+) -> List[Any]:
+    """Call func(chunk_idx, chunk) on every chunk of items in parallel,
+    return the results of each chunk in order."""
+
+    global _chunk_func, _items
+
+    if num_workers is None:
+        num_workers = psutil.cpu_count()
+
+    chunks = make_chunks(
+        len(items), num_chunks, chunk_size, num_workers, costs)
+    num_workers = min(num_workers, len(chunks))
+    results: List[Any] = [None] * len(chunks)
+
+    if num_workers <= 1:
+        for chunk_idx, start, end in chunks:
+            results[chunk_idx] = func(chunk_idx, items[start:end])
+            if progress is not None:
+                progress(end, len(items))
+        return results
+
+    chunk_lengths = [end - start for __i__, start, end in chunks]
+
+    if costs is not None:
+        # the most expensive chunks first, so none are left for the end
+        chunk_costs = [sum(costs[start:end]) for __i__, start, end in chunks]
+        chunks = sorted(chunks, key=lambda x: chunk_costs[x[0]], reverse=True)
+
+    worker_stats: Dict[int, WorkerStats] = {}
+    started = time.perf_counter()
+
+    _chunk_func, _items = func, items
+    try:
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(processes=num_workers) as pool:
+            done = 0
+            for chunk_idx, pid, busy, res in pool.imap_unordered(
+                    _run_chunk, chunks):
+                results[chunk_idx] = res
+                stats = worker_stats.setdefault(
+                    pid, WorkerStats(chunks=0, items=0, busy=0.0))
+                stats["chunks"] += 1
+                stats["items"] += chunk_lengths[chunk_idx]
+                stats["busy"] += busy
+                done += chunk_lengths[chunk_idx]
+                if progress is not None:
+                    progress(done, len(items))
+    finally:
+        _chunk_func, _items = None, []
+
+    if report:
+        print_worker_stats(worker_stats, time.perf_counter() - started)
+
+    return results
+
+
+def parallel_map(
+        func: Callable[[Any], Any],
+        items: Sequence,
+        num_workers: Optional[int] = None,
+        num_chunks: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        costs: Optional[Sequence[float]] = None,
+        progress: Optional[ProgressCallback] = None,
+        report: bool = False
+) -> List[Any]:
+    """Call func on every item in parallel, return the results in order."""
+
+    chunk_results = parallel_map_chunks(
+        _map_items(func), items,
+        num_workers=num_workers,
+        num_chunks=num_chunks,
+        chunk_size=chunk_size,
+        costs=costs,
+        progress=progress,
+        report=report)
+
+    return [res for chunk_res in chunk_results for res in chunk_res]
@@ -88,6 +88,8 @@ class ProjectPaths:
         self.zip_dir = base_dir.joinpath(Path("exporter/share"))
         self.zip_path = base_dir.joinpath(Path("exporter/share/dpd.zip"))
         self.mdict_mdx_path = base_dir.joinpath(Path("exporter/share/dpd-mdict.mdx"))
+        self.dpd_css_res_path = base_dir.joinpath(Path("exporter/share/dpd.css"))
+        self.dpd_js_res_path = base_dir.joinpath(Path("exporter/share/dpd.js"))
         self.grammar_dict_zip_path = base_dir.joinpath(Path("exporter/share/dpd-grammar.zip"))
         self.grammar_dict_mdict_path = base_dir.joinpath(Path("exporter/share/dpd-grammar-mdict.mdx"))
         self.dpd_kindle_path = base_dir.joinpath(Path("exporter/share/dpd-kindle.mobi"))
@@ -97,6 +99,7 @@ class ProjectPaths:
         # /exporter/templates
         self.templates_dir = base_dir.joinpath(Path("exporter/templates"))
         self.header_templ_path = base_dir.joinpath(Path("exporter/templates/header.html"))
+        self.header_linked_templ_path = base_dir.joinpath(Path("exporter/templates/header_linked.html"))
         self.dpd_definition_templ_path = base_dir.joinpath(Path("exporter/templates/dpd_defintion.html"))
         self.button_box_templ_path = base_dir.joinpath(Path("exporter/templates/dpd_button_box.html"))
         self.grammar_templ_path = base_dir.joinpath(Path("exporter/templates/dpd_grammar.html"))
@@ -134,11 +137,15 @@ class ProjectPaths:
         self.tpr_i2h_tsv_path = base_dir.joinpath(Path("exporter/tpr/i2h.tsv"))
         self.tpr_deconstructor_tsv_path = base_dir.joinpath(Path("exporter/tpr/deconstructor.tsv"))
 
+        # /frequency
+        self.freq_map_templ_path = base_dir.joinpath(Path("frequency/frequency.html"))
+
         # /frequency/output
         self.frequency_output_dir = base_dir.joinpath(Path("frequency/output/"))
         self.raw_text_dir = base_dir.joinpath(Path("frequency/output/raw_text/"))
         self.freq_html_dir = base_dir.joinpath(Path("frequency/output/html/"))
         self.word_count_dir = base_dir.joinpath(Path("frequency/output/word_count"))
+        self.freq_matrix_path = base_dir.joinpath(Path("frequency/output/word_count/freq_matrix.npz"))
         self.tipitaka_raw_text_path = base_dir.joinpath(Path("frequency/output/raw_text/tipitaka.txt"))
         self.tipitaka_word_count_path = base_dir.joinpath(Path("frequency/output/word_count/tipitaka.csv"))
         self.ebt_raw_text_path = base_dir.joinpath(Path("frequency/output/raw_text/ebts.txt"))
@@ -185,6 +192,8 @@ class ProjectPaths:
         self.sandhi_assests_dir = base_dir.joinpath(Path("sandhi/assets"))
         self.unmatched_set_path = base_dir.joinpath(Path("sandhi/assets/unmatched_set"))
         self.all_inflections_set_path = base_dir.joinpath(Path("sandhi/assets/all_inflections_set"))
+        self.all_inflections_trie_path = base_dir.joinpath(Path("sandhi/assets/all_inflections_trie"))
+        self.all_inflections_trie_reversed_path = base_dir.joinpath(Path("sandhi/assets/all_inflections_trie_reversed"))
         self.text_set_path = base_dir.joinpath(Path("sandhi/assets/text_set"))
         self.neg_inflections_set_path = base_dir.joinpath(Path("sandhi/assets/neg_inflections_set"))
         self.matches_dict_path = base_dir.joinpath(Path("sandhi/assets/matches_dict"))
@@ -200,8 +209,12 @@ class ProjectPaths:
         self.sandhi_dict_path = base_dir.joinpath(Path("sandhi/output/sandhi_dict"))
         self.sandhi_dict_df_path = base_dir.joinpath(Path("sandhi/output/sandhi_dict_df.tsv"))
         self.sandhi_timer_path = base_dir.joinpath(Path("sandhi/output/timer.tsv"))
+        self.sandhi_split_store_path = base_dir.joinpath(Path("sandhi/output/split_store"))
         self.rule_counts_path = base_dir.joinpath(Path("sandhi/output/rule_counts/rule_counts.tsv"))
 
+        # /sandhi/output/shards
+        self.sandhi_shards_dir = base_dir.joinpath(Path("sandhi/output/shards/"))
+
         # /sandhi/output/rule_counts
         self.rule_counts_dir = base_dir.joinpath(Path("sandhi/output/rule_counts/"))
 
@@ -247,6 +260,9 @@ class ProjectPaths:
 
         # temp
         self.temp_dir = base_dir.joinpath(Path("temp/"))
+        self.mako_modules_dir = base_dir.joinpath(Path("temp/mako_modules/"))
+        self.render_spool_dir = base_dir.joinpath(Path("temp/render_spool/"))
+        self.render_cache_path = base_dir.joinpath(Path("temp/render_cache.db"))
 
         # /tests
         self.internal_tests_path = base_dir.joinpath(Path("tests/internal_tests.tsv"))
@@ -287,10 +303,12 @@ class ProjectPaths:
             self.word_count_dir,
             self.tbw_output_dir,
             self.temp_dir,
+            self.mako_modules_dir,
             self.sandhi_assests_dir,
             self.sandhi_output_dir,
             self.sandhi_output_do_dir,
             self.rule_counts_dir,
+            self.sandhi_shards_dir,
             self.letters_dir,
         ]:
             d.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,187 @@
+"""Cache of rendered dictionary entries between exports.
+
+Every entry is saved with a hash of all the rows it's rendered from, in a
+side sqlite db. The next export only renders the entries whose hash changed,
+and reuses the saved html of the rest.
+
+Everything all the entries depend on (templates, css, js, the rendering code,
+config options) goes into one fingerprint per kind of entry. When that
+changes, the whole kind gets rendered again.
+
+The date of the export is in every entry, so it gets swapped for the new date
+when an entry is reused, instead of invalidating the whole cache every day.
+
+Usage:
+render_cache = RenderCache(pth.render_cache_path, "dpd", fingerprint, today)
+cached_hashes = render_cache.hashes()
+cached = render_cache.read(ids)
+render_cache.save(changed_entries)
+"""
+
+import hashlib
+import json
+import sqlite3
+import zlib
+
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.utils import RenderResult, RenderedSizes
+
+# id, hash, rendered entry, rendered sizes
+CacheEntry = Tuple[str, str, RenderResult, RenderedSizes]
+
+# sqlite's default limit of variables in a statement is 999
+MAX_IDS_PER_QUERY = 500
+
+
+def row_values(row: Optional[Any]) -> Optional[Tuple]:
+    """All the column values of a db row."""
+
+    if row is None:
+        return None
+    return tuple(getattr(row, c.key) for c in row.__table__.columns)
+
+
+def hash_values(*values: Any) -> str:
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+
+def fingerprint(paths: Iterable[Path], *values: Any) -> str:
+    """Hash of the contents of the files and the values."""
+
+    h = hashlib.sha1()
+    for path in paths:
+        h.update(path.read_bytes())
+    h.update(repr(values).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _id_batches(ids: List[str]) -> Iterator[List[str]]:
+    ids_iter = iter(ids)
+    while True:
+        batch = list(islice(ids_iter, MAX_IDS_PER_QUERY))
+        if not batch:
+            return
+        yield batch
+
+
+class RenderCache:
+    """Rendered entries of one kind, keyed by id.
+
+    Each call opens its own connection, so forked workers can read from
+    the cache at the same time."""
+
+    def __init__(
+            self,
+            path: Path,
+            kind: str,
+            fingerprint: str,
+            today: str
+    ):
+        self.path = path
+        self.kind = kind
+        self.today = today
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS render_cache ("
+                "kind TEXT, id TEXT, hash TEXT, today TEXT, "
+                "html BLOB, entry TEXT, sizes TEXT, "
+                "PRIMARY KEY (kind, id))")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS render_cache_fingerprint ("
+                "kind TEXT PRIMARY KEY, fingerprint TEXT)")
+
+            row = conn.execute(
+                "SELECT fingerprint FROM render_cache_fingerprint "
+                "WHERE kind = ?", (kind,)).fetchone()
+
+        if row is None or row[0] != fingerprint:
+            self.clear()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO render_cache_fingerprint "
+                    "(kind, fingerprint) VALUES (?, ?)", (kind, fingerprint))
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM render_cache WHERE kind = ?", (self.kind,))
+
+    def hashes(self) -> Dict[str, str]:
+        """The hash of every cached entry."""
+
+        with self._connect() as conn:
+            return dict(conn.execute(
+                "SELECT id, hash FROM render_cache WHERE kind = ?",
+                (self.kind,)))
+
+    def read(self, ids: List[str]) -> Dict[str, Tuple[RenderResult, RenderedSizes]]:
+        """The cached entries of the ids, with today's date."""
+
+        cached = {}
+        conn = self._connect()
+        try:
+            for batch in _id_batches(ids):
+                placeholders = ",".join("?" for __i__ in batch)
+                for id, today, html, entry, sizes in conn.execute(
+                    "SELECT id, today, html, entry, sizes FROM render_cache "
+                    f"WHERE kind = ? AND id IN ({placeholders})",
+                    [self.kind, *batch]
+                ):
+                    html = zlib.decompress(html).decode("utf-8")
+                    if today != self.today:
+                        html = html.replace(today, self.today)
+                    entry = json.loads(entry)
+                    cached[id] = (
+                        RenderResult(
+                            word = entry["word"],
+                            definition_html = html,
+                            definition_plain = entry["definition_plain"],
+                            synonyms = entry["synonyms"]),
+                        json.loads(sizes))
+        finally:
+            conn.close()
+
+        return cached
+
+    def save(self, entries: Iterable[CacheEntry]) -> int:
+        """Add or replace the entries, return how many."""
+
+        def _rows():
+            for id, hash, res, sizes in entries:
+                yield (
+                    self.kind,
+                    id,
+                    hash,
+                    self.today,
+                    zlib.compress(res["definition_html"].encode("utf-8"), 1),
+                    json.dumps({
+                        "word": res["word"],
+                        "definition_plain": res["definition_plain"],
+                        "synonyms": res["synonyms"]},
+                        ensure_ascii=False),
+                    json.dumps(sizes))
+
+        with self._connect() as conn:
+            cursor = conn.executemany(
+                "INSERT OR REPLACE INTO render_cache "
+                "(kind, id, hash, today, html, entry, sizes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _rows())
+            return cursor.rowcount
+
+    def prune(self, ids: Iterable[str]) -> int:
+        """Remove the entries which are not in ids, return how many."""
+
+        keep = set(ids)
+        stale = [(self.kind, id) for id in self.hashes() if id not in keep]
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM render_cache WHERE kind = ? AND id = ?", stale)
+        return len(stale)
@@ -0,0 +1,77 @@
+"""Spool rendered dictionary entries to disk and read them back one at a
+time, so a whole rendered dictionary never has to be held in memory.
+
+Each part of the dictionary is pickled entry by entry to its own file in the
+spool directory. Iterating over the spool reads the parts back in the order
+they were added.
+
+Usage:
+spool = RenderSpool(pth.render_spool_dir)
+spool.extend("roots", root_data_list)
+for i in spool:
+    ...
+"""
+
+import pickle
+
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from tools.utils import RenderResult
+
+
+def write_spool_file(path: Path, results: Iterable[RenderResult]) -> int:
+    """Pickle the results one by one to path, return how many."""
+
+    count = 0
+    with open(path, "wb") as f:
+        for result in results:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            count += 1
+    return count
+
+
+def read_spool_file(path: Path) -> Iterator[RenderResult]:
+    """Unpickle the results in path one by one."""
+
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class RenderSpool:
+    """All the parts of a rendered dictionary, spooled to disk."""
+
+    def __init__(self, spool_dir: Path):
+        self.spool_dir = spool_dir
+        self.paths: List[Path] = []
+        self.count = 0
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.spool_dir.glob("*.pickle"):
+            path.unlink()
+
+    def part_path(self, name: str) -> Path:
+        """The file for a part of the dictionary, which can be written
+        by another process and added to the spool afterwards."""
+        return self.spool_dir.joinpath(f"{name}.pickle")
+
+    def add(self, path: Path, count: int) -> None:
+        """Add a part already written to path."""
+        self.paths.append(path)
+        self.count += count
+
+    def extend(self, name: str, results: Iterable[RenderResult]) -> None:
+        """Write results to a new part and add it."""
+        path = self.part_path(name)
+        self.add(path, write_spool_file(path, results))
+
+    def __iter__(self) -> Iterator[RenderResult]:
+        for path in self.paths:
+            yield from read_spool_file(path)
+
+    def __len__(self) -> int:
+        return self.count
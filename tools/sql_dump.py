@@ -0,0 +1,121 @@
+"""Write tables of rows as an SQL dump, or straight into an sqlite db.
+
+The dump is streamed to any text file object, a table at a time, with the
+rows batched into multi-row INSERT statements. Values are quoted by
+sql_literal, so they never have to be escaped by hand.
+
+Usage:
+with open(path, "w") as f:
+    dump = SqlDumpWriter(f)
+    dump.begin()
+    dump.insert_rows("dpd", ["word", "definition", "book_id"], rows)
+    dump.commit()
+
+copy_tables_to_db(conn, tables)
+"""
+
+import sqlite3
+
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Sequence, TextIO, TypedDict
+
+# sqlite's default limit on the rows of a single VALUES clause
+MAX_ROWS_PER_INSERT = 500
+
+
+def sql_literal(value: Any) -> str:
+    """A value as an sqlite literal."""
+
+    if value is None:
+        return "NULL"
+    elif isinstance(value, bool):
+        return str(int(value))
+    elif isinstance(value, (int, float)):
+        return str(value)
+    else:
+        value = str(value).replace("'", "''")
+        return f"'{value}'"
+
+
+def quote_name(name: str) -> str:
+    name = name.replace('"', '""')
+    return f'"{name}"'
+
+
+def _batches(rows: Iterable[Sequence], batch_size: int) -> Iterator[List[Sequence]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class SqlDumpWriter:
+    """Streams SQL statements to a text file object."""
+
+    def __init__(self, f: TextIO, batch_size: int = MAX_ROWS_PER_INSERT):
+        self.f = f
+        self.batch_size = min(batch_size, MAX_ROWS_PER_INSERT)
+
+    def write(self, statement: str) -> None:
+        self.f.write(f"{statement};\n")
+
+    def begin(self) -> None:
+        self.write("BEGIN TRANSACTION")
+
+    def commit(self) -> None:
+        self.write("COMMIT")
+
+    def delete_all(self, table: str) -> None:
+        self.write(f"DELETE FROM {quote_name(table)}")
+
+    def insert_rows(
+            self,
+            table: str,
+            columns: Sequence[str],
+            rows: Iterable[Sequence]
+    ) -> int:
+        """Write the rows as multi-row INSERTs, return how many."""
+
+        insert = (
+            f"INSERT INTO {quote_name(table)} "
+            f"({','.join(quote_name(i) for i in columns)}) VALUES\n")
+
+        count = 0
+        for batch in _batches(rows, self.batch_size):
+            values = ",\n".join(
+                f"({','.join(sql_literal(i) for i in row)})" for row in batch)
+            self.f.write(f"{insert}{values};\n")
+            count += len(batch)
+
+        return count
+
+
+class SqlTable(TypedDict):
+    name: str
+    columns: List[str]
+    rows: List[Sequence]
+
+
+def copy_tables_to_db(conn: sqlite3.Connection, tables: List[SqlTable]) -> None:
+    """Drop, recreate and fill all the tables with executemany,
+    in a single transaction."""
+
+    conn.execute("BEGIN")
+    try:
+        for table in tables:
+            name = quote_name(table["name"])
+            columns = ", ".join(quote_name(i) for i in table["columns"])
+            placeholders = ", ".join("?" for __i__ in table["columns"])
+
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.execute(f"CREATE TABLE {name} ({columns})")
+            conn.executemany(
+                f"INSERT INTO {name} ({columns}) VALUES ({placeholders})",
+                table["rows"])
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
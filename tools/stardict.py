@@ -13,14 +13,17 @@ import html
 import multiprocessing
 from pathlib import Path
 import datetime
-from typing import List, TypedDict, Optional
+from typing import Iterable, List, TypedDict, Optional
 import shutil
+from contextlib import ExitStack
 from zipfile import ZipFile
 import struct
 import idzip
 import re
 from enum import Enum
 
+from tools.dictzip import DictzipWriter
+
 
 class QueryType(str, Enum):
     suttas = "suttas"
@@ -564,14 +567,18 @@ def write_ifo(ifo: StarDictIfo, paths: StarDictPaths):
 class WriteResult(TypedDict):
     idx_size: Optional[int]
     syn_count: Optional[int]
+    word_count: Optional[int]
 
 
-def write_words(words: List[DictEntry], paths: StarDictPaths) -> WriteResult:
-    """Writes .idx, .dict.dz, .syn.dz"""
+def write_words(words: Iterable[DictEntry], paths: StarDictPaths) -> WriteResult:
+    """Writes .idx, .dict.dz, .syn.dz in a single pass over the words,
+    so they can be streamed in. The .dz files are compressed on all cores,
+    the .idx is written in one go at the end."""
 
     res = WriteResult(
         idx_size=None,
-        syn_count=None
+        syn_count=None,
+        word_count=None,
     )
 
     if paths['idx_path'] is None or paths['dic_path'] is None:
@@ -579,52 +586,42 @@ def write_words(words: List[DictEntry], paths: StarDictPaths) -> WriteResult:
         print(f"[bright_red]{msg}")
         return res
 
-    idx: List[IdxEntry] = []
+    idx_buffer = bytearray()
+    pack_idx = struct.Struct(">II").pack
+    pack_syn = struct.Struct(">I").pack
+
+    with ExitStack() as stack:
+        dic_file = stack.enter_context(DictzipWriter(paths['dic_path']))
+        syn_file = None
+        if paths['syn_path'] is not None:
+            syn_file = stack.enter_context(DictzipWriter(paths['syn_path']))
+            res['syn_count'] = 0
 
-    with idzip.IdzipFile(f"{paths['dic_path']}", "wb") as f:
         offset_begin = 0
-        data_size = 0
-        for w in words:
+        word_count = 0
+        for n, w in enumerate(words):
             d = bytes(w['definition_html'], 'utf-8')
-            f.write(d)
-
+            dic_file.write(d)
             data_size = len(d)
 
-            idx.append(IdxEntry(
-                word=w['word'],
-                offset_begin=offset_begin,
-                data_size=data_size,
-            ))
-
+            idx_buffer += bytes(f"{w['word']}\0", "utf-8")
+            idx_buffer += pack_idx(offset_begin, data_size)
             offset_begin += data_size
 
-    with open(paths['idx_path'], 'wb') as f:
-        for i in idx:
-            d = bytes(f"{i['word']}\0", "utf-8")
-            f.write(d)
-            d = struct.pack(">II", i['offset_begin'], i['data_size'])
-            f.write(d)
-
-    res['idx_size'] = paths['idx_path'].stat().st_size
+            if syn_file is not None and res['syn_count'] is not None:
+                res['syn_count'] += len(w['synonyms'])
+                syn_pointer = pack_syn(n)
+                syn_file.write(b"".join(
+                    bytes(f"{s}\0", "utf-8") + syn_pointer
+                    for s in w['synonyms']))
 
-    if paths['syn_path'] is not None:
-        res['syn_count'] = 0
+            word_count += 1
 
-        with idzip.IdzipFile(f"{paths['syn_path']}", "wb") as f:
-            for n, w in enumerate(words):
-
-                # if res['syn_count'] is not None:
-                #     n = int(res['syn_count'])
-                #     n += len(w['synonyms'])
-                #     res['syn_count'] = n
-                if res['syn_count'] is not None:
-                    res['syn_count'] += len(w['synonyms'])
+    with open(paths['idx_path'], 'wb') as f:
+        f.write(idx_buffer)
 
-                for s in w['synonyms']:
-                    d = bytes(f"{s}\0", "utf-8")
-                    f.write(d)
-                    d = struct.pack(">I", n)
-                    f.write(d)
+    res['idx_size'] = paths['idx_path'].stat().st_size
+    res['word_count'] = word_count
 
     return res
 
@@ -642,7 +639,7 @@ def write_stardict_zip(paths: StarDictPaths):
                 z.write(p, p.relative_to(paths['unzipped_dir'].parent))
 
 
-def export_words_as_stardict_zip(words: List[DictEntry],
+def export_words_as_stardict_zip(words: Iterable[DictEntry],
                                  ifo: StarDictIfo,
                                  zip_path: Path,
                                  icon_path: Optional[Path] = None):
@@ -676,12 +673,14 @@ def export_words_as_stardict_zip(words: List[DictEntry],
     )
 
     ifo['version'] = '3.0.0'
-    ifo['wordcount'] = f"{len(words)}"
+    # the words can be a stream, so the count is only known after writing
+    ifo['wordcount'] = ''
     ifo['sametypesequence'] = 'h'
     ifo['date'] = datetime.datetime.utcnow().replace(microsecond=0).isoformat()
 
     res = write_words(words, paths)
 
+    ifo['wordcount'] = f"{res['word_count']}"
     ifo['idxoffsetbits'] = "32"
     ifo['idxfilesize'] = f"{res['idx_size']}"
     ifo['synwordcount'] = f"{res['syn_count']}"
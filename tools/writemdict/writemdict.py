@@ -27,15 +27,21 @@ Simple usage example:
 """
 
 from __future__ import unicode_literals
+import os
 import re
+import shutil
 import string
 import struct
 import functools
 import locale
+import tempfile
 
 import zlib
 import datetime
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from html import escape
 from tools.writemdict.ripemd128 import ripemd128
 from tools.writemdict.pureSalsa20 import Salsa20
@@ -151,15 +157,59 @@ def encrypt_key(dict_key, **kwargs):
 
 class _OffsetTableEntry(object):
     # Each OffsetTableEntry represents one key/record pair of the dictionary.
-    # In addition to the values themselves, it contains information about
-    # the offset at which this entry will be placed (i.e. the total length
-    # of records before it) which is required by the MDX format.
-    def __init__(self, key, key_null, key_len, offset, record_null):
+    # In addition to the key, it contains where the encoded record is in the
+    # record spool, and the offset at which this entry will be placed (i.e. the
+    # total length of records before it) which is required by the MDX format.
+    def __init__(self, key, key_null, key_len, offset, record_pos, record_len):
         self.key = key
         self.key_null = key_null
         self.key_len = key_len
         self.offset = offset
-        self.record_null = record_null
+        self.record_pos = record_pos
+        self.record_len = record_len
+
+
+class _RecordSpool(object):
+    # The encoded records, in a temporary file in the order they came in,
+    # so only the keys have to be kept in memory. Records are read back with
+    # os.pread, so any number of threads can read at the same time.
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._pos = 0
+
+    def add(self, record_null):
+        pos = self._pos
+        self._file.write(record_null)
+        self._pos += len(record_null)
+        return pos
+
+    def finish_writing(self):
+        self._file.flush()
+
+    def read(self, pos, length):
+        return os.pread(self._file.fileno(), length, pos)
+
+    def close(self):
+        self._file.close()
+
+
+def _compress_blocks(blocks, num_workers):
+    # Compresses the blocks on a pool of threads (zlib releases the GIL),
+    # yielding them in order as they are done. Only a few blocks are
+    # compressed ahead of the one being yielded, to keep memory down.
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for block in blocks:
+            pending.append((block, executor.submit(block.compress)))
+            if len(pending) > num_workers * 4:
+                block, future = pending.popleft()
+                future.result()
+                yield block
+        while pending:
+            block, future = pending.popleft()
+            future.result()
+            yield block
 
 
 class MDictWriter(object):
@@ -174,17 +224,20 @@ class MDictWriter(object):
                  register_by=None,
                  user_email=None,
                  user_device_id=None,
-                 is_mdd=False):
+                 is_mdd=False,
+                 num_workers=None):
         """
         Prepares the records. A subsequent call to write() writes
         the mdx or mdd file.
 
-        d is a dictionary. The keys should be (unicode) strings. If used for an mdx
+        d is a dictionary, or any iterable of (key, value) pairs, which is
+          only read once. The keys should be (unicode) strings. If used for an mdx
           file (the parameter is_mdd is False), then the values should also be
           (unicode) strings, containing HTML snippets. If used to write an mdd
           file (the parameter is_mdd is True), then the values should be binary
           strings (bytes objects), containing the raw data for the corresponding
-          file object.
+          file object. Only the keys are kept in memory, the values get
+          spooled to a temporary file.
 
         title is a (unicode) string, with the title of the dictionary
           description is a (unicode) string, with a short description of the
@@ -232,9 +285,11 @@ class MDictWriter(object):
         is_mdd is a boolean specifying whether the file written will be an mdx file
           or an mdd file. By default this is False, meaning that an mdd file will
           be written.
+
+        num_workers is the number of threads compressing blocks. Defaults to
+          the number of cores.
         """
 
-        self._num_entries = len(d)
         self._title = title
         self._description = description
         self._block_size = block_size
@@ -248,6 +303,7 @@ class MDictWriter(object):
         self._user_device_id = user_device_id
         self._compression_type = compression_type
         self._is_mdd = is_mdd
+        self._num_workers = num_workers or os.cpu_count() or 1
 
         # encoding is set to the string used in the mdx header.
         # python_encoding is passed on to the python .encode()
@@ -280,11 +336,19 @@ class MDictWriter(object):
         if version not in ["2.0", "1.2"]:
             raise ParameterError("Unknown version")
         self._version = version
-        self._build_offset_table(d)
-        self._build_key_blocks()
-        self._build_keyb_index()
-        self._build_record_blocks()
-        self._build_recordb_index()
+        self._records = _RecordSpool()
+        self._record_blocks_file = None
+        try:
+            self._build_offset_table(d)
+            self._build_key_blocks()
+            self._build_keyb_index()
+            self._build_record_blocks()
+            self._build_recordb_index()
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            self._records.close()
 
     def _build_offset_table(self, d):
         # Sets self._offset_table to a table of entries _OffsetTableEntry objects e.
@@ -295,9 +359,11 @@ class MDictWriter(object):
         #  e.key_len: the length of the key, in either bytes or 2-byte units, not counting the null character
         #        (as required by the MDX format in the keyword index)
         #  e.offset: the cumulative sum of len(record_null) for preceding records
-        #  e.record_null: encoded version of the record, null-terminated
+        #  e.record_pos, e.record_len: where the encoded version of the record,
+        #        null-terminated, is in the record spool
         #
-        # Also sets self._total_record_len to the total length of all record fields.
+        # Also sets self._num_entries, and self._total_record_len to the total
+        # length of all record fields.
         def mdict_cmp(item1, item2, prevent_link_to_link=True, sort_definitions=False):
             # sort following mdict standard
 
@@ -365,38 +431,48 @@ class MDictWriter(object):
         regex_strip = re.compile(pattern)
 
         if isinstance(d, dict):
-            items = list(d.items())
-        else:
-            items = list(d)
+            d = d.items()
+
+        # Spool the records as they come in, and only keep the start of each
+        # one for sorting, which is all mdict_cmp looks at.
+        items = []
+        for key, record in d:
+            # set record_null to a the the value of the record. If it's
+            # an MDX file, append an extra null character.
+            if self._is_mdd:
+                record_null = record
+            else:
+                record_null = (record+"\0").encode(self._python_encoding)
+            record_pos = self._records.add(record_null)
+            items.append((key, record[:200], record_pos, len(record_null)))
+        self._records.finish_writing()
+
         items.sort(key=functools.cmp_to_key(mdict_cmp))
 
+        self._num_entries = len(items)
         self._offset_table = []
         offset = 0
-        for key, record in items:
+        for key, __record_start__, record_pos, record_len in items:
             key_enc = key.encode(self._python_encoding)
             key_null = (key+"\0").encode(self._python_encoding)
             key_len = len(key_enc) // self._encoding_length
 
-            # set record_null to a the the value of the record. If it's
-            # an MDX file, append an extra null character.
-            if self._is_mdd:
-                record_null = record
-            else:
-                record_null = (record+"\0").encode(self._python_encoding)
             self._offset_table.append(_OffsetTableEntry(
                 key=key_enc,
                 key_null=key_null,
                 key_len=key_len,
-                record_null=record_null,
+                record_pos=record_pos,
+                record_len=record_len,
                 offset=offset))
-            offset += len(record_null)
+            offset += record_len
         self._total_record_len = offset
 
     def _split_blocks(self, block_type):
         # Split either the records or the keys into blocks for compression.
         #
-        # Returns a list of _MdxBlock, where the decompressed size of each block is (as
-        # far as practicable) less than self._block_size.
+        # Returns a list of lists of _OffsetTableEntry, one for each block, where
+        # the decompressed size of each block is (as far as practicable) less
+        # than self._block_size.
         #
         # block_type should be a subclass of _MdxBlock, i.e. either _MdxRecordBlock or
         # _MdxKeyBlock.
@@ -423,8 +499,7 @@ class MDictWriter(object):
             else:
                 flush = False
             if flush:
-                blocks.append(block_type(
-                    self._offset_table[this_block_start:ind], self._compression_type, self._version))
+                blocks.append(self._offset_table[this_block_start:ind])
                 cur_size = 0
                 this_block_start = ind
             if t is not None:  # mentally add this entry to list of things
@@ -432,11 +507,27 @@ class MDictWriter(object):
         return blocks
 
     def _build_key_blocks(self):
-        # Sets self._key_blocks to a list of _MdxKeyBlocks.
-        self._key_blocks = self._split_blocks(_MdxKeyBlock)
+        # Sets self._key_blocks to a list of compressed _MdxKeyBlocks.
+        blocks = (
+            _MdxKeyBlock(entries, self._compression_type, self._version)
+            for entries in self._split_blocks(_MdxKeyBlock))
+        self._key_blocks = list(_compress_blocks(blocks, self._num_workers))
 
     def _build_record_blocks(self):
-        self._record_blocks = self._split_blocks(_MdxRecordBlock)
+        # Sets self._record_blocks to a list of _MdxRecordBlocks, whose
+        # compressed data is written in order to self._record_blocks_file,
+        # instead of being kept in memory.
+        blocks = (
+            _MdxRecordBlock(
+                entries, self._compression_type, self._version, self._records)
+            for entries in self._split_blocks(_MdxRecordBlock))
+
+        self._record_blocks = []
+        self._record_blocks_file = tempfile.TemporaryFile()
+        for block in _compress_blocks(blocks, self._num_workers):
+            self._record_blocks_file.write(block.get_block())
+            block.release_block()
+            self._record_blocks.append(block)
 
     def _build_keyb_index(self):
         # Sets self._keyb_index to a bytes object, containing the index of key blocks, in
@@ -506,7 +597,7 @@ class MDictWriter(object):
         # outfile: a file-like object, opened in binary mode.
 
         recordblocks_total_size = sum(
-            (len(b.get_block()) for b in self._record_blocks))
+            (b.get_comp_size() for b in self._record_blocks))
         if self._version == "2.0":
             format = b">QQQQ"
         else:
@@ -517,8 +608,8 @@ class MDictWriter(object):
                             self._recordb_index_size,
                             recordblocks_total_size))
         outfile.write(self._recordb_index)
-        for b in self._record_blocks:
-            outfile.write(b.get_block())
+        self._record_blocks_file.seek(0)
+        shutil.copyfileobj(self._record_blocks_file, outfile)
 
     def write(self, outfile):
         """ 
@@ -527,9 +618,24 @@ class MDictWriter(object):
         outfile: a file-like object, opened in binary mode.
         """
 
-        self._write_header(outfile)
-        self._write_key_sect(outfile)
-        self._write_record_sect(outfile)
+        if self._record_blocks_file is None:
+            raise ValueError("write() on a closed MDictWriter")
+        try:
+            self._write_header(outfile)
+            self._write_key_sect(outfile)
+            self._write_record_sect(outfile)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Delete the temporary file holding the compressed record blocks.
+
+        write() calls this itself, so the writer can only be written once.
+        """
+        if self._record_blocks_file is not None:
+            self._record_blocks_file.close()
+            self._record_blocks_file = None
 
     def _write_header(self, f):
         encrypted = 0
@@ -631,22 +737,36 @@ class _MdxBlock(object):
     #
 
     def __init__(self, offset_table, compression_type, version):
-        # Builds the data from offset_table.
+        # Keeps offset_table, the data is only built by compress().
         #
-        # offset_table is a iterable containing _OffsetTableEntry objects.
+        # offset_table is a list containing _OffsetTableEntry objects.
+
+        self._offset_table = offset_table
+        self._compression_type = compression_type
+        self._version = version
+
+    def compress(self):
+        # Builds the data from offset_table and compresses it. Safe to call
+        # from several threads at once, on different blocks.
 
         decomp_data = b"".join(
-            type(self)._block_entry(t, version)
-            for t in offset_table)
+            self._block_entry(t, self._version)
+            for t in self._offset_table)
         self._decomp_size = len(decomp_data)
-        self._comp_data = _mdx_compress(decomp_data, compression_type)
+        self._comp_data = _mdx_compress(decomp_data, self._compression_type)
         self._comp_size = len(self._comp_data)
-        self._version = version
 
     def get_block(self):
         # Returns a bytes object, containing the data for this block.
         return self._comp_data
 
+    def release_block(self):
+        # Frees the data of this block, once it's been written elsewhere.
+        self._comp_data = None
+
+    def get_comp_size(self):
+        return self._comp_size
+
     def get_index_entry(self):
         # Returns a bytes object, containing the entry for this block in the
         # corresponding key block index or record block index.
@@ -676,14 +796,16 @@ class _MdxRecordBlock(_MdxBlock):
     # both the block itself, as well as the entry in the record block index for that
     # block.
 
-    def __init__(self, offset_table, compression_type, version):
+    def __init__(self, offset_table, compression_type, version, records):
         # Builds the data for offset_table.
         #
-        # offset_table is a iterable containing _OffsetTableEntry objects.
+        # offset_table is a list containing _OffsetTableEntry objects.
         #
-        # Actually only uses the record parts.
+        # Actually only uses the record parts, read from records, the
+        # _RecordSpool.
 
         _MdxBlock.__init__(self, offset_table, compression_type, version)
+        self._records = records
 
     def get_index_entry(self):
         # Returns a bytes object, containing the entry for this block in the record
@@ -695,13 +817,12 @@ class _MdxRecordBlock(_MdxBlock):
             format = b">LL"
         return struct.pack(format, self._comp_size, self._decomp_size)
 
-    @staticmethod
-    def _block_entry(t, __version__):
-        return t.record_null
+    def _block_entry(self, t, __version__):
+        return self._records.read(t.record_pos, t.record_len)
 
     @staticmethod
     def _len_block_entry(t):
-        return len(t.record_null)
+        return t.record_len
 
 
 class _MdxKeyBlock(_MdxBlock):
@@ -713,9 +834,9 @@ class _MdxKeyBlock(_MdxBlock):
     def __init__(self, offset_table, compression_type, version):
         # Builds the data for offset_table.
         #
-        # offset_table is a iterable containing _OffsetTableEntry objects.
+        # offset_table is a list containing _OffsetTableEntry objects.
         #
-        # Only uses the key, key_len, key_null and offset fields, and effectively ignores record_null.
+        # Only uses the key, key_len, key_null and offset fields, and effectively ignores the record.
 
         _MdxBlock.__init__(self, offset_table, compression_type, version)
         self._num_entries = len(offset_table)